@@ -0,0 +1,138 @@
+"""
+Response compression benchmark.
+
+Fetches each route uncompressed and with every content-coding the server and
+this client support, and reports per route and encoding the bytes on the
+wire, the share saved and the median request latency. The uncompressed body is
+then compressed locally with the middleware's own encoders at the level used
+with spare CPU and the one used when the worker is busy. That gives the CPU
+each response costs to compress.
+
+Usage (from the project root):
+    python -m back_end.benchmarks.compression_benchmark --base-url http://localhost:8000
+    python -m back_end.benchmarks.compression_benchmark --database-url postgresql://localhost/farmzilla_bench \
+        --dataset-dir data/generated/small --route /api/v1/users/all --route "/api/v1/marketplace/products?limit=100"
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+import httpx
+
+from back_end.benchmarks.load_test import RESULTS_DIR, prepare_database, start_server
+from back_end.src.utils.compression import available_encoders
+
+DEFAULT_ROUTES = [
+    '/api/v1/users/all',
+    '/api/v1/products/',
+    '/api/v1/events/',
+    '/api/v1/marketplace/products?limit=100',
+]
+
+
+def fetch(client, route, encoding, requests):
+    """Wire bytes, decoded body and median latency of `requests` GETs with the given Accept-Encoding"""
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(route, headers={'Accept-Encoding': encoding})
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return {
+        'content_encoding': response.headers.get('content-encoding', 'identity'),
+        'wire_bytes': response.num_bytes_downloaded,
+        'body': response.content,
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+    }
+
+
+def compression_cost(encoder, body, level, repeats):
+    """Compressed size and median CPU milliseconds to compress body"""
+    times = []
+    for _ in range(repeats):
+        started = time.thread_time()
+        compressed = encoder.compress(body, level)
+        times.append(time.thread_time() - started)
+    return len(compressed), round(statistics.median(times) * 1000, 3)
+
+
+def benchmark_route(client, route, encoders, requests, repeats):
+    identity = fetch(client, route, 'identity', requests)
+    raw_bytes = len(identity['body'])
+    result = {'route': route, 'raw_bytes': raw_bytes, 'identity_p50_ms': identity['p50_ms'], 'encodings': {}}
+    for name, encoder in encoders.items():
+        served = fetch(client, route, name, requests)
+        normal_level, busy_level = encoder.levels
+        normal_bytes, normal_cpu = compression_cost(encoder, identity['body'], normal_level, repeats)
+        busy_bytes, busy_cpu = compression_cost(encoder, identity['body'], busy_level, repeats)
+        result['encodings'][name] = {
+            'served_as': served['content_encoding'],
+            'wire_bytes': served['wire_bytes'],
+            'saved_pct': round(100 * (1 - served['wire_bytes'] / raw_bytes), 1) if raw_bytes else 0.0,
+            'p50_ms': served['p50_ms'],
+            'level': normal_level,
+            'level_bytes': normal_bytes,
+            'cpu_ms': normal_cpu,
+            'busy_level': busy_level,
+            'busy_level_bytes': busy_bytes,
+            'busy_cpu_ms': busy_cpu,
+        }
+    return result
+
+
+def print_results(results):
+    print(f"\n{'route':<45} {'enc':<5} {'raw':>10} {'wire':>10} {'saved':>7} {'cpu ms':>8} "
+          f"{'busy cpu':>9} {'p50 ms':>8} {'id p50':>8}")
+    for result in results:
+        for name, stats in result['encodings'].items():
+            print(f"{result['route'][:45]:<45} {name:<5} {result['raw_bytes']:>10} {stats['wire_bytes']:>10} "
+                  f"{stats['saved_pct']:>6}% {stats['cpu_ms']:>8} {stats['busy_cpu_ms']:>9} "
+                  f"{stats['p50_ms']:>8} {result['identity_p50_ms']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure bytes saved and CPU added by response compression')
+    parser.add_argument('--base-url', help='Running server to measure (default: start one)')
+    parser.add_argument('--database-url', help='PostgreSQL URL for the started server')
+    parser.add_argument('--dataset-dir', help='Generated dataset to load before starting the server')
+    parser.add_argument('--route', action='append', help='Route to measure, repeatable (default: the list endpoints)')
+    parser.add_argument('--requests', type=int, default=10, help='Requests per route and encoding')
+    parser.add_argument('--repeats', type=int, default=20, help='Local compressions per route, encoding and level')
+    parser.add_argument('--port', type=int, default=8765, help='Port for the started server')
+    parser.add_argument('--output', help='Result file (default: back_end/benchmarks/results/compression_<timestamp>.json)')
+    args = parser.parse_args()
+
+    if not args.base_url and not args.database_url:
+        parser.error('either --base-url or --database-url is required')
+
+    encoders = available_encoders()
+    print(f"🔧 Encoders available to this client: {', '.join(encoders)}")
+    process = None
+    base_url = args.base_url
+    if base_url is None:
+        if args.dataset_dir:
+            prepare_database(args.database_url, args.dataset_dir)
+        process, base_url = start_server(args.database_url, args.port)
+    try:
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            results = [benchmark_route(client, route, encoders, args.requests, args.repeats)
+                       for route in args.route or DEFAULT_ROUTES]
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=60)
+
+    print_results(results)
+    output = args.output or os.path.join(RESULTS_DIR, f"compression_{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -44,6 +44,18 @@ class FarmZillaFargateDeployer:
         self.cpu = os.getenv('CPU')
         self.memory = os.getenv('MEMORY')
         self.desired_count = int(os.getenv('DESIRED_COUNT'))
+        # Rolling deploys run old and new tasks side by side, pools are sized for the peak
+        self.deploy_maximum_percent = int(os.getenv('DEPLOY_MAXIMUM_PERCENT', 200))
+        self.graceful_shutdown_timeout = int(os.getenv('GRACEFUL_SHUTDOWN_TIMEOUT', 25))
+
+        # Queue workers run as their own services from the same image, so they scale and
+        # deploy apart from the API: (name, module, desired count, env prefixes passed through)
+        self.workers = [
+            ('newsletter-worker', 'back_end.src.newsletter_worker',
+             int(os.getenv('NEWSLETTER_WORKER_COUNT', 1)), ('NEWSLETTER_',)),
+            ('job-worker', 'back_end.src.job_worker',
+             int(os.getenv('JOB_WORKER_COUNT', 1)), ('JOB_',)),
+        ]
 
         # Image config from environment variables
         backend_ecr_repo = os.getenv('BACKEND_ECR_REPO', 'farmzilla-backend')
@@ -304,13 +316,9 @@ class FarmZillaFargateDeployer:
             print(f"❌ Error with security group: {e}")
             raise
 
-    def register_task_definition(self):
-        """Register ECS task definition with environment variables"""
-        execution_role_arn = self.create_execution_role()
-        task_role_arn = self.create_task_role()
-        
-        # Environment variables from .env file
-        environment_vars = [
+    def get_environment_vars(self):
+        """Container environment shared by the API and the workers, from the .env file"""
+        return [
             {"name": "AWS_RDS_PASSWORD", "value": os.getenv("AWS_RDS_PASSWORD")},
             {"name": "AWS_RDS_ENDPOINT", "value": os.getenv("AWS_RDS_ENDPOINT")},
             {"name": "AWS_RDS_MASTER_USERNAME", "value": os.getenv("AWS_RDS_MASTER_USERNAME")},
@@ -321,8 +329,24 @@ class FarmZillaFargateDeployer:
             {"name": "AUTH_SECRET_KEY", "value": os.getenv("AUTH_SECRET_KEY")},
             {"name": "ALGORITHM", "value": os.getenv("ALGORITHM")},
             {"name": "ACCESS_TOKEN_EXPIRE_MINUTES", "value": os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")},
-            {"name": "AWS_DEFAULT_REGION", "value": self.region}
+            {"name": "AWS_DEFAULT_REGION", "value": self.region},
+            # Worker count and per-worker pool sizing (utils/server_config.py)
+            {"name": "CPU", "value": str(self.cpu)},
+            {"name": "DESIRED_COUNT", "value": str(self.desired_count)},
+            {"name": "DEPLOY_MAXIMUM_PERCENT", "value": str(self.deploy_maximum_percent)},
+            {"name": "DB_MAX_CONNECTIONS", "value": os.getenv("DB_MAX_CONNECTIONS", "100")},
+            # "transaction" when AWS_RDS_URL points at a transaction-mode PgBouncer
+            {"name": "DB_POOL_MODE", "value": os.getenv("DB_POOL_MODE", "direct")},
+            {"name": "GRACEFUL_SHUTDOWN_TIMEOUT", "value": str(self.graceful_shutdown_timeout)},
         ]
+
+    def register_task_definition(self):
+        """Register ECS task definition with environment variables"""
+        execution_role_arn = self.create_execution_role()
+        task_role_arn = self.create_task_role()
+        
+        # Environment variables from .env file
+        environment_vars = self.get_environment_vars()
         
         task_definition = {
             'family': self.task_family,
@@ -343,7 +367,21 @@ class FarmZillaFargateDeployer:
                         }
                     ],
                     'essential': True,
+                    # Give uvicorn time to drain in-flight requests after SIGTERM
+                    'stopTimeout': min(self.graceful_shutdown_timeout + 5, 120),
                     'environment': environment_vars,
+                    # Healthy once the warm-up has opened the pool (slim image has no curl)
+                    'healthCheck': {
+                        'command': [
+                            'CMD', 'python', '-c',
+                            "import urllib.request; "
+                            f"urllib.request.urlopen('http://localhost:{self.container_port}/readyz', timeout=4)"
+                        ],
+                        'interval': 15,
+                        'timeout': 5,
+                        'retries': 3,
+                        'startPeriod': 60
+                    },
                     'logConfiguration': {
                         'logDriver': 'awslogs',
                         'options': {
@@ -364,6 +402,55 @@ class FarmZillaFargateDeployer:
         print(f"✅ Task definition registered: {self.task_family}:{revision}")
         return task_def_arn
 
+    def register_worker_task_definition(self, name, module, env_prefixes):
+        """Register the task definition of a queue worker, the API image running the worker module"""
+        execution_role_arn = self.create_execution_role()
+        task_role_arn = self.create_task_role()
+
+        # Worker settings (batch sizes, concurrency, rates) are passed through when set in .env
+        environment_vars = self.get_environment_vars() + [
+            {"name": key, "value": value}
+            for key, value in sorted(os.environ.items())
+            if key.startswith(env_prefixes)
+        ]
+
+        family = f"{self.task_family}-{name}"
+        task_definition = {
+            'family': family,
+            'networkMode': 'awsvpc',
+            'requiresCompatibilities': ['FARGATE'],
+            'cpu': self.cpu,
+            'memory': self.memory,
+            'executionRoleArn': execution_role_arn,
+            'taskRoleArn': task_role_arn,
+            'containerDefinitions': [
+                {
+                    'name': f"{self.container_name}-{name}",
+                    'image': self.image_uri,
+                    'command': ['python', '-m', module],
+                    'essential': True,
+                    # Workers save their progress on SIGTERM before exiting
+                    'stopTimeout': 120,
+                    'environment': environment_vars,
+                    'logConfiguration': {
+                        'logDriver': 'awslogs',
+                        'options': {
+                            'awslogs-group': self.log_group_name,
+                            'awslogs-region': self.region,
+                            'awslogs-stream-prefix': name
+                        }
+                    }
+                }
+            ]
+        }
+
+        print(f"Registering task definition: {family}")
+        response = self.ecs_client.register_task_definition(**task_definition)
+
+        revision = response['taskDefinition']['revision']
+        print(f"✅ Task definition registered: {family}:{revision}")
+        return response['taskDefinition']['taskDefinitionArn']
+
     def create_service(self, security_group_id):
         """Create or update ECS service"""
         try:
@@ -385,6 +472,10 @@ class FarmZillaFargateDeployer:
                 taskDefinition=self.task_family,
                 desiredCount=self.desired_count,
                 launchType='FARGATE',
+                deploymentConfiguration={
+                    'maximumPercent': self.deploy_maximum_percent,
+                    'minimumHealthyPercent': 100
+                },
                 networkConfiguration={
                     'awsvpcConfiguration': {
                         'subnets': self.subnet_ids,
@@ -402,6 +493,50 @@ class FarmZillaFargateDeployer:
             print(f"❌ Error creating service: {e}")
             raise
 
+    def create_worker_service(self, name, desired_count, security_group_id):
+        """Create or update the ECS service running a queue worker"""
+        service_name = f"{self.service_name}-{name}"
+        family = f"{self.task_family}-{name}"
+        try:
+            response = self.ecs_client.describe_services(
+                cluster=self.cluster_name,
+                services=[service_name]
+            )
+
+            if response['services'] and response['services'][0]['status'] != 'INACTIVE':
+                print(f"Service {service_name} already exists, updating...")
+                response = self.ecs_client.update_service(
+                    cluster=self.cluster_name,
+                    service=service_name,
+                    taskDefinition=family,
+                    desiredCount=desired_count,
+                    forceNewDeployment=True
+                )
+            else:
+                print(f"Creating ECS service: {service_name}")
+                response = self.ecs_client.create_service(
+                    cluster=self.cluster_name,
+                    serviceName=service_name,
+                    taskDefinition=family,
+                    desiredCount=desired_count,
+                    launchType='FARGATE',
+                    networkConfiguration={
+                        'awsvpcConfiguration': {
+                            'subnets': self.subnet_ids,
+                            'securityGroups': [security_group_id],
+                            'assignPublicIp': 'ENABLED'
+                        }
+                    }
+                )
+
+            service_arn = response['service']['serviceArn']
+            print(f"✅ Service ready: {service_arn}")
+            return service_arn
+
+        except ClientError as e:
+            print(f"❌ Error creating service {service_name}: {e}")
+            raise
+
     def update_service(self):
         """Update existing service with new task definition"""
         print(f"Updating service {self.service_name} with latest task definition")
@@ -422,7 +557,7 @@ class FarmZillaFargateDeployer:
         waiter = self.ecs_client.get_waiter('services_stable')
         waiter.wait(
             cluster=self.cluster_name,
-            services=[self.service_name],
+            services=[self.service_name] + [f"{self.service_name}-{name}" for name, *_ in self.workers],
             WaiterConfig={'maxAttempts': 30}
         )
         print("✅ Service is stable!")
@@ -491,10 +626,15 @@ class FarmZillaFargateDeployer:
             # Step 5: Create/update service
             self.create_service(security_group_id)
             
-            # Step 6: Wait for service to stabilize
+            # Step 6: Register and create/update the queue worker services
+            for name, module, desired_count, env_prefixes in self.workers:
+                self.register_worker_task_definition(name, module, env_prefixes)
+                self.create_worker_service(name, desired_count, security_group_id)
+            
+            # Step 7: Wait for services to stabilize
             self.wait_for_service_stable()
             
-            # Step 7: Get public IP
+            # Step 8: Get public IP
             public_ip = self.get_public_ip()
             
             print("=" * 60)
@@ -506,6 +646,7 @@ class FarmZillaFargateDeployer:
                 print(f"   Main endpoint: http://{public_ip}:{self.container_port}/")
                 print(f"   API docs:      http://{public_ip}:{self.container_port}/docs")
                 print(f"   OpenAPI spec:  http://{public_ip}:{self.container_port}/openapi.json")
+                print(f"   Readiness:     http://{public_ip}:{self.container_port}/readyz")
             else:
                 print("⚠️  Could not retrieve public IP. Check AWS console for task details.")
             
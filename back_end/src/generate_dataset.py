@@ -0,0 +1,386 @@
+"""
+Synthetic dataset generator for FarmZilla load testing.
+
+Builds deterministic, seeded CSV files for every table (users, products,
+producer_consumer_matches, events, event_vendor, ratings) at a configurable
+scale. Columns are generated and formatted vectorized with NumPy (as byte
+string arrays, no per-row Python objects), and the files use the table column
+names as headers so DatabaseHandler.bulk_load_csv can COPY them straight into
+PostgreSQL.
+
+Usage (from back_end/src/):
+    python generate_dataset.py --scale large
+    python generate_dataset.py --users 200000 --ratings 1000000 --seed 7
+    python generate_dataset.py --scale medium --load --database-url postgresql://...
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+# Row counts for the built-in scales
+SCALES = {
+    'small': {'users': 10_000, 'products': 5_000, 'matches': 20_000, 'ratings': 50_000,
+              'events': 1_000, 'event_vendors': 8_000},
+    'medium': {'users': 100_000, 'products': 50_000, 'matches': 300_000, 'ratings': 500_000,
+               'events': 10_000, 'event_vendors': 80_000},
+    'large': {'users': 1_000_000, 'products': 500_000, 'matches': 3_000_000, 'ratings': 5_000_000,
+              'events': 100_000, 'event_vendors': 800_000},
+}
+
+# Tables in load order, with the generated file name for each
+TABLE_FILES = [
+    ('users', 'users.csv'),
+    ('products', 'products.csv'),
+    ('producer_consumer_matches', 'producer_consumer_matches.csv'),
+    ('events', 'events.csv'),
+    ('event_vendor', 'event_vendor.csv'),
+    ('ratings', 'ratings.csv'),
+]
+
+# Metro areas used as cluster centres for user and event coordinates
+GEO_CLUSTERS = np.array([
+    [45.5152, -122.6784],  # Portland
+    [47.6062, -122.3321],  # Seattle
+    [44.0521, -123.0868],  # Eugene
+    [37.7749, -122.4194],  # San Francisco
+    [38.5816, -121.4944],  # Sacramento
+    [34.0522, -118.2437],  # Los Angeles
+    [39.7392, -104.9903],  # Denver
+    [40.7608, -111.8910],  # Salt Lake City
+    [43.6150, -116.2023],  # Boise
+    [41.8781, -87.6298],   # Chicago
+    [44.9778, -93.2650],   # Minneapolis
+    [40.7128, -74.0060],   # New York
+    [42.3601, -71.0589],   # Boston
+    [35.7796, -78.6382],   # Raleigh
+    [30.2672, -97.7431],   # Austin
+])
+
+PRODUCE = np.array([
+    b'Bell Pepper', b'Carrot', b'Cilantro', b'Corn', b'Cucumber', b'Eggs', b'Fennel', b'Granny Smith Apple',
+    b'Grape Tomato', b'Jalapeno', b'Kale', b'Mango', b'Potato', b'Purple Onion', b'Radish', b'Shallot', b'Tomato',
+])
+REVIEWS = np.array([
+    b'Great quality produce!', b'Fresh and tasty.', b'Friendly farmer, will buy again.',
+    b'Prices are fair.', b'A bit pricey but worth it.', b'Produce was not as fresh as expected.',
+])
+EVENT_KINDS = np.array([b'Farmers Market', b'Harvest Festival', b'Pop-up Market', b'Farm Stand', b'Community Fair'])
+EVENT_TIMES = np.array([b'07:00', b'08:00', b'09:00', b'10:00', b'11:00', b'12:00', b'15:00', b'16:00', b'17:00'])
+
+DEFAULT_PASSWORD = 'password123'
+HEX_DIGITS = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+# Rows formatted and written per slice, keeps memory bounded for the big tables
+WRITE_CHUNK_ROWS = 500_000
+
+
+#-------------------------------------------------#
+# ----------VECTORIZED FORMATTING-----------------#
+#-------------------------------------------------#
+
+def digits(values, width):
+    """Format non-negative integers as zero padded byte strings of a fixed width"""
+    values = np.asarray(values, dtype=np.int64)
+    out = np.empty((len(values), width), dtype=np.uint8)
+    for position in range(width):
+        out[:, width - 1 - position] = (values // 10 ** position) % 10 + ord('0')
+    return out.view(f'S{width}').ravel()
+
+
+def integers(values, width):
+    """Format non-negative integers as byte strings without leading zeros"""
+    return np.char.lstrip(digits(values, width), b'0')
+
+
+def decimals(values, places):
+    """Format floats with a fixed number of decimal places, e.g. -122.6784"""
+    scaled = np.rint(np.abs(values) * 10 ** places).astype(np.int64)
+    whole = integers(scaled // 10 ** places, 6)
+    whole = np.where(whole == b'', b'0', whole)
+    text = np.char.add(np.char.add(whole, b'.'), digits(scaled % 10 ** places, places))
+    return np.where(values < 0, np.char.add(b'-', text), text)
+
+
+def random_uuids(rng, n):
+    """Generate n random version-4 UUIDs as byte strings"""
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+
+    # Two hex digits per byte, then copy the digits around the dashes
+    hex_digits = np.empty((n, 32), dtype=np.uint8)
+    hex_digits[:, 0::2] = HEX_DIGITS[raw >> 4]
+    hex_digits[:, 1::2] = HEX_DIGITS[raw & 0x0F]
+    out = np.full((n, 36), ord('-'), dtype=np.uint8)
+    for start, end, offset in ((0, 8, 0), (8, 12, 1), (12, 16, 2), (16, 20, 3), (20, 32, 4)):
+        out[:, start + offset:end + offset] = hex_digits[:, start:end]
+    return out.view('S36').ravel()
+
+
+def numbered(prefix, n, width=9):
+    """Return prefix + zero padded sequence numbers, e.g. P000000001"""
+    return np.char.add(prefix, digits(np.arange(1, n + 1), width))
+
+
+def clustered_coordinates(rng, n, spread=0.25):
+    """Sample n 'lat,lon' strings clustered around the metro areas"""
+    # Larger metros get more points
+    weights = 1.0 / np.arange(1, len(GEO_CLUSTERS) + 1) ** 0.6
+    centres = GEO_CLUSTERS[rng.choice(len(GEO_CLUSTERS), size=n, p=weights / weights.sum())]
+    points = centres + rng.normal(0.0, spread, size=(n, 2))
+    return np.char.add(np.char.add(decimals(points[:, 0], 6), b','), decimals(points[:, 1], 6))
+
+
+def random_timestamps(rng, n, start='2024-01-01', end='2026-01-01'):
+    """Uniform random 'YYYY-MM-DD HH:MM:SS' timestamps between start and end"""
+    start = np.datetime64(start, 'D')
+    n_days = int((np.datetime64(end, 'D') - start).astype(np.int64))
+    # Format through lookup tables of every day and every second of a day
+    days = np.datetime_as_string(start + np.arange(n_days)).astype('S10')
+    seconds = np.datetime_as_string(np.datetime64('2000-01-01T00:00:00') + np.arange(86_400)).astype('S19')
+    seconds = seconds.view(np.uint8).reshape(-1, 19)[:, 10:].copy()  # 'THH:MM:SS'
+    seconds[:, 0] = ord(' ')
+    seconds = seconds.view('S9').ravel()
+    return np.char.add(days[rng.integers(0, n_days, n)], seconds[rng.integers(0, 86_400, n)])
+
+
+def skewed_choice(rng, n_items, size, exponent=0.8):
+    """Zipf-like choice of item indexes so a few producers are much more popular"""
+    weights = 1.0 / np.arange(1, n_items + 1) ** exponent
+    return rng.choice(n_items, size=size, p=weights / weights.sum())
+
+
+def unique_pairs(rng, left, right, n_right, target):
+    """Drop duplicate (left, right) pairs and trim to at most target pairs"""
+    codes = np.unique(left.astype(np.int64) * n_right + right)
+    if len(codes) > target:
+        codes = np.sort(rng.choice(codes, size=target, replace=False))
+    return codes // n_right, codes % n_right
+
+
+def write_csv(path, table):
+    """
+    Write a dict of equal length byte string arrays as CSV.
+    Empty values are written unquoted so COPY loads them as NULL; other
+    values are quoted when they contain a comma.
+    """
+    names = list(table)
+    n_rows = len(table[names[0]])
+    with open(path, 'wb') as f:
+        f.write(b','.join(name.encode() for name in names) + b'\n')
+        for start in range(0, n_rows, WRITE_CHUNK_ROWS):
+            rows = None
+            for name in names:
+                column = table[name][start:start + WRITE_CHUNK_ROWS]
+                if np.char.find(column, b',').max(initial=-1) >= 0:
+                    column = np.where(column == b'', b'', np.char.add(np.char.add(b'"', column), b'"'))
+                rows = column if rows is None else np.char.add(np.char.add(rows, b','), column)
+            f.write(b'\n'.join(rows.tolist()))
+            f.write(b'\n')
+    return n_rows
+
+
+#-------------------------------------------------#
+# ----------TABLE GENERATORS----------------------#
+#-------------------------------------------------#
+
+def hashed_password(password):
+    """One bcrypt hash shared by every generated user (hashing millions of rows is not feasible)"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto").hash(password)
+
+
+def generate_users(rng, n_users, producer_fraction, password_hash):
+    is_producer = rng.random(n_users) < producer_fraction
+    is_producer[0] = True  # always at least one producer
+    usernames = numbered(b'user_', n_users, width=7)
+    phone_numbers = np.char.add(b'555-', digits(rng.integers(0, 10_000_000, n_users), 7))
+
+    return {
+        'id': random_uuids(rng, n_users),
+        'username': usernames,
+        'password': np.full(n_users, password_hash.encode()),
+        'email': np.char.add(usernames, b'@example.com'),
+        'role': np.where(is_producer, b'producer', b'consumer'),
+        'location': clustered_coordinates(rng, n_users),
+        'phone_number': np.where(is_producer, phone_numbers, b''),
+        'description': np.where(is_producer, np.char.add(b'Family farm run by ', usernames), b''),
+    }
+
+
+def generate_products(rng, n_products, producer_ids):
+    names = np.char.add(np.char.add(PRODUCE[rng.integers(0, len(PRODUCE), n_products)], b' #'),
+                        integers(np.arange(1, n_products + 1), 9))
+    cents = np.rint(rng.lognormal(mean=1.2, sigma=0.5, size=n_products) * 100)
+    return {
+        'id': random_uuids(rng, n_products),
+        'product_id': numbered(b'P', n_products),
+        'product_name': names,
+        'description': np.char.add(b'Locally grown ', np.char.lower(names)),
+        'user_id': producer_ids[skewed_choice(rng, len(producer_ids), n_products)],
+        'cost': decimals(cents / 100, 2),
+        'unit': np.where(rng.random(n_products) < 0.6, b'each', b'lb'),
+    }
+
+
+def generate_matches(rng, n_matches, producer_ids, consumer_ids):
+    oversample = int(n_matches * 1.1) + 10
+    producers, consumers = unique_pairs(
+        rng,
+        skewed_choice(rng, len(producer_ids), oversample),
+        rng.integers(0, len(consumer_ids), oversample),
+        len(consumer_ids),
+        n_matches,
+    )
+    return {
+        'id': random_uuids(rng, len(producers)),
+        'producer_id': producer_ids[producers],
+        'consumer_id': consumer_ids[consumers],
+        'created_at': random_timestamps(rng, len(producers)),
+    }
+
+
+def generate_ratings(rng, n_ratings, producer_ids, consumer_ids):
+    oversample = int(n_ratings * 1.1) + 10
+    producers, consumers = unique_pairs(
+        rng,
+        skewed_choice(rng, len(producer_ids), oversample),
+        rng.integers(0, len(consumer_ids), oversample),
+        len(consumer_ids),
+        n_ratings,
+    )
+    n = len(producers)
+    stars = np.array([b'1', b'2', b'3', b'4', b'5'])
+    has_review = rng.random(n) < 0.3
+    return {
+        'id': random_uuids(rng, n),
+        'producer_id': producer_ids[producers],
+        'consumer_id': consumer_ids[consumers],
+        'rating': stars[rng.choice(5, size=n, p=[0.05, 0.07, 0.15, 0.33, 0.40])],
+        'review': np.where(has_review, REVIEWS[rng.integers(0, len(REVIEWS), n)], b''),
+        'date': random_timestamps(rng, n),
+    }
+
+
+def generate_events(rng, n_events):
+    kinds = EVENT_KINDS[rng.integers(0, len(EVENT_KINDS), n_events)]
+    names = np.char.add(np.char.add(kinds, b' #'), integers(np.arange(1, n_events + 1), 9))
+    dates = random_timestamps(rng, n_events, start='2025-01-01', end='2027-01-01')
+    return {
+        'id': random_uuids(rng, n_events),
+        'event_id': numbered(b'E', n_events),
+        'name': names,
+        'date': dates.astype('S10'),
+        'time': EVENT_TIMES[rng.integers(0, len(EVENT_TIMES), n_events)],
+        'location': np.char.add(kinds, b' grounds'),
+        'description': np.char.add(b'Local growers selling at the ', np.char.lower(names)),
+        'coordinates': clustered_coordinates(rng, n_events, spread=0.15),
+    }
+
+
+def generate_event_vendors(rng, n_event_vendors, event_ids, producer_ids):
+    oversample = int(n_event_vendors * 1.1) + 10
+    events, producers = unique_pairs(
+        rng,
+        rng.integers(0, len(event_ids), oversample),
+        skewed_choice(rng, len(producer_ids), oversample),
+        len(producer_ids),
+        n_event_vendors,
+    )
+    return {
+        'id': random_uuids(rng, len(events)),
+        'event_id': event_ids[events],
+        'producer_id': producer_ids[producers],
+    }
+
+
+def generate_dataset(counts, out_dir, seed=42, producer_fraction=0.05, password=DEFAULT_PASSWORD):
+    """
+    Generate every table and write it to out_dir as CSV.
+
+    Each table draws from its own generator derived from the seed, so changing
+    the size of one table does not change the contents of the others.
+
+    Returns:
+        dict: Number of rows written per table
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rngs = [np.random.default_rng([seed, index]) for index in range(len(TABLE_FILES))]
+
+    users = generate_users(rngs[0], counts['users'], producer_fraction, hashed_password(password))
+    is_producer = users['role'] == b'producer'
+    producer_ids = users['id'][is_producer]
+    consumer_ids = users['id'][~is_producer]
+    events = generate_events(rngs[3], counts['events'])
+
+    tables = {
+        'users': lambda: users,
+        'products': lambda: generate_products(rngs[1], counts['products'], producer_ids),
+        'producer_consumer_matches': lambda: generate_matches(rngs[2], counts['matches'], producer_ids, consumer_ids),
+        'events': lambda: events,
+        'event_vendor': lambda: generate_event_vendors(rngs[4], counts['event_vendors'], events['event_id'], producer_ids),
+        'ratings': lambda: generate_ratings(rngs[5], counts['ratings'], producer_ids, consumer_ids),
+    }
+
+    # Build and write one table at a time so only one large table is in memory
+    row_counts = {}
+    for table, file_name in TABLE_FILES:
+        row_counts[table] = write_csv(os.path.join(out_dir, file_name), tables[table]())
+        print(f"✓ Wrote {row_counts[table]:>10,} rows to {file_name}")
+    return row_counts
+
+
+def load_dataset(database_url, out_dir, sslmode='prefer'):
+    """COPY the generated files into an existing FarmZilla schema (see setup.py)"""
+    from utils.db_handler import DatabaseHandler
+
+    handler = DatabaseHandler(database_url, sslmode=sslmode)
+    try:
+        for table, file_name in TABLE_FILES:
+            handler.bulk_load_csv(os.path.join(out_dir, file_name), table)
+    finally:
+        handler.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic FarmZilla dataset for load testing')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help='Preset row counts (individual counts below override it)')
+    for table in SCALES['small']:
+        parser.add_argument(f"--{table.replace('_', '-')}", type=int, dest=table,
+                            help=f'Number of {table.replace("_", " ")} rows')
+    parser.add_argument('--producer-fraction', type=float, default=0.05,
+                        help='Share of users that are producers')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed, same dataset)')
+    parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Plain password shared by all users')
+    parser.add_argument('--out-dir', help='Output directory (default: data/generated/<scale>)')
+    parser.add_argument('--load', action='store_true', help='Bulk load the files into the database afterwards')
+    parser.add_argument('--database-url', default=os.environ.get('AWS_RDS_URL'),
+                        help='PostgreSQL URL used with --load (default: AWS_RDS_URL)')
+    parser.add_argument('--sslmode', default='prefer', help='sslmode used with --load')
+    args = parser.parse_args()
+
+    counts = dict(SCALES[args.scale])
+    for table in counts:
+        if getattr(args, table) is not None:
+            counts[table] = getattr(args, table)
+
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    out_dir = args.out_dir or os.path.join(project_root, 'data', 'generated', args.scale)
+
+    print(f"🌱 Generating FarmZilla dataset (seed={args.seed}) into {out_dir}")
+    started = time.perf_counter()
+    row_counts = generate_dataset(counts, out_dir, seed=args.seed,
+                                  producer_fraction=args.producer_fraction, password=args.password)
+    print(f"✅ Generated {sum(row_counts.values()):,} rows in {time.perf_counter() - started:.1f}s")
+
+    if args.load:
+        if not args.database_url:
+            parser.error('--load requires --database-url or AWS_RDS_URL')
+        load_dataset(args.database_url, out_dir, sslmode=args.sslmode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Background job worker for FarmZilla.
+
+Runs the jobs request handlers queue in background_jobs (see tasks.py) on
+JOB_WORKER_CONCURRENCY threads. Run one or more next to the API with the same
+image and environment; workers share the queue through FOR UPDATE SKIP LOCKED.
+On SIGTERM running jobs finish before the worker exits. With
+JOB_WORKER_METRICS_PORT set, /metrics is served on that port.
+
+Usage (from the project root):
+    python -m back_end.src.job_worker
+    python -m back_end.src.job_worker --until-empty
+"""
+
+import argparse
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .settings import settings
+from .tasks import registry
+from .utils.jobs import JobWorker
+from .utils.metrics import REGISTRY
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run queued background jobs')
+    parser.add_argument('--until-empty', action='store_true', help='Run due jobs one at a time and exit')
+    args = parser.parse_args()
+
+    worker = JobWorker(
+        settings.session_factory,
+        registry,
+        concurrency=settings.job_worker_concurrency,
+        lease_seconds=settings.job_lease_seconds,
+        poll_interval=settings.job_poll_interval,
+        backoff_base_seconds=settings.job_backoff_base_seconds,
+        backoff_max_seconds=settings.job_backoff_max_seconds,
+        retention_days=settings.job_retention_days,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+
+    try:
+        if args.until_empty:
+            print(f"✅ Ran {worker.run_until_empty()} background job(s)")
+            return
+        if settings.job_worker_metrics_port:
+            server = ThreadingHTTPServer(('0.0.0.0', settings.job_worker_metrics_port), MetricsHandler)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"✅ Job worker {worker.worker_id} started, {settings.job_worker_concurrency} thread(s), "
+              f"kinds: {', '.join(registry.handlers)}")
+        worker.run()
+    finally:
+        settings.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,65 +1,73 @@
-import boto3
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response, UploadFile, status
 from uuid import uuid4, UUID
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
-from dotenv import load_dotenv
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import os
-import boto3
-from botocore.exceptions import ClientError
-
-# Load environment variables
-load_dotenv()
 
 # security imports
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt
 from datetime import datetime, timedelta
+import secrets
 
 # custom imports
+from .settings import settings
 from .models import (
+    Base,
     User, UserModel,
     Product, ProductModel,
     ProducerConsumerMatch, ProducerConsumerMatchModel,
     Event, EventModel,
     EventVendor, EventVendorModel,
-    Rating, RatingModel
+    Rating, RatingModel,
+    NewsletterRequest,
+    BackgroundJobRequest
+)
+from .utils.request_timing import RequestTimingMiddleware, timing_summary
+from .utils.compression import CompressionMiddleware
+from .utils.metrics import REGISTRY
+from .utils.warmup import Warmup
+from .utils.product_search import MAX_PAGE_SIZE, search_products
+from .utils import marketplace
+from .utils import feed
+from .utils import newsletter
+from .utils import customers
+from .utils import jobs
+from .utils import encoders
+from .tasks import registry as job_registry, DELETE_S3_OBJECT
+from .utils.db_routing import LAST_WRITE_HEADER, ReadYourWritesMiddleware, last_write_time
+from .utils.profiler import (
+    MAX_PROFILE_SECONDS, ProfilerBusy, RequestProfilerMiddleware, SamplingProfiler,
+    find_profile, list_profiles, store_profile
 )
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
+
 
+# Configuration lives in settings.py, the engine, S3 client and bcrypt
+# context are created there on first use to keep startup fast
+AWS_BUCKET_NAME = settings.bucket_name
 
-# Load the database connection string from environment variable or .env file
-DATABASE_URL = os.environ.get("AWS_RDS_URL")
-AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
+# Largest page of /api/v1/events/
+MAX_EVENTS_PAGE_SIZE = 500
 
 # secure the API with OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-# creating connection to the database with connection pooling and timeouts
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=10,
-    max_overflow=20,
-    pool_timeout=30,
-    pool_recycle=3600,  # Recycle connections after 1 hour
-    pool_pre_ping=True,  # Validate connections before use
-    connect_args={
-        "connect_timeout": 10,
-        "options": "-c timezone=utc"
-    }
-)
-s3 = boto3.client('s3')
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
-
-# Dependency to get the database session
-def get_db():
-    db = SessionLocal()
+# Dependency to get the database session, GET requests are served from a read
+# replica (when AWS_RDS_REPLICA_URLS is set) unless the client wrote recently. Handlers
+# must let OperationalError through so a failing replica is taken out of rotation
+def get_db(request: Request):
+    db, replica = settings.router.session(request.method, last_write_time(request))
     try:
         yield db
+    except OperationalError as e:
+        if replica is not None:
+            settings.router.mark_failed(replica, e)
+        raise
     finally:
         db.close()
 
@@ -68,14 +76,24 @@ app = FastAPI(title="FarmZilla", version="1.0.0")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database tables on startup"""
-    try:
-        # Create the database tables (if they don't already exist)
-        Base.metadata.create_all(bind=engine)
-        print("✅ Database tables created successfully")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not create database tables: {e}")
-        # Don't crash the app, let it start and handle DB errors per request
+    """Create tables when DB_CREATE_TABLES_ON_STARTUP is set, then start the warm-up"""
+    if settings.create_tables_on_startup:
+        try:
+            # Create the database tables (if they don't already exist)
+            Base.metadata.create_all(bind=settings.engine)
+            print("✅ Database tables created successfully")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not create database tables: {e}")
+            # Don't crash the app, let it start and handle DB errors per request
+    # /readyz reports ready once the warm-up steps (defined in PART 4) have passed
+    warmup.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled connections once uvicorn has drained in-flight requests"""
+    warmup.stop()
+    settings.close()
+    print("✅ Database connections closed")
 
 # Add CORS middleware to allow requests 
 origins = [
@@ -92,14 +110,55 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", LAST_WRITE_HEADER],
 )
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Stamp successful writes so the client's next reads go to the primary
+if settings.replica_urls:
+    app.add_middleware(ReadYourWritesMiddleware, window_seconds=settings.read_your_writes_seconds)
+
+# Compress JSON responses with zstd, Brotli or gzip as the client accepts; added before
+# the timing middleware so its byte counts and durations include compression
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        offload_size=settings.compression_offload_size,
+        busy_utilization=settings.compression_busy_utilization,
+    )
+
+# Per-request timing with SQL accounting, flags requests running more than N statements
+app.add_middleware(
+    RequestTimingMiddleware,
+    query_threshold=settings.query_count_warn_threshold,
+)
 
 # JWT configuration from environment variables
-SECRET_KEY = os.environ.get("AUTH_SECRET_KEY")
-ALGORITHM = os.environ.get("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+SECRET_KEY = settings.secret_key
+ALGORITHM = settings.algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.access_token_expire_minutes
+
+# Admin endpoints are only enabled when ADMIN_TOKEN is set
+ADMIN_TOKEN = settings.admin_token
+
+# Profile a single request when it sends X-Profile-Request: <ADMIN_TOKEN>
+app.add_middleware(RequestProfilerMiddleware, token=ADMIN_TOKEN)
+
+# Dependency protecting the admin endpoints with the X-Admin-Token header
+# (or "Authorization: Bearer <ADMIN_TOKEN>", which Prometheus scrapers can send)
+def require_admin(x_admin_token: str | None = Header(None), authorization: str | None = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_token and authorization and authorization.lower().startswith("bearer "):
+        x_admin_token = authorization[7:]
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+# Dependency picking a list endpoint's format (json, msgpack or arrow) from the Accept header.
+# Every format is served from the same URL, so JSON responses also tell caches to vary on Accept
+def response_format(request: Request, response: Response) -> str:
+    response.headers["Vary"] = "Accept"
+    return encoders.negotiate(request.headers.get("accept"))
 
 
 #-------------------------------------------------#
@@ -110,6 +169,21 @@ async def root():
     return {"message": "Hello World"}
 
 
+# liveness: the worker process and its event loop are responsive
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+# readiness: the warm-up has opened the pool and exercised the hot paths
+@app.get("/readyz")
+async def readyz():
+    state = warmup.status()
+    if state["status"] != "ready":
+        return JSONResponse(state, status_code=503)
+    return state
+
+
 @app.get("/api/v1/user/")
 async def fetch_users(user_id: str = None, username: str = None, db: Session = Depends(get_db)):
     if user_id:
@@ -122,12 +196,102 @@ async def fetch_users(user_id: str = None, username: str = None, db: Session = D
 
 
 @app.get("/api/v1/products/")
-async def fetch_products(product_id: str = None, db: Session = Depends(get_db)):
+async def fetch_products(product_id: str = None, format: str = Depends(response_format), db: Session = Depends(get_db)):
+    query = db.query(Product)
     if product_id:
-        products = db.query(Product).filter(Product.product_id == product_id).all()
-    else:
-        products = db.query(Product).all()
-    return [ProductModel.from_orm(product) for product in products]
+        query = query.filter(Product.product_id == product_id)
+    if format != "json":
+        return encoders.list_response(db, query, ProductModel, format)
+    return [ProductModel.from_orm(product) for product in query.all()]
+
+# ranked full-text search over product names and descriptions, tolerant of typos
+@app.get("/api/v1/products/search")
+async def search_products_endpoint(q: str, limit: int = 20, cursor: str = None, db: Session = Depends(get_db)):
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query cannot be empty")
+
+    try:
+        page = search_products(db, q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"query": q, "limit": limit, **page}
+
+# marketplace product grid: products with producer names and rating aggregates,
+# sorted by rating, price, distance (needs lat/lng) or recency, keyset paginated
+@app.get("/api/v1/marketplace/products")
+async def fetch_marketplace_products(
+    sort: str = "rating",
+    limit: int = 24,
+    cursor: str = None,
+    event_id: str = None,
+    lat: float = None,
+    lng: float = None,
+    db: Session = Depends(get_db)
+):
+    if not 1 <= limit <= marketplace.MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {marketplace.MAX_PAGE_SIZE}")
+    try:
+        return marketplace.list_products(db, sort, limit, cursor, event_id, lat, lng)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# consumer feed: new products and events of followed producers, newest first,
+# cached per consumer until a followed producer changes
+@app.get("/api/v1/consumers/{consumer_id}/feed")
+async def fetch_consumer_feed(consumer_id: str, limit: int = 20, cursor: str = None, db: Session = Depends(get_db)):
+    if not 1 <= limit <= feed.MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {feed.MAX_PAGE_SIZE}")
+    try:
+        return feed.consumer_feed(db, consumer_id, limit, cursor, cache=settings.feed_cache)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# customers of a producer with their profiles, newest followers first, keyset paginated
+@app.get("/api/v1/producers/{producer_id}/customers")
+async def fetch_producer_customers(producer_id: str, limit: int = 50, cursor: str = None, db: Session = Depends(get_db)):
+    if not 1 <= limit <= customers.MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {customers.MAX_PAGE_SIZE}")
+    try:
+        return customers.list_customers(db, producer_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# new followers of a producer per day or week
+@app.get("/api/v1/producers/{producer_id}/customers/growth")
+async def fetch_producer_customer_growth(
+    producer_id: str, period: str = "day", periods: int = 30, db: Session = Depends(get_db)
+):
+    try:
+        return customers.follower_growth(db, producer_id, period, periods)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# followers of a producer, the recipients of its newsletters, in pages
+@app.get("/api/v1/producers/{producer_id}/subscribers")
+async def fetch_producer_subscribers(producer_id: str, limit: int = 50, cursor: str = None, db: Session = Depends(get_db)):
+    if not 1 <= limit <= newsletter.MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {newsletter.MAX_PAGE_SIZE}")
+    try:
+        return newsletter.list_subscribers(db, producer_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# newsletter sends of a producer, newest first
+@app.get("/api/v1/producers/{producer_id}/newsletters")
+async def fetch_producer_newsletters(producer_id: str, limit: int = 20, db: Session = Depends(get_db)):
+    if not 1 <= limit <= newsletter.MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {newsletter.MAX_PAGE_SIZE}")
+    return newsletter.list_jobs(db, producer_id, limit)
+
+# progress of a newsletter send
+@app.get("/api/v1/newsletters/{job_id}")
+async def fetch_newsletter(job_id: UUID, db: Session = Depends(get_db)):
+    job = newsletter.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Newsletter not found")
+    return job
 
 @app.get("/api/v1/products/user/{user_id}")
 async def fetch_user_products(user_id: str, db: Session = Depends(get_db)):
@@ -139,6 +303,8 @@ async def fetch_user_products(user_id: str, db: Session = Depends(get_db)):
         return [ProductModel.from_orm(product) for product in products]
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user ID format")
+    except OperationalError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching products: {str(e)}")
 
@@ -147,6 +313,7 @@ async def fetch_producer_consumer_matches(
     match_id: str = None, 
     producer_id: str = None, 
     consumer_id: str = None, 
+    format: str = Depends(response_format),
     db: Session = Depends(get_db)
 ):
     """
@@ -168,11 +335,15 @@ async def fetch_producer_consumer_matches(
         elif consumer_id:
             query = query.filter(ProducerConsumerMatch.consumer_id == consumer_id)
         
+        if format != "json":
+            return encoders.list_response(db, query, ProducerConsumerMatchModel, format)
         matches = query.all()
         return [ProducerConsumerMatchModel.from_orm(match) for match in matches]
         
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid ID format")
+    except OperationalError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching producer-consumer matches: {str(e)}")
 
@@ -192,22 +363,50 @@ async def get_username_by_id(user_id: str, db: Session = Depends(get_db)):
         return {"username": user.username}
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user ID format")
+    except OperationalError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching username: {str(e)}")
 
 @app.get("/api/v1/events/")
-async def fetch_events(event_id: str = None, db: Session = Depends(get_db)):
+async def fetch_events(
+    event_id: str = None,
+    producer_id: str = None,
+    limit: int = None,
+    offset: int = 0,
+    format: str = Depends(response_format),
+    db: Session = Depends(get_db)
+):
     """
-    Fetch events with optional filter:
+    Fetch events with optional filters, ordered by date and time:
     - event_id: specific event by event_id
+    - producer_id: events the producer sells at (joined through event_vendor)
+    - limit/offset: one page of the result
     - no parameters: all events
     """
+    if limit is not None and not 1 <= limit <= MAX_EVENTS_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_EVENTS_PAGE_SIZE}")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
     try:
+        query = db.query(Event)
         if event_id:
-            events = db.query(Event).filter(Event.event_id == event_id).all()
-        else:
-            events = db.query(Event).all()
-        return [EventModel.from_orm(event) for event in events]
+            query = query.filter(Event.event_id == event_id)
+        if producer_id:
+            # event_vendor is indexed on producer_id and events on event_id, so only the
+            # producer's rows are read
+            query = query.join(EventVendor, EventVendor.event_id == Event.event_id).filter(
+                EventVendor.producer_id == producer_id)
+        query = query.order_by(Event.date, Event.time, Event.event_id)
+        if limit is not None:
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+        if format != "json":
+            return encoders.list_response(db, query, EventModel, format)
+        return [EventModel.from_orm(event) for event in query.all()]
+    except OperationalError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching events: {str(e)}")
 
@@ -230,11 +429,18 @@ async def fetch_event_vendors(event_id: str = None, producer_id: str = None, db:
         event_vendors = query.all()
         return [EventVendorModel.from_orm(event_vendor) for event_vendor in event_vendors]
         
+    except OperationalError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching event vendors: {str(e)}")
 
 @app.get("/api/v1/ratings/")
-async def fetch_ratings(producer_id: str = None, consumer_id: str = None, db: Session = Depends(get_db)):
+async def fetch_ratings(
+    producer_id: str = None,
+    consumer_id: str = None,
+    format: str = Depends(response_format),
+    db: Session = Depends(get_db)
+):
     """
     Fetch ratings with optional filters:
     - producer_id: all ratings for a specific producer
@@ -249,9 +455,13 @@ async def fetch_ratings(producer_id: str = None, consumer_id: str = None, db: Se
         elif consumer_id:
             query = query.filter(Rating.consumer_id == consumer_id)
         
+        if format != "json":
+            return encoders.list_response(db, query, RatingModel, format)
         ratings = query.all()
         return [RatingModel.from_orm(rating) for rating in ratings]
         
+    except OperationalError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching ratings: {str(e)}")
 
@@ -273,11 +483,6 @@ async def verify_token_endpoint(token: str):
 
 @app.post("/api/v1/user/")
 async def create_user(user: UserModel, db: Session = Depends(get_db)):
-    # Check if the entry already exists
-    existing = db.query(User).filter_by(username=user.username).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="User already exists.")
-
     # Validate role
     if user.role not in ["producer", "consumer"]:
         raise HTTPException(
@@ -295,7 +500,7 @@ async def create_user(user: UserModel, db: Session = Depends(get_db)):
     password = user.password
 
     # Hash the password before storing
-    hashed_password = pwd_context.hash(password)
+    hashed_password = await hash_password(password)
 
     # Only include id if provided, otherwise let SQLAlchemy generate it
     user_data = {
@@ -310,31 +515,39 @@ async def create_user(user: UserModel, db: Session = Depends(get_db)):
     if user.id is not None:
         user_data["id"] = UUID(str(user.id))
 
-    db_user = User(**user_data)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db_user = insert_unless_exists(db, User, user_data, ["username"])
+    if db_user is None:
+        raise HTTPException(status_code=400, detail="User already exists.")
     return db_user
 
 # for creating a new product
 @app.post("/api/v1/products/")
 async def create_product(product: ProductModel, db: Session = Depends(get_db)):
-    # Check if the entry already exists for this user
-    existing = db.query(Product).filter_by(
-        product_name=product.product_name, 
-        user_id=product.user_id
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Product with this name already exists for this user.")
-
     # Generate a unique product_id if not provided or if it's the placeholder
     if not product.product_id or product.product_id == "test_id":
         product.product_id = str(uuid4())[:8].upper()  # Generate 8-character uppercase ID
 
-    db_product = Product(**product.dict())
-    db.add(db_product)
-    db.commit()
-    db.refresh(db_product)
+    # Unset optional fields are left out so id and created_at get their defaults
+    product_data = product.dict(exclude_none=True)
+
+    # The unique index treats NULL user_ids as distinct, so products without an owner
+    # are checked by name first
+    if product.user_id is None and db.query(Product.id).filter(
+        Product.user_id.is_(None), Product.product_name == product.product_name
+    ).first() is not None:
+        raise HTTPException(status_code=400, detail="Product with this name already exists for this user.")
+
+    # The name is unique per user, a conflict means the user already has this product.
+    # Other unique columns (product_id, id) are not covered by ON CONFLICT and raise
+    try:
+        db_product = insert_unless_exists(db, Product, product_data, ["user_id", "product_name"])
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Product with this product_id already exists.")
+    if db_product is None:
+        raise HTTPException(status_code=400, detail="Product with this name already exists for this user.")
+    if db_product["user_id"] is not None:
+        settings.feed_cache.invalidate(feed.producer_tag(db_product["user_id"]))
     return db_product
 
 # for generating a JWT token for user authentication
@@ -343,7 +556,7 @@ async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = user_authentication(db, form_data.username, form_data.password)
+    user = await user_authentication(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -361,7 +574,7 @@ async def upload_file_to_s3(file: UploadFile | None = None):
     if file is None:
         return {"error": "No file provided"}
     try:
-        s3.upload_fileobj(file.file, AWS_BUCKET_NAME, file.filename)
+        settings.s3.upload_fileobj(file.file, AWS_BUCKET_NAME, file.filename)
         return {"message": "File uploaded successfully"}
     except Exception as e:
         return {"error": str(e)}
@@ -373,34 +586,26 @@ async def create_producer_consumer_match(producer_id: str, consumer_id: str, db:
     Create a new producer-consumer match
     """
     try:
-        # Check if the match already exists
-        existing_match = db.query(ProducerConsumerMatch).filter(
-            ProducerConsumerMatch.producer_id == producer_id,
-            ProducerConsumerMatch.consumer_id == consumer_id
-        ).first()
+        # Create new match, nothing is inserted if the pair already exists
+        new_match = insert_unless_exists(
+            db, ProducerConsumerMatch,
+            {"producer_id": producer_id, "consumer_id": consumer_id},
+            ["producer_id", "consumer_id"]
+        )
         
-        if existing_match:
+        if new_match is None:
             raise HTTPException(
                 status_code=400, 
                 detail=f"Match between producer '{producer_id}' and consumer '{consumer_id}' already exists"
             )
-        
-        # Create new match
-        new_match = ProducerConsumerMatch(
-            producer_id=producer_id,
-            consumer_id=consumer_id
-        )
-        
-        db.add(new_match)
-        db.commit()
-        db.refresh(new_match)
+        settings.feed_cache.invalidate(feed.consumer_tag(consumer_id))
         
         return {
             "message": f"Producer-consumer match created successfully",
-            "match_id": str(new_match.id),
+            "match_id": str(new_match["id"]),
             "producer_id": producer_id,
             "consumer_id": consumer_id,
-            "created_at": new_match.created_at.isoformat()
+            "created_at": new_match["created_at"].isoformat()
         }
         
     except HTTPException:
@@ -419,20 +624,16 @@ async def create_event(event: EventModel, db: Session = Depends(get_db)):
     Create a new event
     """
     try:
-        # Check if event with same event_id already exists
-        existing = db.query(Event).filter_by(event_id=event.event_id).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="Event with this event_id already exists.")
-
         # Generate a unique event_id if not provided
         if not event.event_id:
             event.event_id = str(uuid4())[:8].upper()
 
-        db_event = Event(**event.dict())
-        db.add(db_event)
-        db.commit()
-        db.refresh(db_event)
-        return EventModel.from_orm(db_event)
+        event_data = event.dict(exclude_none=True)
+
+        db_event = insert_unless_exists(db, Event, event_data, ["event_id"])
+        if db_event is None:
+            raise HTTPException(status_code=400, detail="Event with this event_id already exists.")
+        return EventModel(**db_event)
         
     except HTTPException:
         raise
@@ -447,31 +648,23 @@ async def create_event_vendor(event_id: str, producer_id: str, db: Session = Dep
     Create a new event vendor relationship
     """
     try:
-        # Check if the relationship already exists
-        existing = db.query(EventVendor).filter(
-            EventVendor.event_id == event_id,
-            EventVendor.producer_id == producer_id
-        ).first()
+        # Create new event vendor relationship, nothing is inserted if it already exists
+        new_event_vendor = insert_unless_exists(
+            db, EventVendor,
+            {"event_id": event_id, "producer_id": producer_id},
+            ["event_id", "producer_id"]
+        )
         
-        if existing:
+        if new_event_vendor is None:
             raise HTTPException(
                 status_code=400, 
                 detail=f"Event vendor relationship between event '{event_id}' and producer '{producer_id}' already exists"
             )
-        
-        # Create new event vendor relationship
-        new_event_vendor = EventVendor(
-            event_id=event_id,
-            producer_id=producer_id
-        )
-        
-        db.add(new_event_vendor)
-        db.commit()
-        db.refresh(new_event_vendor)
+        settings.feed_cache.invalidate(feed.producer_tag(producer_id))
         
         return {
             "message": "Event vendor relationship created successfully",
-            "id": str(new_event_vendor.id),
+            "id": str(new_event_vendor["id"]),
             "event_id": event_id,
             "producer_id": producer_id
         }
@@ -493,30 +686,24 @@ async def create_rating(rating: RatingModel, db: Session = Depends(get_db)):
         if rating.rating < 1 or rating.rating > 5:
             raise HTTPException(status_code=400, detail="Rating must be between 1 and 5")
         
-        # Check if consumer has already rated this producer
-        existing_rating = db.query(Rating).filter(
-            Rating.producer_id == rating.producer_id,
-            Rating.consumer_id == rating.consumer_id
-        ).first()
-        
-        if existing_rating:
-            raise HTTPException(status_code=400, detail="You have already rated this producer")
-        
-        # Create new rating
+        # Create new rating, a consumer can rate each producer once
         rating_data = rating.dict()
         if rating_data.get('id') is None:
             rating_data.pop('id', None)
         if rating_data.get('date') is None:
             rating_data['date'] = datetime.utcnow()
         
-        new_rating = Rating(**rating_data)
-        db.add(new_rating)
+        new_rating = insert_unless_exists(db, Rating, rating_data, ["producer_id", "consumer_id"], commit=False)
+        if new_rating is None:
+            db.rollback()
+            raise HTTPException(status_code=400, detail="You have already rated this producer")
+        # Keep the producer's totals for the marketplace listing in the same transaction
+        marketplace.record_rating(db, rating.producer_id, rating.rating)
         db.commit()
-        db.refresh(new_rating)
         
         return {
             "message": "Rating created successfully",
-            "id": str(new_rating.id),
+            "id": str(new_rating["id"]),
             "producer_id": rating.producer_id,
             "consumer_id": rating.consumer_id,
             "rating": rating.rating
@@ -527,6 +714,56 @@ async def create_rating(rating: RatingModel, db: Session = Depends(get_db)):
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error creating rating: {str(e)}")
+
+# queue a newsletter to the producer's followers, sent by newsletter_worker.py
+@app.post("/api/v1/producers/{producer_id}/newsletters", status_code=status.HTTP_202_ACCEPTED)
+async def create_newsletter(
+    producer_id: str,
+    request: NewsletterRequest,
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    # Only the producer, signed in with their own token, can mail their followers
+    payload = verify_token(token)
+    try:
+        producer_name = db.query(User.username).filter(User.id == UUID(producer_id)).scalar()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid producer ID format")
+    if producer_name is None:
+        raise HTTPException(status_code=404, detail="Producer not found")
+    if producer_name != payload["sub"]:
+        raise HTTPException(status_code=403, detail="Only the producer can send their newsletter")
+    try:
+        job = newsletter.enqueue_newsletter(db, producer_id, request.subject, request.message)
+    except ValueError as e:
+        raise HTTPException(status_code=404 if str(e) == "Producer not found" else 400, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error queueing newsletter: {str(e)}")
+    if job is None:
+        raise HTTPException(status_code=400, detail="A newsletter for this producer is already being sent")
+    print(f"✅ Newsletter {job['id']} queued for producer {producer_id}")
+    return job
+
+# stop a queued or running newsletter, a running one stops after its current batch
+@app.post("/api/v1/newsletters/{job_id}/cancel")
+async def cancel_newsletter(job_id: UUID, db: Session = Depends(get_db)):
+    job = newsletter.cancel_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=400, detail="Newsletter not found or already finished")
+    return job
+
+# queue a failed or cancelled newsletter again, it continues where it stopped
+@app.post("/api/v1/newsletters/{job_id}/resume")
+async def resume_newsletter(job_id: UUID, db: Session = Depends(get_db)):
+    try:
+        job = newsletter.resume_job(db, job_id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="A newsletter for this producer is already being sent")
+    if job is None:
+        raise HTTPException(status_code=400, detail="Only failed or cancelled newsletters can be resumed")
+    return job
     
 
 #-------------------------------------------------#
@@ -542,21 +779,21 @@ async def update_user_profile(user_id: str, user_data: dict, db: Session = Depen
         # Convert string to UUID
         user_uuid = UUID(user_id)
         
-        # Find the user
-        user = db.query(User).filter(User.id == user_uuid).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Update only allowed fields
+        # Update only allowed fields, UPDATE ... RETURNING reads the row back in the same statement
         allowed_fields = ['email', 'phone_number', 'description']
-        for field, value in user_data.items():
-            if field in allowed_fields and hasattr(user, field):
-                setattr(user, field, value)
-        
+        values = {field: value for field, value in user_data.items() if field in allowed_fields}
+        users = User.__table__
+        if values:
+            statement = update(users).where(users.c.id == user_uuid).values(**values).returning(*users.c)
+        else:
+            statement = select(users).where(users.c.id == user_uuid)
+        user = db.execute(statement).mappings().first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
         db.commit()
-        db.refresh(user)
+        settings.feed_cache.invalidate(feed.producer_tag(user["id"]))
         
-        return UserModel.from_orm(user)
+        return UserModel(**user)
         
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid user ID format")
@@ -570,15 +807,93 @@ async def update_user_profile(user_id: str, user_data: dict, db: Session = Depen
 # ----------PART 4: HELPER METHODS----------------#
 #-------------------------------------------------#
 
+# helper functions running bcrypt on the password executor
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(settings.password_executor, settings.pwd_context.hash, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(settings.password_executor, settings.pwd_context.verify, password, hashed)
+
+# helper inserting a row with INSERT ... ON CONFLICT DO NOTHING RETURNING, one round
+# trip that stays correct under concurrent requests. conflict_columns must match a
+# unique index (see models.py); returns the inserted row as a dict, or None when
+# a row with the same key already exists. With commit=False the caller commits
+def insert_unless_exists(db: Session, model, values: dict, conflict_columns: list, commit: bool = True):
+    table = model.__table__
+    statement = (
+        pg_insert(table)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=conflict_columns)
+        .returning(*[column for column in table.c if column.computed is None])
+    )
+    row = db.execute(statement).mappings().first()
+    if commit:
+        db.commit()
+    return dict(row) if row is not None else None
+
 # helper function to authenticate user by hasing password
-def user_authentication(db: Session, username: str, password: str):
+async def user_authentication(db: Session, username: str, password: str):
     user = db.query(User).filter(User.username == username).first()
     if not user:
         return None
-    if not pwd_context.verify(password, user.password):
+    if not await verify_password(password, user.password):
         return None
     return user
 
+# warm-up steps run by the startup event before /readyz reports ready
+def open_pool(engine):
+    connections = []
+    # NullPool (DB_POOL_MODE=transaction) has no size, one connection checks the pooler
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+    try:
+        for _ in range(size):
+            connection = engine.connect()
+            connection.exec_driver_sql("SELECT 1")
+            connections.append(connection)
+    finally:
+        for connection in connections:
+            connection.close()
+
+def warm_database_pool():
+    """Open pool_size connections up front so first requests skip TCP+TLS+auth to RDS"""
+    open_pool(settings.engine)
+    # Replicas are optional for readiness, reads fall back to the primary
+    for replica in settings.router.replicas:
+        try:
+            open_pool(replica.engine)
+        except Exception as e:
+            print(f"⚠️ Could not warm up {replica.name}: {e}")
+
+def warm_clients():
+    """Load the bcrypt backend, JWT signing and the S3 client"""
+    hashed = settings.pwd_context.hash("warmup-password")
+    settings.pwd_context.verify("warmup-password", hashed)
+    settings.password_executor.submit(settings.pwd_context.verify, "warmup-password", hashed).result()
+    verify_token(create_access_token({"sub": "warmup"}, timedelta(minutes=1)))
+    settings.s3
+
+def warm_hot_routes():
+    """Run the query shape of each hot route once, priming statement caches and buffers"""
+    db = settings.session_factory()
+    try:
+        db.query(User).filter(User.username == "").first()
+        db.query(Product).limit(1).all()
+        db.query(Product).filter(Product.user_id == uuid4()).all()
+        db.query(Event).limit(1).all()
+        db.query(EventVendor).filter(EventVendor.event_id == "").all()
+        db.query(Rating).filter(Rating.producer_id == "").all()
+        db.query(ProducerConsumerMatch).filter(ProducerConsumerMatch.consumer_id == "").all()
+    finally:
+        db.close()
+
+warmup = Warmup([
+    ("database_pool", warm_database_pool),
+    ("clients", warm_clients),
+    ("hot_routes", warm_hot_routes),
+])
+
 # helper function to create JWT access token
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -626,32 +941,21 @@ async def delete_user_product(user_id: str, product_id: str, db: Session = Depen
                 detail=f"Product with ID '{product_id}' not found for user '{user_id}'"
             )
         
-        # Store image_url before deleting the product
-        image_url = product.image_url
-        
         # Delete the product from the database
         db.delete(product)
-        db.commit()
         
-        # Delete the image from S3 if it exists
+        # Queue the S3 image deletion in the same transaction, the job worker removes it
+        # only if the product is really gone and retries while S3 is unavailable
         s3_deletion_status = "No image to delete"
-        if image_url:
-            try:
-                # Extract the S3 key from the image URL
-                s3_key = image_url.split('amazonaws.com/')[-1]
-                
-                # Delete the object from S3
-                s3.delete_object(Bucket=AWS_BUCKET_NAME, Key=s3_key)
-                s3_deletion_status = f"Image '{s3_key}' deleted from S3"
-                
-            except ClientError as e:
-                error_code = e.response['Error']['Code']
-                if error_code == 'NoSuchKey':
-                    s3_deletion_status = f"Image was already missing from S3"
-                else:
-                    s3_deletion_status = f"Failed to delete image from S3: {str(e)}"
-            except Exception as e:
-                s3_deletion_status = f"Error processing S3 deletion: {str(e)}"
+        if product.image_url:
+            # Extract the S3 key from the image URL
+            s3_key = product.image_url.split('amazonaws.com/')[-1]
+            jobs.enqueue(db, DELETE_S3_OBJECT, {'bucket': AWS_BUCKET_NAME, 'key': s3_key},
+                         idempotency_key=f"product-image:{product.id}", commit=False)
+            s3_deletion_status = f"Deletion of image '{s3_key}' queued"
+        
+        db.commit()
+        settings.feed_cache.invalidate(feed.producer_tag(user_uuid))
         
         return {
             "message": f"Product '{product_id}' deleted successfully for user '{user_id}'",
@@ -691,6 +995,7 @@ async def delete_producer_consumer_match(producer_id: str, consumer_id: str, db:
         # Delete the match
         db.delete(match)
         db.commit()
+        settings.feed_cache.invalidate(feed.consumer_tag(consumer_id))
         
         return {
             "message": f"Producer-consumer match deleted successfully",
@@ -723,9 +1028,14 @@ async def delete_event(event_id: str, db: Session = Depends(get_db)):
                 detail=f"Event with ID '{event_id}' not found"
             )
         
+        # Vendors of the event see it disappear from their followers' feeds
+        vendor_ids = [producer_id for (producer_id,) in
+                      db.query(EventVendor.producer_id).filter(EventVendor.event_id == event_id)]
+
         # Delete the event
         db.delete(event)
         db.commit()
+        settings.feed_cache.invalidate(*[feed.producer_tag(producer_id) for producer_id in vendor_ids])
         
         return {
             "message": f"Event '{event_id}' deleted successfully",
@@ -763,6 +1073,7 @@ async def delete_event_vendor(event_id: str, producer_id: str, db: Session = Dep
         # Delete the relationship
         db.delete(event_vendor)
         db.commit()
+        settings.feed_cache.invalidate(feed.producer_tag(producer_id))
         
         return {
             "message": "Event vendor relationship deleted successfully",
@@ -778,4 +1089,123 @@ async def delete_event_vendor(event_id: str, producer_id: str, db: Session = Dep
         raise HTTPException(
             status_code=500, 
             detail=f"Error deleting event vendor relationship: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+#-------------------------------------------------#
+# -----------PART 5: ADMIN METHODS----------------#
+#-------------------------------------------------#
+
+@app.get("/api/v1/admin/timing", dependencies=[Depends(require_admin)])
+async def get_request_timing():
+    """
+    Aggregated per-route request timing: latency percentiles, DB time,
+    SQL statements, rows and response size, plus how many requests ran
+    more statements than QUERY_COUNT_WARN_THRESHOLD
+    """
+    return timing_summary()
+
+
+@app.get("/api/v1/admin/slow_queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries(limit: int = 50, min_duration_ms: float = 0):
+    """
+    Most recent statements slower than SLOW_QUERY_THRESHOLD_MS with redacted
+    parameters and the issuing route. Sampled SELECTs carry their
+    EXPLAIN (ANALYZE, BUFFERS) plan and the tables it sequentially scanned.
+    """
+    return settings.slow_query_log.recent(limit=limit, min_duration_ms=min_duration_ms)
+
+
+@app.get("/api/v1/admin/jobs", dependencies=[Depends(require_admin)])
+async def get_background_jobs(db: Session = Depends(get_db)):
+    """Background job counts per kind and status, with the oldest due time of each group"""
+    return jobs.queue_stats(db)
+
+
+@app.get("/api/v1/admin/jobs/{job_id}", dependencies=[Depends(require_admin)])
+async def get_background_job(job_id: UUID, db: Session = Depends(get_db)):
+    job = jobs.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/v1/admin/jobs", dependencies=[Depends(require_admin)], status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_background_job(request: BackgroundJobRequest, db: Session = Depends(get_db)):
+    """Queue a maintenance job, e.g. marketplace.rebuild_rating_summary"""
+    if request.kind not in job_registry:
+        raise HTTPException(status_code=400, detail=f"kind must be one of {', '.join(job_registry.handlers)}")
+    return jobs.enqueue(db, request.kind, request.payload, request.priority, request.idempotency_key)
+
+
+@app.get("/api/v1/admin/replicas", dependencies=[Depends(require_admin)])
+async def get_replicas():
+    """Health, replication lag and cooldown of each read replica as seen by the router"""
+    return settings.router.status()
+
+
+@app.get("/metrics", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus text exposition of the pool gauges and checkout wait times,
+    per-route latency histograms, in-flight requests, bcrypt executor queue
+    depth and S3 call latencies. Gauges are read from the pool at scrape time.
+    """
+    return PlainTextResponse(REGISTRY.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+# helper returning a stored profile in the requested format
+def profile_response(entry: dict, format: str):
+    profiler = entry["profiler"]
+    name = f"farmzilla-profile-{entry['id']}"
+    if format == "speedscope":
+        return JSONResponse(
+            profiler.speedscope(f"{entry['kind']} {entry['target']}"),
+            headers={"Content-Disposition": f'attachment; filename="{name}.speedscope.json"'}
+        )
+    return PlainTextResponse(
+        profiler.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="{name}.collapsed.txt"'}
+    )
+
+
+@app.post("/api/v1/admin/profile", dependencies=[Depends(require_admin)])
+async def run_profile(seconds: float = 10, interval_ms: float = 10, format: str = "collapsed"):
+    """
+    Sample the stacks of every thread in this worker for the given number of
+    seconds and return a collapsed-stack file (flamegraph.pl, speedscope) or
+    speedscope JSON. Only one profile runs at a time.
+    """
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=400, detail="Format must be either 'collapsed' or 'speedscope'.")
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Seconds must be between 0 and {MAX_PROFILE_SECONDS}.")
+    if not 1 <= interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000.")
+
+    try:
+        profiler = SamplingProfiler(interval_ms / 1000).start()
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.stop()
+    entry = store_profile(profiler, "timed", f"all threads for {seconds:g}s")
+    print(f"✅ Captured profile {entry['id']}: {entry['samples']} samples over {entry['duration_s']}s")
+    return profile_response(entry, format)
+
+
+@app.get("/api/v1/admin/profiles", dependencies=[Depends(require_admin)])
+async def get_profiles():
+    """Recently captured profiles (timed and per-request) kept by this worker"""
+    return list_profiles()
+
+
+@app.get("/api/v1/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def download_profile(profile_id: int, format: str = "collapsed"):
+    if format not in ("collapsed", "speedscope"):
+        raise HTTPException(status_code=400, detail="Format must be either 'collapsed' or 'speedscope'.")
+    entry = find_profile(profile_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile_response(entry, format)
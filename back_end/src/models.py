@@ -2,7 +2,8 @@ from pydantic import BaseModel
 from uuid import UUID,uuid4
 from typing import Optional
 from enum import Enum
-from sqlalchemy import Column, String, Float, Integer, DateTime
+from sqlalchemy import Column, String, Float, Integer, DateTime, Index, Computed, DDL, event, text
+from sqlalchemy.orm import deferred
 import sqlalchemy.dialects.postgresql as pg
 from sqlalchemy.dialects.postgresql import UUID as SA_UUID
 from sqlalchemy.ext.declarative import declarative_base
@@ -11,19 +12,28 @@ from uuid import UUID
 from sqlalchemy import Enum as SAEnum
 from datetime import datetime
 
-# loading sql model
-from sqlmodel import Field, Session, SQLModel, create_engine, select
-
 
 # Initialize the base class for SQLAlchemy models
 Base = declarative_base()
 
+# The trigram indexes on products need the pg_trgm extension
+event.listen(Base.metadata, "before_create",
+             DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+# Weighted full-text document for product search, names rank above descriptions
+PRODUCT_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(product_name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
 class UserRole(str, Enum):
     producer = "producer"
     consumer = "consumer"
 
 class User(Base):
     __tablename__ = "users"  # Table name in the PostgreSQL database
+    # Unique natural keys back the INSERT ... ON CONFLICT statements in main.py
+    __table_args__ = (Index("uq_users_username", "username", unique=True),)
 
     id = Column(pg.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     username = Column(String, nullable=False)
@@ -51,6 +61,13 @@ class UserModel(BaseModel):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("uq_products_user_product_name", "user_id", "product_name", unique=True),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_products_created_at", "created_at", "product_id"),
+        Index("ix_products_name_trgm", "product_name", postgresql_using="gin",
+              postgresql_ops={"product_name": "gin_trgm_ops"}),
+    )
     id = Column(pg.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     product_id = Column(String, unique=True, nullable=False)
     product_name = Column(String, nullable=False)
@@ -59,6 +76,9 @@ class Product(Base):
     user_id = Column(pg.UUID(as_uuid=True), nullable=True)  # Link to user who created the product
     cost = Column(Float, nullable=True)  # Product cost
     unit = Column(String, nullable=True)  # Product unit (each or lb)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=text("CURRENT_TIMESTAMP"))
+    # Maintained by PostgreSQL, only read by the search endpoint so never loaded with the row
+    search_vector = deferred(Column(pg.TSVECTOR, Computed(PRODUCT_SEARCH_VECTOR, persisted=True)))
 
 class ProductModel(BaseModel):
     id: Optional[UUID] = None
@@ -69,12 +89,18 @@ class ProductModel(BaseModel):
     user_id: Optional[UUID] = None  # Link to user who created the product
     cost: Optional[float] = None  # Product cost
     unit: Optional[str] = None  # Product unit (each or lb)
+    created_at: Optional[datetime] = None
     class Config:
         orm_mode = True
         from_attributes = True
 
 class ProducerConsumerMatch(Base):
     __tablename__ = "producer_consumer_matches"
+    __table_args__ = (
+        Index("uq_producer_consumer_matches_pair", "producer_id", "consumer_id", unique=True),
+        Index("ix_producer_consumer_matches_consumer", "consumer_id"),
+        Index("ix_producer_consumer_matches_producer_created", "producer_id", "created_at", "consumer_id"),
+    )
     id = Column(pg.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     producer_id = Column(String, nullable=False)
     consumer_id = Column(String, nullable=False)
@@ -91,6 +117,8 @@ class ProducerConsumerMatchModel(BaseModel):
 
 class Event(Base):
     __tablename__ = "events"
+    # Serves the date ordered event listing and its pages
+    __table_args__ = (Index("ix_events_date_time", "date", "time", "event_id"),)
     id = Column(pg.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     event_id = Column(String, unique=True, nullable=False)
     name = Column(String, nullable=False)
@@ -99,6 +127,7 @@ class Event(Base):
     location = Column(String, nullable=False)
     description = Column(String, nullable=False)
     coordinates = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, server_default=text("CURRENT_TIMESTAMP"))
 
 class EventModel(BaseModel):
     id: Optional[UUID] = None
@@ -109,12 +138,17 @@ class EventModel(BaseModel):
     location: str
     description: str
     coordinates: str
+    created_at: Optional[datetime] = None
     class Config:
         orm_mode = True
         from_attributes = True
 
 class EventVendor(Base):
     __tablename__ = "event_vendor"
+    __table_args__ = (
+        Index("uq_event_vendor_pair", "event_id", "producer_id", unique=True),
+        Index("ix_event_vendor_producer", "producer_id"),
+    )
     id = Column(pg.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     event_id = Column(String, nullable=False)
     producer_id = Column(String, nullable=False)
@@ -129,6 +163,7 @@ class EventVendorModel(BaseModel):
 
 class Rating(Base):
     __tablename__ = "ratings"
+    __table_args__ = (Index("uq_ratings_pair", "producer_id", "consumer_id", unique=True),)
     id = Column(pg.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     producer_id = Column(String, nullable=False)
     consumer_id = Column(String, nullable=False)
@@ -145,4 +180,73 @@ class RatingModel(BaseModel):
     date: Optional[datetime] = None
     class Config:
         orm_mode = True
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class ProducerRatingSummary(Base):
+    """Running rating totals per producer, kept up to date by create_rating for the marketplace listing"""
+    __tablename__ = "producer_rating_summary"
+    producer_id = Column(String, primary_key=True)
+    rating_count = Column(Integer, nullable=False)
+    rating_sum = Column(Integer, nullable=False)
+    average_rating = Column(Float, Computed("rating_sum::float8 / rating_count", persisted=True))
+
+class NewsletterJob(Base):
+    """A newsletter send to a producer's followers, progress is checkpointed so a worker can resume it"""
+    __tablename__ = "newsletter_jobs"
+    __table_args__ = (
+        # At most one unfinished send per producer
+        Index("uq_newsletter_jobs_active_producer", "producer_id", unique=True,
+              postgresql_where=text("status IN ('queued', 'running')")),
+        Index("ix_newsletter_jobs_status_created", "status", "created_at"),
+    )
+    id = Column(pg.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    producer_id = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(String, nullable=False)  # rendered once when queued, personalised per recipient
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, failed, cancelled
+    total_recipients = Column(Integer, nullable=True)
+    sent_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    last_consumer_id = Column(String, nullable=True)  # recipients are sent in consumer_id order
+    worker_id = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+class NewsletterRequest(BaseModel):
+    subject: Optional[str] = None
+    message: Optional[str] = None
+
+class BackgroundJob(Base):
+    """Work queued by request handlers and run by job_worker.py"""
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index("uq_background_jobs_idempotency_key", "idempotency_key", unique=True),
+        # Claim order of the queued jobs
+        Index("ix_background_jobs_queue", text("priority DESC"), "run_at", postgresql_where=text("status = 'queued'")),
+        Index("ix_background_jobs_running", "locked_until", postgresql_where=text("status = 'running'")),
+    )
+    id = Column(pg.UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
+    kind = Column(String, nullable=False)
+    payload = Column(pg.JSONB, nullable=False, default=dict)
+    priority = Column(Integer, nullable=False, default=0)  # higher runs first
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    idempotency_key = Column(String, nullable=True)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)
+    worker_id = Column(String, nullable=True)
+    # New for every claim, guards the attempt's outcome against a reaped and re-claimed job
+    lease_token = Column(pg.UUID(as_uuid=True), nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class BackgroundJobRequest(BaseModel):
+    kind: str
+    payload: dict = {}
+    priority: int = 0
+    idempotency_key: Optional[str] = None
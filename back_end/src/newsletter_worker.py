@@ -0,0 +1,52 @@
+"""
+Newsletter worker for FarmZilla.
+
+Sends the newsletter jobs queued by POST /api/v1/producers/{id}/newsletters,
+so a producer with many followers never ties up an API worker. Run one or
+more of these next to the API (same image and environment); together they
+send at most NEWSLETTER_MAX_RUNNING_JOBS jobs at a time. On SIGTERM the
+worker finishes the messages being sent, saves its progress and puts the
+job back in the queue.
+
+Usage (from the project root):
+    python -m back_end.src.newsletter_worker
+    NEWSLETTER_TRANSPORT=smtp NEWSLETTER_SMTP_HOST=localhost NEWSLETTER_SMTP_PORT=1025 \
+        python -m back_end.src.newsletter_worker --once
+"""
+
+import argparse
+import signal
+
+from .settings import settings
+from .utils.newsletter import NewsletterWorker, transport_factory
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Send queued producer newsletters')
+    parser.add_argument('--once', action='store_true', help='Exit when no job is waiting instead of polling')
+    parser.add_argument('--poll-interval', type=float, default=5, help='Seconds between polls of an empty queue')
+    args = parser.parse_args()
+
+    worker = NewsletterWorker(
+        settings.session_factory,
+        transport_factory(settings),
+        sender=settings.newsletter_from,
+        batch_size=settings.newsletter_batch_size,
+        rate_per_second=settings.newsletter_rate_per_second,
+        concurrency=settings.newsletter_concurrency,
+        max_running_jobs=settings.newsletter_max_running_jobs,
+        stale_seconds=settings.newsletter_stale_seconds,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+
+    print(f"✅ Newsletter worker {worker.worker_id} started, {settings.newsletter_transport} transport, "
+          f"{settings.newsletter_rate_per_second}/s per job, {settings.newsletter_concurrency} connection(s)")
+    try:
+        worker.run(poll_interval=args.poll_interval, once=args.once)
+    finally:
+        settings.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Production entry point for the FarmZilla API.
+
+Runs uvicorn with one worker process per share of the Fargate task's CPU
+allocation (see utils/server_config.py) and a graceful shutdown: on SIGTERM
+the workers stop accepting connections and get GRACEFUL_SHUTDOWN_TIMEOUT
+seconds to finish in-flight requests before the database pools are closed.
+
+Usage (from the project root):
+    python -m back_end.src.serve
+    CPU=2048 DESIRED_COUNT=2 DB_MAX_CONNECTIONS=170 python -m back_end.src.serve
+"""
+
+import os
+
+import uvicorn
+
+from .utils.server_config import pool_mode, pool_settings, worker_count
+
+
+def main():
+    workers = worker_count()
+    # Workers are spawned as new processes, they read the same value back when sizing their pool
+    os.environ['WEB_CONCURRENCY'] = str(workers)
+    graceful_timeout = int(os.environ.get('GRACEFUL_SHUTDOWN_TIMEOUT', 25))
+
+    if pool_mode() == 'transaction':
+        pool = f"transaction pooling, pool_size={os.environ.get('DB_POOL_SIZE') or '0 (NullPool)'}"
+    else:
+        sizes = pool_settings(workers)
+        pool = f"pool_size={sizes['pool_size']} max_overflow={sizes['max_overflow']}"
+    print(f"✅ Starting {workers} worker(s), {pool} per worker, graceful shutdown {graceful_timeout}s")
+    uvicorn.run(
+        'back_end.src.main:app',
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', 8000)),
+        workers=workers,
+        timeout_graceful_shutdown=graceful_timeout,
+        timeout_keep_alive=int(os.environ.get('KEEP_ALIVE_TIMEOUT', 5)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Application settings and lazily created clients.
+
+Configuration is read from the environment (and .env) once, when this module
+is imported. The heavy clients (SQLAlchemy engine, S3 client, bcrypt
+CryptContext, password executor) are only built the first time they are
+used, so importing main.py stays cheap for cold starts, tests and tooling.
+"""
+
+import os
+import threading
+from functools import wraps
+
+from dotenv import load_dotenv
+
+from .utils.server_config import engine_options, pool_mode
+
+# Load environment variables
+load_dotenv()
+
+
+def lazy(factory):
+    """Like functools.cached_property, but builds the value once even under concurrent first use"""
+    name = factory.__name__
+    lock = threading.RLock()
+
+    @property
+    @wraps(factory)
+    def getter(self):
+        try:
+            return self.__dict__[name]
+        except KeyError:
+            pass
+        with lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = factory(self)
+            return self.__dict__[name]
+    return getter
+
+
+class Settings:
+
+    def __init__(self):
+        # Load the database connection string from environment variable or .env file
+        self.database_url = os.environ.get("AWS_RDS_URL")
+        # Optional comma separated read replica URLs, GET requests are served from them
+        self.replica_urls = [url.strip() for url in os.environ.get("AWS_RDS_REPLICA_URLS", "").split(",") if url.strip()]
+        self.read_your_writes_seconds = float(os.environ.get("READ_YOUR_WRITES_SECONDS", 5))
+        self.replica_max_lag_seconds = float(os.environ.get("REPLICA_MAX_LAG_SECONDS", 5))
+        self.bucket_name = os.getenv("AWS_BUCKET_NAME")
+
+        # JWT configuration
+        self.secret_key = os.environ.get("AUTH_SECRET_KEY")
+        self.algorithm = os.environ.get("ALGORITHM")
+        self.access_token_expire_minutes = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+
+        # Admin endpoints are only enabled when ADMIN_TOKEN is set
+        self.admin_token = os.environ.get("ADMIN_TOKEN")
+
+        # Instrumentation
+        self.query_count_warn_threshold = int(os.environ.get("QUERY_COUNT_WARN_THRESHOLD", 20))
+        self.slow_query_threshold_ms = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 200))
+        self.slow_query_explain_sample_rate = float(os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", 0.1))
+        self.password_hash_workers = int(os.environ.get("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+
+        # Response compression: bodies below the minimum size are sent as they are, from the
+        # offload size on they are compressed on the thread pool, above the CPU utilization
+        # (share of one core used by the worker) the fastest level is used
+        self.compression_enabled = os.environ.get("COMPRESSION_ENABLED", "true").lower() == "true"
+        self.compression_minimum_size = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", 1024))
+        self.compression_offload_size = int(os.environ.get("COMPRESSION_OFFLOAD_SIZE", 65536))
+        self.compression_busy_utilization = float(os.environ.get("COMPRESSION_BUSY_UTILIZATION", 0.8))
+
+        # Seconds a cached consumer feed page may be served by workers that did not see the write
+        self.feed_cache_seconds = float(os.environ.get("FEED_CACHE_SECONDS", 30))
+
+        # Newsletter delivery (newsletter_worker.py): 'file' writes .eml files to
+        # NEWSLETTER_OUTBOX_DIR, 'smtp' sends through NEWSLETTER_SMTP_HOST
+        self.newsletter_transport = os.environ.get("NEWSLETTER_TRANSPORT", "file").lower()
+        self.newsletter_outbox_dir = os.environ.get("NEWSLETTER_OUTBOX_DIR", "newsletter_outbox")
+        self.newsletter_from = os.environ.get("NEWSLETTER_FROM", "newsletter@farmzilla.local")
+        self.smtp_host = os.environ.get("NEWSLETTER_SMTP_HOST", "localhost")
+        self.smtp_port = int(os.environ.get("NEWSLETTER_SMTP_PORT", 25))
+        self.smtp_username = os.environ.get("NEWSLETTER_SMTP_USERNAME")
+        self.smtp_password = os.environ.get("NEWSLETTER_SMTP_PASSWORD")
+        self.smtp_starttls = os.environ.get("NEWSLETTER_SMTP_STARTTLS", "false").lower() == "true"
+        self.newsletter_batch_size = int(os.environ.get("NEWSLETTER_BATCH_SIZE", 500))
+        self.newsletter_rate_per_second = float(os.environ.get("NEWSLETTER_RATE_PER_SECOND", 20))
+        self.newsletter_concurrency = int(os.environ.get("NEWSLETTER_CONCURRENCY", 4))
+        self.newsletter_max_running_jobs = int(os.environ.get("NEWSLETTER_MAX_RUNNING_JOBS", 2))
+        # A running job whose worker has not checkpointed for this long is picked up by another worker
+        self.newsletter_stale_seconds = float(os.environ.get("NEWSLETTER_STALE_SECONDS", 300))
+
+        # Background jobs (job_worker.py)
+        self.job_worker_concurrency = int(os.environ.get("JOB_WORKER_CONCURRENCY", 4))
+        # A job still running this long after it was claimed is assumed lost and queued again
+        self.job_lease_seconds = float(os.environ.get("JOB_LEASE_SECONDS", 300))
+        self.job_poll_interval = float(os.environ.get("JOB_POLL_INTERVAL", 1))
+        self.job_backoff_base_seconds = float(os.environ.get("JOB_BACKOFF_BASE_SECONDS", 10))
+        self.job_backoff_max_seconds = float(os.environ.get("JOB_BACKOFF_MAX_SECONDS", 3600))
+        self.job_retention_days = float(os.environ.get("JOB_RETENTION_DAYS", 7))
+        self.job_worker_metrics_port = int(os.environ.get("JOB_WORKER_METRICS_PORT", 0))
+
+        # Tables are created by setup.py; set to true to also create missing ones on startup
+        self.create_tables_on_startup = os.environ.get("DB_CREATE_TABLES_ON_STARTUP", "false").lower() == "true"
+
+    def _create_engine(self, url, name):
+        from sqlalchemy import create_engine
+        from .utils.instrumentation import register_pool_metrics
+        from .utils.request_timing import install_query_listeners
+        from .utils.session_state import install_session_state_guard
+
+        # creating connection to the database with connection pooling and timeouts, pool
+        # sized per worker so all tasks together stay under DB_MAX_CONNECTIONS, or no pool
+        # at all behind a transaction-mode PgBouncer (DB_POOL_MODE=transaction)
+        engine = create_engine(url, **engine_options(url))
+        # Count statements and DB time per request for the timing middleware
+        install_query_listeners(engine)
+        register_pool_metrics(engine, name)
+        if pool_mode() == "transaction":
+            install_session_state_guard(engine)
+        self.slow_query_log.install(engine)
+        return engine
+
+    @lazy
+    def slow_query_log(self):
+        from .utils.slow_query import SlowQueryLog
+        # Log statements slower than SLOW_QUERY_THRESHOLD_MS and EXPLAIN a sample of them
+        return SlowQueryLog(
+            threshold_ms=self.slow_query_threshold_ms,
+            explain_sample_rate=self.slow_query_explain_sample_rate,
+        )
+
+    @lazy
+    def engine(self):
+        return self._create_engine(self.database_url, "primary")
+
+    @lazy
+    def session_factory(self):
+        from sqlalchemy.orm import sessionmaker
+        # Objects stay readable after commit, without a SELECT to reload them
+        return sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
+
+    @lazy
+    def router(self):
+        from .utils.db_routing import ReplicaRouter
+        replicas = [(f"replica-{i}", self._create_engine(url, f"replica-{i}"))
+                    for i, url in enumerate(self.replica_urls, start=1)]
+        return ReplicaRouter(
+            self.session_factory,
+            replicas,
+            read_your_writes_seconds=self.read_your_writes_seconds,
+            max_lag_seconds=self.replica_max_lag_seconds,
+        )
+
+    @lazy
+    def feed_cache(self):
+        from .utils.cache import TTLCache
+        # Pages read from a replica may predate a write for up to the allowed replica lag
+        settle_seconds = self.replica_max_lag_seconds if self.replica_urls else 0.0
+        return TTLCache("consumer_feed", ttl=self.feed_cache_seconds, settle_seconds=settle_seconds)
+
+    @lazy
+    def s3(self):
+        import boto3
+        from .utils.instrumentation import instrument_s3_client
+        return instrument_s3_client(boto3.client('s3'))
+
+    @lazy
+    def pwd_context(self):
+        from passlib.context import CryptContext
+        return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+    @lazy
+    def password_executor(self):
+        from .utils.instrumentation import InstrumentedExecutor
+        # bcrypt is CPU bound, run it on a dedicated pool so it never blocks the event loop
+        return InstrumentedExecutor("bcrypt", max_workers=self.password_hash_workers)
+
+    def close(self):
+        """Release whatever clients were created"""
+        if "engine" in self.__dict__:
+            self.engine.dispose()
+        if "router" in self.__dict__:
+            for replica in self.router.replicas:
+                replica.engine.dispose()
+        if "password_executor" in self.__dict__:
+            self.password_executor.shutdown(wait=False)
+
+
+settings = Settings()
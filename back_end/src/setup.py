@@ -4,11 +4,23 @@ from sqlalchemy.ext.declarative import declarative_base
 import os
 from dotenv import load_dotenv
 from utils.db_handler import DatabaseHandler
+from utils.marketplace import REBUILD_RATING_SUMMARY_QUERY
 import pandas as pd
 import uuid
 import boto3
 from botocore.exceptions import ClientError
 from passlib.context import CryptContext
+import argparse
+import sys
+
+# Parse command line options
+parser = argparse.ArgumentParser(description='Create and seed the FarmZilla database from the data/ CSV files')
+mode = parser.add_mutually_exclusive_group()
+mode.add_argument('--sync', action='store_true',
+                  help='Incrementally sync tables with the CSVs instead of dropping and reloading them')
+mode.add_argument('--migrate', action='store_true',
+                  help='Only create missing tables, columns and indexes, leaving all rows untouched')
+args = parser.parse_args()
 
 # Load environment variables from .env file (override=True reloads changed values)
 load_dotenv(override=True)
@@ -134,7 +146,12 @@ products_table_creation_query = """CREATE TABLE IF NOT EXISTS products (
     image_url TEXT,
     user_id UUID,
     cost DECIMAL(10,2),
-    unit VARCHAR(20)
+    unit VARCHAR(20),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(product_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
     )
     """
 
@@ -154,7 +171,8 @@ events_table_creation_query = """CREATE TABLE IF NOT EXISTS events (
     time VARCHAR(255) NOT NULL,
     location VARCHAR(255) NOT NULL,
     description TEXT NOT NULL,
-    coordinates VARCHAR(255) NOT NULL
+    coordinates VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
     )
     """
 
@@ -165,6 +183,52 @@ event_vendor_table_creation_query = """CREATE TABLE IF NOT EXISTS event_vendor (
     )
     """
 
+producer_rating_summary_table_creation_query = """CREATE TABLE IF NOT EXISTS producer_rating_summary (
+    producer_id VARCHAR(255) PRIMARY KEY,
+    rating_count INTEGER NOT NULL,
+    rating_sum INTEGER NOT NULL,
+    average_rating DOUBLE PRECISION GENERATED ALWAYS AS (rating_sum::float8 / rating_count) STORED
+    )
+    """
+
+newsletter_jobs_table_creation_query = """CREATE TABLE IF NOT EXISTS newsletter_jobs (
+    id UUID PRIMARY KEY,
+    producer_id VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    body TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    total_recipients INTEGER,
+    sent_count INTEGER NOT NULL DEFAULT 0,
+    failed_count INTEGER NOT NULL DEFAULT 0,
+    last_consumer_id VARCHAR(255),
+    worker_id VARCHAR(255),
+    error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    heartbeat_at TIMESTAMP,
+    finished_at TIMESTAMP
+    )
+    """
+
+background_jobs_table_creation_query = """CREATE TABLE IF NOT EXISTS background_jobs (
+    id UUID PRIMARY KEY,
+    kind VARCHAR(100) NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}',
+    priority INTEGER NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    idempotency_key VARCHAR(255),
+    run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until TIMESTAMP,
+    worker_id VARCHAR(255),
+    lease_token UUID,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+    )
+    """
+
 ratings_table_creation_query = """CREATE TABLE IF NOT EXISTS ratings (
     id UUID PRIMARY KEY,
     producer_id VARCHAR(255) NOT NULL,
@@ -175,13 +239,89 @@ ratings_table_creation_query = """CREATE TABLE IF NOT EXISTS ratings (
     )
     """
 
-# Deleting tables if they already exist
-engine.delete_table('users')
-engine.delete_table('products')
-engine.delete_table('producer_consumer_matches')
-engine.delete_table('events')
-engine.delete_table('event_vendor')
-engine.delete_table('ratings')
+# Unique indexes backing the natural key of each table (used by ON CONFLICT in sync mode and
+# by the API's insert handlers)
+natural_keys = {
+    'users': ['username'],
+    'products': ['product_id'],
+    'producer_consumer_matches': ['producer_id', 'consumer_id'],
+    'events': ['event_id'],
+    'event_vendor': ['event_id', 'producer_id'],
+    'ratings': ['producer_id', 'consumer_id'],
+}
+natural_key_index_queries = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_users_username ON users (username)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_products_user_product_name ON products (user_id, product_name)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_producer_consumer_matches_pair ON producer_consumer_matches (producer_id, consumer_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_event_vendor_pair ON event_vendor (event_id, producer_id)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_ratings_pair ON ratings (producer_id, consumer_id)",
+]
+
+# Full-text and trigram indexes behind /api/v1/products/search, the ALTER adds the
+# generated column to products tables created before it existed (migrate and sync modes)
+product_search_queries = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(product_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (product_name gin_trgm_ops)",
+]
+
+# Columns and indexes behind /api/v1/marketplace/products (ALTER for existing tables in migrate and sync modes)
+marketplace_queries = [
+    "ALTER TABLE products ADD COLUMN IF NOT EXISTS created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS ix_products_created_at ON products (created_at, product_id)",
+]
+
+# Columns and indexes behind /api/v1/consumers/{id}/feed
+feed_queries = [
+    "ALTER TABLE events ADD COLUMN IF NOT EXISTS created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS ix_producer_consumer_matches_consumer ON producer_consumer_matches (consumer_id)",
+    "CREATE INDEX IF NOT EXISTS ix_event_vendor_producer ON event_vendor (producer_id)",
+]
+
+# Index behind the date ordered, paginated /api/v1/events/ listing
+event_list_queries = [
+    "CREATE INDEX IF NOT EXISTS ix_events_date_time ON events (date, time, event_id)",
+]
+
+# Index behind the newest first, keyset paginated /api/v1/producers/{id}/customers listing
+customer_queries = [
+    "CREATE INDEX IF NOT EXISTS ix_producer_consumer_matches_producer_created "
+    "ON producer_consumer_matches (producer_id, created_at, consumer_id)",
+]
+
+# Newsletter job indexes, one unfinished send per producer and the workers' claim order
+newsletter_queries = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_newsletter_jobs_active_producer ON newsletter_jobs (producer_id) "
+    "WHERE status IN ('queued', 'running')",
+    "CREATE INDEX IF NOT EXISTS ix_newsletter_jobs_status_created ON newsletter_jobs (status, created_at)",
+]
+
+# Background job lease column (for tables created before it) and indexes, idempotent
+# enqueues and the workers' claim order
+background_jobs_queries = [
+    "ALTER TABLE background_jobs ADD COLUMN IF NOT EXISTS lease_token UUID",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_background_jobs_idempotency_key ON background_jobs (idempotency_key)",
+    "CREATE INDEX IF NOT EXISTS ix_background_jobs_queue ON background_jobs (priority DESC, run_at) "
+    "WHERE status = 'queued'",
+    "CREATE INDEX IF NOT EXISTS ix_background_jobs_running ON background_jobs (locked_until) "
+    "WHERE status = 'running'",
+]
+
+# Deleting tables if they already exist (migrate and sync modes keep existing data)
+if not (args.sync or args.migrate):
+    engine.delete_table('users')
+    engine.delete_table('products')
+    engine.delete_table('producer_consumer_matches')
+    engine.delete_table('events')
+    engine.delete_table('event_vendor')
+    engine.delete_table('ratings')
+    engine.delete_table('producer_rating_summary')
+    engine.delete_table('newsletter_jobs')
+    engine.delete_table('background_jobs')
 
 # Create tables
 engine.create_table(users_table_creation_query)
@@ -190,6 +330,47 @@ engine.create_table(producer_consumer_matching_table_creation_query)
 engine.create_table(events_table_creation_query)
 engine.create_table(event_vendor_table_creation_query)
 engine.create_table(ratings_table_creation_query)
+engine.create_table(producer_rating_summary_table_creation_query)
+engine.create_table(newsletter_jobs_table_creation_query)
+engine.create_table(background_jobs_table_creation_query)
+
+# Create natural key indexes
+for query in natural_key_index_queries:
+    engine.create_table(query)
+
+# Create product search column and indexes
+for query in product_search_queries:
+    engine.create_table(query)
+
+# Create marketplace listing columns and indexes
+for query in marketplace_queries:
+    engine.create_table(query)
+
+# Create consumer feed columns and indexes
+for query in feed_queries:
+    engine.create_table(query)
+
+# Create event listing indexes
+for query in event_list_queries:
+    engine.create_table(query)
+
+# Create customer list indexes
+for query in customer_queries:
+    engine.create_table(query)
+
+# Create newsletter job indexes
+for query in newsletter_queries:
+    engine.create_table(query)
+
+# Create background job indexes
+for query in background_jobs_queries:
+    engine.create_table(query)
+
+# Migrate mode stops at the schema, no rows are inserted, updated or deleted
+if args.migrate:
+    engine.create_table(REBUILD_RATING_SUMMARY_QUERY)
+    print("Schema migrated, data left unchanged")
+    sys.exit(0)
 
 
 # Ensuring each row of each dataframe has a unique ID
@@ -229,22 +410,52 @@ for index, row in products.iterrows():
 
 # The user_id column is now properly included from the CSV file
 
+# In sync mode existing users keep their stored password hash, so only new users are hashed
+existing_password_hashes = {}
+if args.sync:
+    existing_users = engine.retrieve_all_from_table('users')
+    if existing_users is not None and not existing_users.empty:
+        existing_password_hashes = dict(zip(existing_users['username'], existing_users['password']))
+
 # Hash user passwords before storing them in the database
 print("Hashing user passwords...")
 for index, row in users.iterrows():
+    if row['username'] in existing_password_hashes:
+        users.at[index, 'password'] = existing_password_hashes[row['username']]
+        continue
     plain_password = row['password']
     hashed_password = pwd_context.hash(plain_password)
     users.at[index, 'password'] = hashed_password
     print(f"Hashed password for user: {row['username']}")
 
 
-# Populates the tables with data from the dataframes
-engine.populate_table_dynamic(users, 'users')
-engine.populate_table_dynamic(products, 'products')
-engine.populate_table_dynamic(producer_consumer_matches, 'producer_consumer_matches')
-engine.populate_table_dynamic(events, 'events')
-engine.populate_table_dynamic(event_vendor, 'event_vendor')
-engine.populate_table_dynamic(ratings, 'ratings')
+if args.sync:
+    # Upserts changed rows and deletes missing ones, one transaction per table.
+    # A failed table is rolled back and stops the run so deploys see a non-zero exit
+    try:
+        sync_results = {
+            'users': engine.sync_table(users, 'users', natural_keys['users']),
+            'products': engine.sync_table(products, 'products', natural_keys['products']),
+            'producer_consumer_matches': engine.sync_table(producer_consumer_matches, 'producer_consumer_matches', natural_keys['producer_consumer_matches']),
+            'events': engine.sync_table(events, 'events', natural_keys['events']),
+            'event_vendor': engine.sync_table(event_vendor, 'event_vendor', natural_keys['event_vendor']),
+            'ratings': engine.sync_table(ratings, 'ratings', natural_keys['ratings']),
+        }
+    except Exception as e:
+        print(f"Sync failed, remaining tables were not synced: {e}")
+        sys.exit(1)
+    print(pd.DataFrame(sync_results).T)
+else:
+    # Populates the tables with data from the dataframes
+    engine.populate_table_dynamic(users, 'users')
+    engine.populate_table_dynamic(products, 'products')
+    engine.populate_table_dynamic(producer_consumer_matches, 'producer_consumer_matches')
+    engine.populate_table_dynamic(events, 'events')
+    engine.populate_table_dynamic(event_vendor, 'event_vendor')
+    engine.populate_table_dynamic(ratings, 'ratings')
+
+# Recompute the per-producer rating totals from the loaded ratings
+engine.create_table(REBUILD_RATING_SUMMARY_QUERY)
 
 # Testing if the tables were created and populated correctly
 print(engine.test_table('users'))
@@ -0,0 +1,35 @@
+"""
+Background job handlers.
+
+Request handlers queue work with utils.jobs.enqueue and return; job_worker.py
+claims the jobs and runs the handlers registered here. Jobs are delivered at
+least once, so every handler must be safe to run again.
+"""
+
+from sqlalchemy import text
+
+from .settings import settings
+from .utils.jobs import JobRegistry, PermanentJobError
+from .utils.marketplace import REBUILD_RATING_SUMMARY_QUERY
+
+registry = JobRegistry()
+
+DELETE_S3_OBJECT = 's3.delete_object'
+REBUILD_RATING_SUMMARY = 'marketplace.rebuild_rating_summary'
+
+
+@registry.handler(DELETE_S3_OBJECT)
+def delete_s3_object(payload: dict):
+    """Remove an object, e.g. the image of a deleted product; deleting a missing key succeeds"""
+    bucket = payload.get('bucket') or settings.bucket_name
+    if not bucket or not payload.get('key'):
+        raise PermanentJobError("bucket and key are required")
+    settings.s3.delete_object(Bucket=bucket, Key=payload['key'])
+
+
+@registry.handler(REBUILD_RATING_SUMMARY)
+def rebuild_rating_summary(payload: dict):
+    """Recompute producer_rating_summary from the ratings table"""
+    with settings.session_factory() as db:
+        db.execute(text(REBUILD_RATING_SUMMARY_QUERY))
+        db.commit()
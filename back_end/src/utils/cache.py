@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import REGISTRY
+
+CACHE_REQUESTS = REGISTRY.counter(
+    'cache_requests_total', 'In-process cache lookups by result', labelnames=('cache', 'result'))
+CACHE_INVALIDATIONS = REGISTRY.counter(
+    'cache_invalidations_total', 'Entries dropped by tag invalidation', labelnames=('cache',))
+
+# Returned by TTLCache.get for missing or expired keys, so None can be cached
+MISS = object()
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache. Entries expire after ttl seconds, the least
+    recently used ones are evicted beyond max_entries, and every entry carries
+    tags so writes can drop all entries depending on what they changed.
+
+    Each worker process has its own cache: invalidation only reaches the worker
+    that handled the write, other workers catch up when their entries expire,
+    so ttl bounds how stale a response can be.
+
+    A value read before a write can be stored after the write invalidated its
+    tags. Callers take generation() before reading and pass it to set(), which
+    skips the store when one of the tags was invalidated since. set() also
+    skips tags invalidated less than settle_seconds ago, for values that may
+    have been read from a replica that has not replayed the write yet.
+    """
+
+    def __init__(self, name: str, ttl: float = 30.0, max_entries: int = 10_000, settle_seconds: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.settle_seconds = settle_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tagged = {}  # tag -> set of keys
+        self._generation = 0
+        self._invalidated = OrderedDict()  # tag -> (generation, monotonic time) of its last invalidation
+        # Reads older than this generation may have missed a forgotten invalidation
+        self._forgotten_generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """Take before reading the value to cache, then pass to set()"""
+        with self._lock:
+            return self._generation
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                CACHE_REQUESTS.inc(1, self.name, 'hit')
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+        CACHE_REQUESTS.inc(1, self.name, 'miss')
+        return MISS
+
+    def set(self, key, value, tags=(), generation: int | None = None):
+        """Store value, unless one of its tags was invalidated since generation or is still settling"""
+        now = time.monotonic()
+        tags = frozenset(tags)
+        with self._lock:
+            if generation is not None and generation < self._forgotten_generation:
+                return
+            for tag in tags:
+                invalidated = self._invalidated.get(tag)
+                if invalidated is not None and (
+                        (generation is not None and invalidated[0] > generation)
+                        or now - invalidated[1] < self.settle_seconds):
+                    return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (now + self.ttl, value, tags)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the tags"""
+        now = time.monotonic()
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._invalidated.pop(tag, None)
+                self._invalidated[tag] = (self._generation, now)
+            # Bounded like the entries; stores from reads older than what is forgotten are skipped
+            while len(self._invalidated) > self.max_entries:
+                _, (generation, _) = self._invalidated.popitem(last=False)
+                self._forgotten_generation = generation
+            keys = set()
+            for tag in tags:
+                keys |= self._tagged.get(tag, set())
+            for key in keys:
+                self._remove(key)
+        if keys:
+            CACHE_INVALIDATIONS.inc(len(keys), self.name)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+            self._invalidated.clear()
+            self._forgotten_generation = self._generation
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
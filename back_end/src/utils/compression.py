@@ -0,0 +1,252 @@
+import gzip
+import time
+import zlib
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from .metrics import REGISTRY
+from .request_timing import route_template
+
+# Brotli and zstd are optional, without the packages only gzip is offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_BYTES_IN = REGISTRY.counter(
+    'http_compression_bytes_in_total', 'Response bytes before compression', labelnames=('route', 'encoding'))
+COMPRESSION_BYTES_OUT = REGISTRY.counter(
+    'http_compression_bytes_out_total', 'Response bytes after compression', labelnames=('route', 'encoding'))
+COMPRESSION_CPU_SECONDS = REGISTRY.histogram(
+    'http_compression_cpu_seconds', 'CPU time spent compressing one response', labelnames=('route', 'encoding'),
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml',
+                      'application/msgpack', 'application/vnd.apache.arrow.stream')
+
+
+class GzipEncoder:
+    name = 'gzip'
+    # (level while the worker has CPU to spare, level while it is busy)
+    levels = (6, 1)
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+    def stream(self, level: int):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return compressor.compress, compressor.flush
+
+
+class BrotliEncoder:
+    name = 'br'
+    levels = (4, 1)
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return brotli.compress(data, quality=level)
+
+    def stream(self, level: int):
+        compressor = brotli.Compressor(quality=level)
+        return compressor.process, compressor.finish
+
+
+class ZstdEncoder:
+    name = 'zstd'
+    levels = (3, 1)
+
+    def compress(self, data: bytes, level: int) -> bytes:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    def stream(self, level: int):
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return compressor.compress, compressor.flush
+
+
+def available_encoders() -> dict:
+    """Installed encoders by content-coding, in order of preference"""
+    encoders = {}
+    if zstandard is not None:
+        encoders['zstd'] = ZstdEncoder()
+    if brotli is not None:
+        encoders['br'] = BrotliEncoder()
+    encoders['gzip'] = GzipEncoder()
+    return encoders
+
+
+def parse_accept_encoding(header: str) -> dict:
+    """'gzip;q=0.8, br' -> {'gzip': 0.8, 'br': 1.0}"""
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header: str, encoders: dict):
+    """The preferred encoder the client accepts with the highest q-value, or None for identity"""
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in encoders:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CpuMonitor:
+    """Share of one core used by this process, re-measured at most every `interval` seconds"""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self._wall = time.monotonic()
+        self._cpu = time.process_time()
+        self.utilization = 0.0
+
+    def sample(self) -> float:
+        wall = time.monotonic()
+        if wall - self._wall >= self.interval:
+            cpu = time.process_time()
+            self.utilization = (cpu - self._cpu) / (wall - self._wall)
+            self._wall, self._cpu = wall, cpu
+        return self.utilization
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing text and JSON responses with zstd, Brotli
+    or gzip, whichever the client accepts that is installed, in that order
+    of preference. Bodies under minimum_size are sent as they are. The level
+    drops to the fastest one while the worker uses more than
+    busy_utilization of a core. Bodies of offload_size bytes or more are
+    compressed on the thread pool so they do not stall the event loop, and
+    streamed responses are compressed chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, offload_size: int = 65536, busy_utilization: float = 0.8,
+                 encoders: dict | None = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.busy_utilization = busy_utilization
+        self.encoders = encoders if encoders is not None else available_encoders()
+        self.cpu = CpuMonitor()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] == 'HEAD':
+            await self.app(scope, receive, send)
+            return
+        name = choose_encoding(Headers(scope=scope).get('accept-encoding', ''), self.encoders)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressedResponder(self, scope, send, self.encoders[name])
+        await self.app(scope, receive, responder.send)
+
+    def level(self, encoder) -> int:
+        normal, busy = encoder.levels
+        return busy if self.cpu.sample() > self.busy_utilization else normal
+
+
+class CompressedResponder:
+    """Holds back the response start until the body shows whether and how to compress it"""
+
+    def __init__(self, middleware: CompressionMiddleware, scope, send, encoder):
+        self.middleware = middleware
+        self.scope = scope
+        self.downstream = send
+        self.encoder = encoder
+        self.start = None
+        self.passthrough = False
+        self.stream = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_seconds = 0.0
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            headers = Headers(raw=message['headers'])
+            status = message['status']
+            content_type = headers.get('content-type', '')
+            self.passthrough = ('content-encoding' in headers or status < 200 or status in (204, 304)
+                                or not content_type.startswith(COMPRESSIBLE_TYPES))
+            if self.passthrough:
+                await self.downstream(message)
+            else:
+                self.start = message
+            return
+        if message['type'] != 'http.response.body' or self.passthrough:
+            await self.downstream(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if self.stream is None and not more_body:
+            await self._send_whole(body)
+        else:
+            await self._send_chunk(body, more_body)
+
+    async def _send_whole(self, body: bytes):
+        headers = MutableHeaders(scope=self.start)
+        headers.add_vary_header('Accept-Encoding')
+        if len(body) >= self.middleware.minimum_size:
+            level = self.middleware.level(self.encoder)
+            if len(body) >= self.middleware.offload_size:
+                compressed = await run_in_threadpool(self._compress, body, level)
+            else:
+                compressed = self._compress(body, level)
+            # Already compact payloads can grow, keep the smaller body
+            if len(compressed) < len(body):
+                self._record(len(body), len(compressed))
+                body = compressed
+                headers['Content-Encoding'] = self.encoder.name
+                headers['Content-Length'] = str(len(body))
+        await self.downstream(self.start)
+        await self.downstream({'type': 'http.response.body', 'body': body})
+
+    async def _send_chunk(self, chunk: bytes, more_body: bool):
+        if self.stream is None:
+            headers = MutableHeaders(scope=self.start)
+            headers.add_vary_header('Accept-Encoding')
+            headers['Content-Encoding'] = self.encoder.name
+            if 'content-length' in headers:
+                del headers['Content-Length']
+            self.stream = self.encoder.stream(self.middleware.level(self.encoder))
+            await self.downstream(self.start)
+
+        compress, flush = self.stream
+        started = time.thread_time()
+        output = compress(chunk) + (b'' if more_body else flush())
+        self.cpu_seconds += time.thread_time() - started
+        self.bytes_in += len(chunk)
+        self.bytes_out += len(output)
+        if not more_body:
+            self._record(self.bytes_in, self.bytes_out)
+        await self.downstream({'type': 'http.response.body', 'body': output, 'more_body': more_body})
+
+    def _compress(self, body: bytes, level: int) -> bytes:
+        started = time.thread_time()
+        compressed = self.encoder.compress(body, level)
+        self.cpu_seconds += time.thread_time() - started
+        return compressed
+
+    def _record(self, bytes_in: int, bytes_out: int):
+        route = route_template(self.scope)
+        COMPRESSION_BYTES_IN.inc(bytes_in, route, self.encoder.name)
+        COMPRESSION_BYTES_OUT.inc(bytes_out, route, self.encoder.name)
+        COMPRESSION_CPU_SECONDS.observe(self.cpu_seconds, route, self.encoder.name)
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from .marketplace import UUID_PATTERN
+from .pagination import decode_cursor, encode_cursor
+
+MAX_PAGE_SIZE = 100
+MAX_GROWTH_PERIODS = 366
+GROWTH_PERIODS = {'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+
+# Followers newest first with their profile, one join instead of a user lookup
+# per row; served by the (producer_id, created_at, consumer_id) index
+CUSTOMERS_QUERY = text("""
+    SELECT m.consumer_id, u.username, u.email, m.created_at
+    FROM producer_consumer_matches m
+    LEFT JOIN users u ON u.id = CASE WHEN m.consumer_id ~* :uuid_pattern THEN m.consumer_id::uuid END
+    WHERE m.producer_id = :producer_id
+      AND (NOT :has_cursor OR (m.created_at, m.consumer_id) < (:after_0, :after_1))
+    ORDER BY m.created_at DESC, m.consumer_id DESC
+    LIMIT :limit
+""")
+
+CUSTOMER_COUNT_QUERY = text("SELECT count(*) FROM producer_consumer_matches WHERE producer_id = :producer_id")
+
+# New followers per day or week, periods without any included as zero
+GROWTH_QUERY = text("""
+    WITH periods AS (
+        SELECT generate_series(date_trunc(:period, CAST(:since AS timestamp)),
+                               date_trunc(:period, CAST(:now AS timestamp)),
+                               CAST(:step AS interval)) AS period_start
+    ), counts AS (
+        SELECT date_trunc(:period, created_at) AS period_start, count(*) AS new_followers
+        FROM producer_consumer_matches
+        WHERE producer_id = :producer_id AND created_at >= date_trunc(:period, CAST(:since AS timestamp))
+        GROUP BY 1
+    )
+    SELECT p.period_start, coalesce(c.new_followers, 0) AS new_followers
+    FROM periods p
+    LEFT JOIN counts c ON c.period_start = p.period_start
+    ORDER BY p.period_start
+""")
+
+
+def list_customers(db, producer_id: str, limit: int = 50, cursor: str | None = None) -> dict:
+    """
+    One page of a producer's followers with username, email and follow date,
+    newest first; the total is only counted for the first page. Raises
+    ValueError for an invalid cursor.
+    """
+    after = decode_cursor('customers', cursor, ('timestamp', 'text')) if cursor else [None, None]
+    rows = db.execute(CUSTOMERS_QUERY, {
+        'producer_id': producer_id,
+        'uuid_pattern': UUID_PATTERN,
+        'has_cursor': cursor is not None,
+        'after_0': after[0],
+        'after_1': after[1],
+        'limit': limit + 1,
+    }).mappings().all()
+    page = [dict(row) for row in rows[:limit]]
+    return {
+        'producer_id': producer_id,
+        'total': None if cursor else db.execute(CUSTOMER_COUNT_QUERY, {'producer_id': producer_id}).scalar(),
+        'customers': page,
+        'next_cursor': encode_cursor('customers', [page[-1]['created_at'], page[-1]['consumer_id']])
+        if len(rows) > limit else None,
+    }
+
+
+def follower_growth(db, producer_id: str, period: str = 'day', periods: int = 30) -> dict:
+    """
+    New followers per day or week over the last `periods` periods (the
+    current one included) and the follower total at the end of each.
+    Raises ValueError for invalid arguments.
+    """
+    if period not in GROWTH_PERIODS:
+        raise ValueError(f"period must be one of {', '.join(GROWTH_PERIODS)}")
+    if not 1 <= periods <= MAX_GROWTH_PERIODS:
+        raise ValueError(f"periods must be between 1 and {MAX_GROWTH_PERIODS}")
+
+    now = datetime.utcnow()
+    rows = db.execute(GROWTH_QUERY, {
+        'producer_id': producer_id,
+        'period': period,
+        'step': f"1 {period}",
+        'since': now - GROWTH_PERIODS[period] * (periods - 1),
+        'now': now,
+    }).mappings().all()
+    total = db.execute(CUSTOMER_COUNT_QUERY, {'producer_id': producer_id}).scalar()
+
+    # Running totals, counting back from the current total
+    running = total - sum(row['new_followers'] for row in rows)
+    buckets = []
+    for row in rows:
+        running += row['new_followers']
+        buckets.append({**dict(row), 'total_followers': running})
+    return {'producer_id': producer_id, 'period': period, 'total_followers': total, 'periods': buckets}
@@ -2,19 +2,50 @@ from dotenv import load_dotenv
 import pandas as pd
 import psycopg2
 import os
+import csv
+import uuid
+from psycopg2 import sql
 from psycopg2.extras import execute_values
 
+# Parquet export is optional, without pyarrow only DataFrame chunks are available
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
 # Load environment variables from .env file
 load_dotenv()
 
+# pandas dtype per information_schema data_type; anything else is read as text
+EXTRACT_DTYPES = {
+    'smallint': 'Int64',
+    'integer': 'Int64',
+    'bigint': 'Int64',
+    'real': 'float64',
+    'double precision': 'float64',
+    # Decimal objects, float64 would round values past 15-17 significant digits
+    'numeric': 'object',
+    'boolean': 'boolean',
+    'date': 'datetime64[ns]',
+    'timestamp without time zone': 'datetime64[ns]',
+    'timestamp with time zone': 'datetime64[ns, UTC]',
+}
+
+# Comparisons accepted in extract filters, 'in' takes a list of values
+FILTER_OPERATORS = ('=', '<>', '<', '<=', '>', '>=', 'in')
+
 class DatabaseHandler:
     """Class to handle PostgreSQL database connection and operations"""
 
-    def __init__(self, db_url):
+    def __init__(self, db_url, sslmode='require'):
 
         """Initialize the database connection."""
-        self.conn = psycopg2.connect(db_url, sslmode='require')
+        self.conn = psycopg2.connect(db_url, sslmode=sslmode)
         self.conn.autocommit = True  # Enable autocommit mode
+        # Set while an iter_table_chunks generator holds the connection's transaction
+        self._extracting = False
 
     def close(self):
         """Close the database connection."""
@@ -35,33 +66,190 @@ class DatabaseHandler:
         cursor.close()
 
 
-    def retrieve_all_from_table(self,table_name:str):
+    def table_columns(self, table_name: str) -> dict:
+        """
+        Column names of a public table mapped to their information_schema
+        (data_type, numeric_precision, numeric_scale), in table order
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT column_name, data_type, numeric_precision, numeric_scale
+                FROM information_schema.columns
+                WHERE table_schema = 'public' AND table_name = %s
+                ORDER BY ordinal_position
+            """, (table_name,))
+            return {name: (data_type, precision, scale) for name, data_type, precision, scale in cursor.fetchall()}
+
+    def iter_table_chunks(self, table_name: str, columns=None, where=None, chunk_rows: int = 50000):
+        """
+        Read a table as DataFrames of at most chunk_rows rows through a named
+        (server-side) cursor, so memory stays bounded by one chunk whatever the
+        table size. Every chunk has the same pandas dtypes, taken from the
+        column types rather than inferred from the values.
+
+        The extract holds the connection's transaction until the generator is
+        exhausted or closed, so a handler runs one extract at a time; use a
+        handler per table to read several tables side by side.
+
+        Args:
+            table_name: Name of the table to read
+            columns: Columns to read (default: all, in table order)
+            where: Optional filters as (column, operator, value) tuples, all of which must
+                match. Operators are those in FILTER_OPERATORS; a None value with '=' or
+                '<>' tests for NULL. Values are always sent as query parameters
+            chunk_rows: Rows fetched from the server and returned per DataFrame
+
+        Raises:
+            ValueError: If the table, a requested or filtered column, or an operator does not exist
+            RuntimeError: If another extract on this handler is still open
+        """
+        if self._extracting:
+            raise RuntimeError("Another extract is still reading on this connection")
+        column_types = self._extract_columns(table_name, columns, where)
+        dtypes = self._extract_dtypes(column_types)
+        for rows in self._fetch_chunks(table_name, dtypes, where, chunk_rows):
+            yield pd.DataFrame(self._chunk_columns(rows, dtypes), copy=False)
+
+    def export_table_parquet(self, table_name: str, path: str, columns=None, where=None,
+                             chunk_rows: int = 50000, compression: str = 'snappy') -> int:
+        """
+        Write a table, or the selected columns and rows of it, to a Parquet file
+        one row group per chunk, without holding the whole table in memory.
+        Needs pyarrow. Takes the same arguments as iter_table_chunks and
+        returns the number of rows written. numeric columns are written as
+        exact decimals, or as text when they have no precision that fits.
+        """
+        if pa is None:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+        if self._extracting:
+            raise RuntimeError("Another extract is still reading on this connection")
+        column_types = self._extract_columns(table_name, columns, where)
+        dtypes = self._extract_dtypes(column_types)
+
+        schema = pa.Schema.from_pandas(self._empty_frame(dtypes), preserve_index=False)
+        numeric_text = []
+        for column, (data_type, precision, scale) in column_types.items():
+            if data_type != 'numeric':
+                continue
+            if precision is not None and precision <= 38:
+                arrow_type = pa.decimal128(precision, scale)
+            else:
+                arrow_type = pa.string()
+                numeric_text.append(column)
+            schema = schema.set(schema.get_field_index(column), pa.field(column, arrow_type))
 
-        """ Connect to the PostgreSQL database and retrieves all data from a user specified table"""
+        row_count = 0
+        with pq.ParquetWriter(path, schema, compression=compression) as writer:
+            for rows in self._fetch_chunks(table_name, dtypes, where, chunk_rows):
+                chunk = pd.DataFrame(self._chunk_columns(rows, dtypes), copy=False)
+                for column in numeric_text:
+                    chunk[column] = chunk[column].astype('string')
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+                row_count += len(chunk)
+        print(f"Exported {row_count} records from {table_name} to {path}")
+        return row_count
 
+    def _extract_columns(self, table_name: str, columns=None, where=None) -> dict:
+        """Type of each requested column, with the requested and filtered columns validated against the table"""
+        table_columns = self.table_columns(table_name)
+        if not table_columns:
+            raise ValueError(f"Table {table_name} does not exist")
+        columns = list(columns) if columns else list(table_columns)
+        unknown = [column for column in columns + [column for column, _, _ in where or ()]
+                   if column not in table_columns]
+        if unknown:
+            raise ValueError(f"Unknown columns for {table_name}: {', '.join(unknown)}")
+        return {column: table_columns[column] for column in columns}
+
+    def _fetch_chunks(self, table_name: str, dtypes: dict, where=None, chunk_rows: int = 50000):
+        """Row tuples of an extract, chunk_rows at a time, read inside one transaction through a named cursor"""
+        if self._extracting:
+            raise RuntimeError("Another extract is still reading on this connection")
+        query, params = self._extract_query(table_name, dtypes, where)
+
+        self._extracting = True
+        # Named cursors only live inside a transaction
+        previous_autocommit = self.conn.autocommit
+        self.conn.autocommit = False
         try:
-            # Create a cursor object
-            cursor = self.conn.cursor()
+            with self.conn.cursor(name=f"table_extract_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = chunk_rows
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            self.conn.rollback()
+            self.conn.autocommit = previous_autocommit
+            self._extracting = False
+
+    @staticmethod
+    def _extract_dtypes(column_types: dict) -> dict:
+        """pandas dtype of each column; anything without a counterpart is read as text"""
+        return {column: EXTRACT_DTYPES.get(data_type, 'string') for column, (data_type, _, _) in column_types.items()}
+
+    @staticmethod
+    def _chunk_columns(rows, dtypes: dict) -> dict:
+        # One Series per column, so every column is its own block and can be concatenated alone
+        return {column: pd.Series([row[index] for row in rows], dtype=dtype)
+                for index, (column, dtype) in enumerate(dtypes.items())}
+
+    @staticmethod
+    def _empty_frame(dtypes: dict):
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in dtypes.items()})
+
+    def _extract_query(self, table_name: str, dtypes: dict, where=None):
+        """The extract's SELECT and its parameters; identifiers are quoted, filter values are parameters"""
+        # Types without a pandas counterpart (uuid, jsonb, tsvector, ...) are read as their text form
+        select_list = sql.SQL(', ').join(
+            sql.Identifier(column) if column_type != 'string'
+            else sql.SQL("{column}::text AS {column}").format(column=sql.Identifier(column))
+            for column, column_type in dtypes.items()
+        )
+        query = sql.SQL("SELECT {columns} FROM {table}").format(columns=select_list, table=sql.Identifier(table_name))
+
+        conditions, params = [], []
+        for column, operator, value in where or ():
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator {operator!r}, use one of {', '.join(FILTER_OPERATORS)}")
+            if value is None and operator in ('=', '<>'):
+                test = "IS NULL" if operator == '=' else "IS NOT NULL"
+                conditions.append(sql.SQL("{column} " + test).format(column=sql.Identifier(column)))
+            elif operator == 'in':
+                conditions.append(sql.SQL("{column} = ANY(%s)").format(column=sql.Identifier(column)))
+                params.append(list(value))
+            else:
+                conditions.append(sql.SQL("{column} " + operator + " %s").format(column=sql.Identifier(column)))
+                params.append(value)
+        if conditions:
+            query = sql.SQL("{query} WHERE {conditions}").format(query=query, conditions=sql.SQL(' AND ').join(conditions))
+        return query, params
+
+    def retrieve_all_from_table(self, table_name: str, columns=None, where=None):
+
+        """ Connect to the PostgreSQL database and retrieves all data (or the selected columns and rows) from a user specified table"""
+
+        try:
+            if self._extracting:
+                raise RuntimeError("Another extract is still reading on this connection")
+            column_types = self._extract_columns(table_name, columns, where)
+            dtypes = self._extract_dtypes(column_types)
+
+            # Chunks are kept per column and each column is concatenated on its own, so the
+            # peak is the table plus one column instead of twice the table
+            parts = {column: [] for column in dtypes}
+            for rows in self._fetch_chunks(table_name, dtypes, where):
+                for column, series in self._chunk_columns(rows, dtypes).items():
+                    parts[column].append(series)
+            if not any(parts.values()):
+                return self._empty_frame(dtypes)
+            data = {}
+            for column in dtypes:
+                data[column] = pd.concat(parts.pop(column), ignore_index=True)
+            return pd.DataFrame(data, copy=False)
 
-            # Fetch column names dynamically
-            cursor.execute(f"""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = '{table_name}'
-                ORDER BY ordinal_position
-            """)
-            columns = [row[0] for row in cursor.fetchall()]
-            print("Columns: ", columns)
-            # Execute a query to retrieve data from the table
-            cursor.execute("SELECT * FROM {table_name}".format(table_name=table_name))
-
-            # Fetch all rows from the result of the query
-            rows = cursor.fetchall()
-        
-            # Create a DataFrame from the rows
-            df = pd.DataFrame(rows, columns=columns)
-            return df
-        
         except Exception as e:
             print("Error retrieving data from table: ", e)
             return None
@@ -128,6 +316,152 @@ class DatabaseHandler:
             if 'cursor' in locals():
                 cursor.close()
 
+    def bulk_load_csv(self, csv_path: str, table_name: str) -> int:
+        """
+        Bulk load a CSV file into a table using COPY FROM STDIN.
+        The CSV header row names the target columns, so files written by
+        generate_dataset.py (or any DataFrame.to_csv) can be loaded directly.
+
+        Args:
+            csv_path: Path to the CSV file (with header row)
+            table_name: Name of the target table
+
+        Returns:
+            int: Number of rows loaded (0 on error)
+        """
+        try:
+            cursor = self.conn.cursor()
+            with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+                columns = next(csv.reader(f))
+                f.seek(0)
+                query = sql.SQL("COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)").format(
+                    table=sql.Identifier(table_name),
+                    columns=sql.SQL(', ').join(map(sql.Identifier, columns))
+                )
+                cursor.copy_expert(query.as_string(cursor), f, size=1 << 20)
+            row_count = cursor.rowcount
+            self.conn.commit()
+            cursor.close()
+
+            print(f"Successfully bulk loaded {row_count} records into {table_name} from {csv_path}")
+            return row_count
+
+        except Exception as e:
+            print(f"Error bulk loading {table_name} table: {e}")
+            if 'cursor' in locals():
+                cursor.close()
+            return 0
+
+    def sync_table(self, df, table_name, key_columns) -> dict:
+        """
+        Incrementally sync a table with a DataFrame instead of dropping and reloading it.
+
+        Rows are matched on their natural key: new keys are inserted, rows whose
+        values changed are updated with a single INSERT ... ON CONFLICT DO UPDATE,
+        and rows whose key is missing from the DataFrame are deleted. The whole
+        sync for the table runs in one transaction.
+
+        Args:
+            df: DataFrame containing the desired contents of the table
+            table_name: Name of the target table
+            key_columns: Columns forming the natural key (must be backed by a unique index)
+
+        Returns:
+            dict: Counts with keys 'inserted', 'updated', 'unchanged' and 'deleted'
+
+        Raises:
+            Exception: Any error from the sync, after the transaction is rolled back
+        """
+        result = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        key_columns = list(key_columns)
+
+        # Duplicate keys would make ON CONFLICT touch the same row twice
+        df = df.drop_duplicates(subset=key_columns, keep='last')
+        columns = list(df.columns)
+        # The surrogate id is only used for new rows, it never takes part in the diff
+        compare_columns = [col for col in columns if col not in key_columns and col != 'id']
+
+        table = sql.Identifier(table_name)
+        stage = sql.Identifier(f"{table_name}_sync_stage")
+        column_list = sql.SQL(', ').join(map(sql.Identifier, columns))
+        key_list = sql.SQL(', ').join(map(sql.Identifier, key_columns))
+
+        # psycopg2 needs None rather than NaN for NULLs
+        data_tuples = list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+        previous_autocommit = self.conn.autocommit
+        self.conn.autocommit = False
+        try:
+            with self.conn:
+                with self.conn.cursor() as cursor:
+                    # Stage the incoming rows in a temp table with the target's column types
+                    cursor.execute(sql.SQL(
+                        "CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA"
+                    ).format(stage=stage, columns=column_list, table=table))
+                    if data_tuples:
+                        execute_values(
+                            cursor,
+                            sql.SQL("INSERT INTO {stage} ({columns}) VALUES %s").format(
+                                stage=stage, columns=column_list
+                            ).as_string(cursor),
+                            data_tuples,
+                            page_size=1000
+                        )
+
+                    # Upsert only new or changed rows; xmax = 0 identifies freshly inserted rows
+                    if compare_columns:
+                        conflict_action = sql.SQL(
+                            "DO UPDATE SET {assignments} WHERE ({current}) IS DISTINCT FROM ({incoming})"
+                        ).format(
+                            assignments=sql.SQL(', ').join(
+                                sql.SQL("{col} = EXCLUDED.{col}").format(col=sql.Identifier(col))
+                                for col in compare_columns
+                            ),
+                            current=sql.SQL(', ').join(
+                                sql.SQL("{table}.{col}").format(table=table, col=sql.Identifier(col))
+                                for col in compare_columns
+                            ),
+                            incoming=sql.SQL(', ').join(
+                                sql.SQL("EXCLUDED.{col}").format(col=sql.Identifier(col))
+                                for col in compare_columns
+                            ),
+                        )
+                    else:
+                        conflict_action = sql.SQL("DO NOTHING")
+
+                    cursor.execute(sql.SQL(
+                        "INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage} "
+                        "ON CONFLICT ({keys}) {action} RETURNING (xmax = 0)"
+                    ).format(table=table, columns=column_list, stage=stage, keys=key_list, action=conflict_action))
+                    written = [row[0] for row in cursor.fetchall()]
+                    result['inserted'] = sum(1 for inserted in written if inserted)
+                    result['updated'] = len(written) - result['inserted']
+                    result['unchanged'] = len(data_tuples) - len(written)
+
+                    # Delete rows whose natural key is no longer present in the source
+                    cursor.execute(sql.SQL(
+                        "DELETE FROM {table} t WHERE NOT EXISTS (SELECT 1 FROM {stage} s WHERE {match})"
+                    ).format(
+                        table=table,
+                        stage=stage,
+                        match=sql.SQL(' AND ').join(
+                            sql.SQL("s.{col} = t.{col}").format(col=sql.Identifier(col)) for col in key_columns
+                        ),
+                    ))
+                    result['deleted'] = cursor.rowcount
+
+            print(
+                f"Synced {table_name}: {result['inserted']} inserted, {result['updated']} updated, "
+                f"{result['unchanged']} unchanged, {result['deleted']} deleted"
+            )
+        except Exception as e:
+            print(f"Error syncing {table_name} table: {e}")
+            raise
+        finally:
+            self.conn.autocommit = previous_autocommit
+
+        return result
+
     def test_table(self, table_name: str) -> dict:
         """
         Test if a table exists and whether it contains data.
@@ -0,0 +1,166 @@
+import itertools
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import MutableHeaders
+
+from .metrics import REGISTRY
+
+# Clients echo the time of their last write back in this header (or get it as a cookie)
+LAST_WRITE_HEADER = 'X-Last-Write'
+LAST_WRITE_COOKIE = 'fz_last_write'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+ROUTED_SESSIONS = REGISTRY.counter(
+    'db_routed_sessions_total', 'Sessions opened per engine by the read/write router', labelnames=('engine',))
+
+# Replication lag in seconds, 0 when the replica has replayed everything it received
+REPLICA_LAG_QUERY = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+class Replica:
+    __slots__ = ('name', 'engine', 'sessions', 'healthy', 'lag', 'down_until', 'last_error')
+
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.sessions = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+        self.healthy = True
+        self.lag = 0.0
+        self.down_until = 0.0
+        self.last_error = None
+
+    def available(self, now: float, max_lag: float) -> bool:
+        return self.healthy and self.lag <= max_lag and now >= self.down_until
+
+
+class ReplicaRouter:
+    """
+    Routes read-only requests to read replicas and everything else to the
+    primary. Replicas are picked round-robin among the healthy ones; a
+    background thread probes each replica's connectivity and replication lag,
+    and a replica that failed a request is skipped for failure_cooldown
+    seconds. Requests from clients that wrote within read_your_writes_seconds
+    stay on the primary so they always see their own changes.
+    """
+
+    def __init__(self, primary_sessions, replicas, read_your_writes_seconds: float = 5.0, max_lag_seconds: float = 5.0,
+                 probe_interval: float = 5.0, failure_cooldown: float = 30.0):
+        self.primary_sessions = primary_sessions
+        self.replicas = [Replica(name, engine) for name, engine in replicas]
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.max_lag_seconds = max_lag_seconds
+        self.probe_interval = probe_interval
+        self.failure_cooldown = failure_cooldown
+        self._next = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._lock = threading.Lock()
+
+        if self.replicas:
+            REGISTRY.gauge('db_replica_healthy', 'Whether the router currently sends reads to a replica', ('replica',),
+                           callback=lambda: {(r.name,): int(r.available(time.time(), self.max_lag_seconds))
+                                             for r in self.replicas})
+            REGISTRY.gauge('db_replica_lag_seconds', 'Replication lag measured by the last probe', ('replica',),
+                           callback=lambda: {(r.name,): r.lag for r in self.replicas})
+            threading.Thread(target=self._probe_loop, name='replica-probe', daemon=True).start()
+
+    def choose(self, method: str, last_write: float | None = None) -> Replica | None:
+        """The replica to serve this request from, or None for the primary"""
+        if not self.replicas or method.upper() not in SAFE_METHODS:
+            return None
+        now = time.time()
+        if last_write is not None and now - last_write < self.read_your_writes_seconds:
+            return None
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[next(self._next)]
+                if replica.available(now, self.max_lag_seconds):
+                    return replica
+        return None
+
+    def session(self, method: str, last_write: float | None = None):
+        """Open a session on the engine chosen for the request, returns (session, replica or None)"""
+        replica = self.choose(method, last_write)
+        ROUTED_SESSIONS.inc(1, replica.name if replica else 'primary')
+        if replica is None:
+            return self.primary_sessions(), None
+        return replica.sessions(), replica
+
+    def mark_failed(self, replica: Replica, error: Exception):
+        replica.down_until = time.time() + self.failure_cooldown
+        replica.last_error = str(error).splitlines()[0] if str(error) else type(error).__name__
+        print(f"⚠️ Replica {replica.name} failed ({replica.last_error}), "
+              f"sending reads to the primary for {self.failure_cooldown:.0f}s")
+
+    def _probe(self, replica: Replica):
+        try:
+            with replica.engine.connect().execution_options(skip_slow_query_log=True) as conn:
+                replica.lag = float(conn.exec_driver_sql(REPLICA_LAG_QUERY).scalar() or 0)
+            if not replica.healthy:
+                print(f"✅ Replica {replica.name} is reachable again")
+            replica.healthy = True
+        except Exception as e:
+            replica.last_error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            if replica.healthy:
+                print(f"⚠️ Replica {replica.name} health probe failed: {replica.last_error}")
+            replica.healthy = False
+
+    def _probe_loop(self):
+        while True:
+            for replica in self.replicas:
+                self._probe(replica)
+            time.sleep(self.probe_interval)
+
+    def status(self) -> list:
+        now = time.time()
+        return [{
+            'replica': replica.name,
+            'available': replica.available(now, self.max_lag_seconds),
+            'healthy': replica.healthy,
+            'lag_s': round(replica.lag, 3),
+            'cooldown_s': round(max(replica.down_until - now, 0), 1),
+            'last_error': replica.last_error,
+        } for replica in self.replicas]
+
+
+def last_write_time(request) -> float | None:
+    """Time of the client's last write, from the X-Last-Write header or the fz_last_write cookie"""
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware stamping successful writes (non-GET requests answered with
+    a status below 400) with the current time, as an X-Last-Write response
+    header and a short-lived cookie, so the client's following reads are
+    routed to the primary.
+    """
+
+    def __init__(self, app, window_seconds: float = 5.0):
+        self.app = app
+        self.window_seconds = window_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['method'] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_write_marker(message):
+            if message['type'] == 'http.response.start' and message['status'] < 400:
+                stamp = f"{time.time():.3f}"
+                headers = MutableHeaders(scope=message)
+                headers.append(LAST_WRITE_HEADER, stamp)
+                headers.append('Set-Cookie', f"{LAST_WRITE_COOKIE}={stamp}; Max-Age={int(self.window_seconds) + 1}; "
+                                             f"Path=/; SameSite=Lax; HttpOnly")
+            await send(message)
+
+        await self.app(scope, receive, send_with_write_marker)
@@ -0,0 +1,142 @@
+import io
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from starlette.responses import Response
+
+# Both formats are optional, without the packages list endpoints only answer in JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+MSGPACK_TYPE = 'application/msgpack'
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+MEDIA_TYPES = {
+    'json': ('application/json',),
+    'msgpack': (MSGPACK_TYPE, 'application/x-msgpack', 'application/vnd.msgpack'),
+    'arrow': (ARROW_TYPE,),
+}
+
+
+def available_formats() -> list:
+    formats = ['json']
+    if msgpack is not None:
+        formats.append('msgpack')
+    if pyarrow is not None:
+        formats.append('arrow')
+    return formats
+
+
+def negotiate(accept: str | None) -> str:
+    """
+    'json', 'msgpack' or 'arrow', whichever installed format the Accept header
+    gives the highest q-value; JSON wins ties and wildcards, so browsers and
+    existing clients are unaffected.
+    """
+    if not accept:
+        return 'json'
+    ranges = {}
+    for part in accept.split(','):
+        media_type, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges[media_type.strip().lower()] = max(q, ranges.get(media_type.strip().lower(), 0.0))
+
+    best, best_q = 'json', max(ranges.get(t, 0.0) for t in ('application/json', 'application/*', '*/*'))
+    for name in available_formats()[1:]:
+        q = max(ranges.get(t, 0.0) for t in MEDIA_TYPES[name])
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def schema_columns(query, schema) -> list:
+    """Columns of the query's entity that the pydantic schema exposes, in schema order"""
+    entity = query.column_descriptions[0]['entity']
+    return [getattr(entity, name) for name in schema.model_fields if hasattr(entity, name)]
+
+
+def _msgpack_default(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+
+def msgpack_response(query, schema) -> Response:
+    """The rows as a MessagePack array of maps with the same keys as the JSON response"""
+    columns = schema_columns(query, schema)
+    names = [column.key for column in columns]
+    rows = query.with_entities(*columns).all()
+    body = msgpack.packb([dict(zip(names, row)) for row in rows], default=_msgpack_default, use_bin_type=True)
+    return Response(body, media_type=MSGPACK_TYPE, headers={'Vary': 'Accept'})
+
+
+def _arrow_type(column):
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return pyarrow.string()
+    if issubclass(python_type, datetime):
+        return pyarrow.timestamp('us')
+    return {
+        bool: pyarrow.bool_(),
+        int: pyarrow.int64(),
+        float: pyarrow.float64(),
+        Decimal: pyarrow.float64(),
+        date: pyarrow.date32(),
+    }.get(python_type, pyarrow.string())
+
+
+def arrow_response(db, query, schema) -> Response:
+    """
+    The rows as an Arrow IPC stream. PostgreSQL writes the result with COPY
+    and Arrow's CSV reader parses it into columns in C, so no Python object
+    is created per row or value.
+    """
+    columns = schema_columns(query, schema)
+    compiled = query.with_entities(*columns).statement.compile(dialect=db.get_bind().dialect)
+    params = {key: str(value) if isinstance(value, uuid.UUID) else value for key, value in compiled.params.items()}
+
+    buffer = io.BytesIO()
+    with db.connection().connection.cursor() as cursor:
+        statement = cursor.mogrify(str(compiled), params).decode()
+        cursor.copy_expert(f"COPY ({statement}) TO STDOUT WITH (FORMAT csv, HEADER true)", buffer)
+    buffer.seek(0)
+
+    table = pyarrow.csv.read_csv(buffer, convert_options=pyarrow.csv.ConvertOptions(
+        column_types={column.key: _arrow_type(column) for column in columns},
+        # COPY writes NULL unquoted and empty strings quoted
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=False,
+        true_values=['t'],
+        false_values=['f'],
+    ))
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(sink.getvalue().to_pybytes(), media_type=ARROW_TYPE, headers={'Vary': 'Accept'})
+
+
+def list_response(db, query, schema, format: str) -> Response:
+    """A list endpoint's rows in the negotiated binary format"""
+    if format == 'arrow':
+        return arrow_response(db, query, schema)
+    return msgpack_response(query, schema)
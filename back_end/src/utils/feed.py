@@ -0,0 +1,102 @@
+from sqlalchemy import text
+
+from .marketplace import UUID_PATTERN
+from .pagination import decode_cursor, encode_cursor
+
+MAX_PAGE_SIZE = 100
+
+# Keys of the feed order, newest first; kind, item_id and producer_id make it total
+FEED_KEYS = ('occurred_at', 'kind', 'item_id', 'producer_id')
+FEED_KEY_TYPES = ('timestamp', 'text', 'text', 'text')
+
+# producer_id columns hold user ids as strings, the guard keeps malformed ones
+# from failing the cast so joins can use the uuid primary key and indexes
+FOLLOWED = """
+    SELECT producer_id, created_at AS followed_at,
+           CASE WHEN producer_id ~* :uuid_pattern THEN producer_id::uuid END AS producer_uuid
+    FROM producer_consumer_matches
+    WHERE consumer_id = :consumer_id
+"""
+
+PRODUCERS_QUERY = text(f"""
+    WITH followed AS ({FOLLOWED})
+    SELECT f.producer_id, f.followed_at, u.username, u.email,
+           (SELECT count(*) FROM products p WHERE p.user_id = f.producer_uuid) AS product_count
+    FROM followed f
+    LEFT JOIN users u ON u.id = f.producer_uuid
+    ORDER BY f.followed_at DESC
+""")
+
+# New products of followed producers and the events they sell at, merged into one timeline
+FEED_QUERY = text(f"""
+    WITH followed AS ({FOLLOWED}),
+    items AS (
+        SELECT p.created_at AS occurred_at, 'product' AS kind, p.product_id AS item_id,
+               f.producer_id, f.producer_uuid, p.product_name AS title, p.description, p.image_url, p.cost, p.unit,
+               NULL::varchar AS event_date, NULL::varchar AS event_time, NULL::varchar AS location
+        FROM followed f
+        JOIN products p ON p.user_id = f.producer_uuid
+        UNION ALL
+        SELECT e.created_at, 'event', e.event_id,
+               f.producer_id, f.producer_uuid, e.name, e.description, NULL, NULL, NULL,
+               e.date, e.time, e.location
+        FROM followed f
+        JOIN event_vendor ev ON ev.producer_id = f.producer_id
+        JOIN events e ON e.event_id = ev.event_id
+    )
+    SELECT i.occurred_at, i.kind, i.item_id, i.producer_id, u.username AS producer_name,
+           i.title, i.description, i.image_url, i.cost, i.unit, i.event_date, i.event_time, i.location
+    FROM items i
+    LEFT JOIN users u ON u.id = i.producer_uuid
+    WHERE NOT :has_cursor OR (i.occurred_at, i.kind, i.item_id, i.producer_id) < (:after_0, :after_1, :after_2, :after_3)
+    ORDER BY i.occurred_at DESC, i.kind DESC, i.item_id DESC, i.producer_id DESC
+    LIMIT :limit
+""")
+
+
+def consumer_tag(consumer_id) -> str:
+    return f"consumer:{consumer_id}"
+
+
+def producer_tag(producer_id) -> str:
+    return f"producer:{producer_id}"
+
+
+def feed_tags(consumer_id: str, producer_ids) -> list:
+    """Cache tags of a consumer's feed: their follows and every followed producer"""
+    return [consumer_tag(consumer_id)] + [producer_tag(producer_id) for producer_id in producer_ids]
+
+
+def consumer_feed(db, consumer_id: str, limit: int = 20, cursor: str | None = None, cache=None) -> dict:
+    """
+    One page of a consumer's feed: products and events of the producers they
+    follow, newest first, keyset paginated. The first page also lists the
+    followed producers. Pages are cached per consumer when a cache is given
+    and dropped when a followed producer or the consumer's follows change.
+    Raises ValueError for an invalid cursor.
+    """
+    key = (consumer_id, cursor or '', limit)
+    if cache is not None:
+        from .cache import MISS
+        cached = cache.get(key)
+        if cached is not MISS:
+            return cached
+        generation = cache.generation()
+
+    values = decode_cursor('feed', cursor, FEED_KEY_TYPES) if cursor else [None] * len(FEED_KEYS)
+    params = {'consumer_id': consumer_id, 'uuid_pattern': UUID_PATTERN, 'limit': limit + 1, 'has_cursor': bool(cursor)}
+    params.update({f'after_{i}': value for i, value in enumerate(values)})
+
+    producers = [dict(row) for row in db.execute(PRODUCERS_QUERY, {'consumer_id': consumer_id, 'uuid_pattern': UUID_PATTERN}).mappings().all()]
+    rows = [dict(row) for row in db.execute(FEED_QUERY, params).mappings().all()]
+
+    page = {
+        'consumer_id': consumer_id,
+        'producers': producers if not cursor else None,
+        'items': rows[:limit],
+        'next_cursor': encode_cursor('feed', [rows[limit - 1][key] for key in FEED_KEYS]) if len(rows) > limit else None,
+    }
+    if cache is not None:
+        cache.set(key, page, feed_tags(consumer_id, [producer['producer_id'] for producer in producers]),
+                  generation)
+    return page
@@ -0,0 +1,128 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+from .metrics import REGISTRY
+
+# Pool waits are normally sub-millisecond, anything in the upper buckets is starvation
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+POOL_WAIT = REGISTRY.histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a connection from the pool',
+    buckets=POOL_WAIT_BUCKETS, labelnames=('pool',))
+POOL_TIMEOUTS = REGISTRY.counter(
+    'db_pool_checkout_timeouts_total', 'Checkouts that gave up after pool_timeout', labelnames=('pool',))
+S3_DURATION = REGISTRY.histogram(
+    'aws_s3_request_duration_seconds', 'Latency of S3 API calls', labelnames=('operation', 'outcome'))
+EXECUTOR_QUEUED = REGISTRY.gauge(
+    'executor_queued_tasks', 'Tasks submitted to a thread pool executor and not started yet', labelnames=('executor',))
+EXECUTOR_ACTIVE = REGISTRY.gauge(
+    'executor_active_tasks', 'Tasks currently running in a thread pool executor', labelnames=('executor',))
+EXECUTOR_WAIT = REGISTRY.histogram(
+    'executor_queue_wait_seconds', 'Time tasks spent queued before a worker picked them up', labelnames=('executor',))
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool recording how long every checkout waited for a connection"""
+
+    # Label used in the metrics, set by register_pool_metrics
+    metrics_name = 'primary'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc(1, self.metrics_name)
+            raise
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started, self.metrics_name)
+
+
+# Engines whose pools are exposed through the gauges below, by name
+_ENGINES = {}
+
+
+def _pool_stats(method, transform=lambda value: value):
+    return lambda: {(name,): transform(getattr(engine.pool, method)()) for name, engine in list(_ENGINES.items())
+                    if hasattr(engine.pool, method)}
+
+
+REGISTRY.gauge('db_pool_size', 'Configured pool_size', ('pool',), callback=_pool_stats('size'))
+REGISTRY.gauge('db_pool_checked_out', 'Connections currently checked out', ('pool',),
+               callback=_pool_stats('checkedout'))
+REGISTRY.gauge('db_pool_checked_in', 'Idle connections in the pool', ('pool',), callback=_pool_stats('checkedin'))
+# QueuePool.overflow() is negative while the pool has not been filled up yet
+REGISTRY.gauge('db_pool_overflow', 'Connections opened beyond pool_size', ('pool',),
+               callback=_pool_stats('overflow', lambda value: max(value, 0)))
+
+
+def register_pool_metrics(engine, name: str = 'primary'):
+    """Expose the pool occupancy of an engine as gauges read at scrape time"""
+    def label_pool(*args):
+        engine.pool.metrics_name = name
+
+    label_pool()
+    # dispose() swaps in a fresh pool which needs the label again
+    event.listen(engine, 'engine_disposed', label_pool)
+    _ENGINES[name] = engine
+
+
+def _s3_before_call(context, model, **kwargs):
+    context['farmzilla_started'] = time.perf_counter()
+
+
+def _s3_after_call(context, model, http_response=None, parsed=None, **kwargs):
+    started = context.pop('farmzilla_started', None)
+    if started is None:
+        return
+    status_code = getattr(http_response, 'status_code', 0)
+    outcome = 'ok' if status_code and status_code < 400 else 'error'
+    S3_DURATION.observe(time.perf_counter() - started, model.name, outcome)
+
+
+def _s3_after_call_error(context, model, exception=None, **kwargs):
+    started = context.pop('farmzilla_started', None)
+    if started is not None:
+        S3_DURATION.observe(time.perf_counter() - started, model.name, 'error')
+
+
+def instrument_s3_client(client):
+    """Time every S3 API call of a boto3 client through its event hooks"""
+    events = client.meta.events
+    events.register('before-call.s3', _s3_before_call)
+    events.register('after-call.s3', _s3_after_call)
+    events.register('after-call-error.s3', _s3_after_call_error)
+    return client
+
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor reporting its queue depth, running tasks and queue wait"""
+
+    def __init__(self, name: str, max_workers: int | None = None):
+        super().__init__(max_workers=max_workers, thread_name_prefix=name)
+        self.name = name
+        EXECUTOR_QUEUED.set(0, name)
+        EXECUTOR_ACTIVE.set(0, name)
+
+    def submit(self, fn, /, *args, **kwargs):
+        submitted = time.perf_counter()
+        EXECUTOR_QUEUED.inc(1, self.name)
+
+        def run():
+            EXECUTOR_QUEUED.dec(1, self.name)
+            EXECUTOR_ACTIVE.inc(1, self.name)
+            EXECUTOR_WAIT.observe(time.perf_counter() - submitted, self.name)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                EXECUTOR_ACTIVE.dec(1, self.name)
+
+        try:
+            return super().submit(run)
+        except Exception:
+            EXECUTOR_QUEUED.dec(1, self.name)
+            raise
@@ -0,0 +1,298 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from .metrics import REGISTRY
+
+# Counted when the insert runs: with commit=False a job whose caller's transaction rolls back is
+# still counted, so this is an upper bound of the jobs actually queued
+JOBS_ENQUEUED = REGISTRY.counter(
+    'background_jobs_enqueued_total', 'Background jobs queued, by kind (upper bound)', labelnames=('kind',))
+JOBS_FINISHED = REGISTRY.counter(
+    'background_jobs_finished_total', 'Background job attempts by kind and outcome (succeeded, retried, failed, lease_expired)',
+    labelnames=('kind', 'outcome'))
+JOB_SECONDS = REGISTRY.histogram(
+    'background_job_seconds', 'Background job run time', labelnames=('kind',),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0))
+JOB_DELAY_SECONDS = REGISTRY.histogram(
+    'background_job_delay_seconds', 'Time from a job becoming due to a worker starting it', labelnames=('kind',),
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0))
+
+JOB_COLUMNS = """id, kind, payload, priority, status, attempts, max_attempts, idempotency_key,
+                 run_at, locked_until, worker_id, lease_token, last_error, created_at, finished_at"""
+
+# A repeated idempotency key returns the job queued the first time
+ENQUEUE_QUERY = text("""
+    INSERT INTO background_jobs (id, kind, payload, priority, status, attempts, max_attempts, idempotency_key,
+                                 run_at, created_at)
+    VALUES (:id, :kind, CAST(:payload AS jsonb), :priority, 'queued', 0, :max_attempts, :idempotency_key,
+            :run_at, :now)
+    ON CONFLICT (idempotency_key) DO NOTHING
+    RETURNING id, kind, status
+""")
+
+# Highest priority due job this worker has a handler for; SKIP LOCKED lets
+# concurrent workers take different rows instead of queueing on one. Every claim
+# gets a new lease token, the outcome of an attempt is only written while it holds
+# the lease, so a late finish of a reaped attempt cannot overwrite the next one
+CLAIM_QUERY = text("""
+    UPDATE background_jobs
+    SET status = 'running', attempts = attempts + 1, worker_id = :worker_id, locked_until = :locked_until,
+        lease_token = :lease_token
+    WHERE id = (
+        SELECT id FROM background_jobs
+        WHERE status = 'queued' AND run_at <= :now AND kind = ANY(:kinds)
+        ORDER BY priority DESC, run_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, kind, payload, attempts, max_attempts, run_at, lease_token
+""")
+
+SUCCEED_QUERY = text("""
+    UPDATE background_jobs
+    SET status = 'succeeded', finished_at = :now, locked_until = NULL, last_error = NULL
+    WHERE id = :id AND lease_token = :lease_token AND status = 'running'
+""")
+
+RETRY_QUERY = text("""
+    UPDATE background_jobs
+    SET status = 'queued', run_at = :run_at, locked_until = NULL, worker_id = NULL, lease_token = NULL,
+        last_error = :error
+    WHERE id = :id AND lease_token = :lease_token AND status = 'running'
+""")
+
+FAIL_QUERY = text("""
+    UPDATE background_jobs
+    SET status = 'failed', finished_at = :now, locked_until = NULL, last_error = :error
+    WHERE id = :id AND lease_token = :lease_token AND status = 'running'
+""")
+
+# Jobs whose worker died mid-run go back to the queue, or fail when out of attempts
+REAP_QUERY = text("""
+    UPDATE background_jobs
+    SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+        finished_at = CASE WHEN attempts >= max_attempts THEN CAST(:now AS timestamp) END,
+        locked_until = NULL, worker_id = NULL, lease_token = NULL, last_error = 'Worker lease expired'
+    WHERE status = 'running' AND locked_until < :now
+""")
+
+PURGE_QUERY = text("""
+    DELETE FROM background_jobs
+    WHERE id IN (SELECT id FROM background_jobs WHERE status = 'succeeded' AND finished_at < :before LIMIT 1000)
+""")
+
+STATS_QUERY = text("""
+    SELECT kind, status, count(*) AS jobs, min(run_at) AS oldest_run_at
+    FROM background_jobs
+    GROUP BY kind, status
+    ORDER BY kind, status
+""")
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help, the job fails without further attempts"""
+
+
+class JobRegistry:
+    """Job kinds and the functions that run them, handlers take the job's payload dict"""
+
+    def __init__(self):
+        self.handlers = {}
+
+    def handler(self, kind: str):
+        def register(function):
+            self.handlers[kind] = function
+            return function
+        return register
+
+    def __contains__(self, kind):
+        return kind in self.handlers
+
+
+def enqueue(db, kind: str, payload: dict | None = None, priority: int = 0, idempotency_key: str | None = None,
+            delay_seconds: float = 0, max_attempts: int = 5, commit: bool = True) -> dict:
+    """
+    Queue a job. Without commit it becomes visible with the caller's
+    transaction, so it runs only if the change that needs it is committed.
+    Returns {'id', 'kind', 'status', 'created'}; created is False when
+    idempotency_key matched an earlier job, which is returned instead.
+    """
+    now = datetime.utcnow()
+    row = db.execute(ENQUEUE_QUERY, {
+        'id': uuid.uuid4(),
+        'kind': kind,
+        'payload': json.dumps(payload or {}, default=str),
+        'priority': priority,
+        'max_attempts': max_attempts,
+        'idempotency_key': idempotency_key,
+        'run_at': now + timedelta(seconds=delay_seconds),
+        'now': now,
+    }).mappings().first()
+    created = row is not None
+    if not created:
+        row = db.execute(text("SELECT id, kind, status FROM background_jobs WHERE idempotency_key = :key"),
+                         {'key': idempotency_key}).mappings().first()
+    if commit:
+        db.commit()
+    if created:
+        JOBS_ENQUEUED.inc(1, kind)
+    return {**dict(row), 'created': created}
+
+
+def get_job(db, job_id):
+    row = db.execute(text(f"SELECT {JOB_COLUMNS} FROM background_jobs WHERE id = :id"), {'id': job_id}).mappings().first()
+    return dict(row) if row is not None else None
+
+
+def queue_stats(db) -> list:
+    """Job counts per kind and status with the oldest run_at of each group"""
+    return [dict(row) for row in db.execute(STATS_QUERY).mappings().all()]
+
+
+def backoff_seconds(attempt: int, base: float, maximum: float) -> float:
+    """Exponential backoff with jitter: base * 2^(attempt - 1), capped, scaled by a random 50-100%"""
+    return min(maximum, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+class JobWorker:
+    """
+    Runs queued background jobs on `concurrency` threads. Each claimed job is
+    leased for `lease_seconds`; a job still running when its lease expires
+    is assumed lost with its worker and queued again, so handlers must be
+    idempotent and finish well within the lease. Failed attempts are retried
+    with exponential backoff until max_attempts. The queue is polled rather
+    than LISTENed to, which would need a session behind the pooler.
+    """
+
+    def __init__(self, session_factory, registry: JobRegistry, concurrency=4, lease_seconds=300, poll_interval=1.0,
+                 backoff_base_seconds=10, backoff_max_seconds=3600, retention_days=7, worker_id=None):
+        self.session_factory = session_factory
+        self.registry = registry
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.retention_days = retention_days
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._stop = threading.Event()
+        self._running = 0
+        self._running_lock = threading.Lock()
+        REGISTRY.gauge('background_jobs_running', 'Jobs being run by this worker process',
+                       callback=lambda: {(): self._running})
+
+    def stop(self):
+        """Let running jobs finish, then return from run()"""
+        self._stop.set()
+
+    def run(self, housekeeping_interval: float = 30.0):
+        threads = [threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+                   for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        while not self._stop.is_set():
+            try:
+                self.housekeeping()
+            except Exception as e:
+                print(f"⚠️ Job housekeeping failed: {e}")
+            self._stop.wait(housekeeping_interval)
+        for thread in threads:
+            thread.join()
+
+    def run_until_empty(self) -> int:
+        """Run due jobs on the calling thread until none is left, returns how many ran"""
+        self.housekeeping()
+        count = 0
+        while not self._stop.is_set() and self.run_once():
+            count += 1
+        return count
+
+    def run_once(self) -> bool:
+        """Claim and run one job, False when nothing is due"""
+        job = self.claim()
+        if job is None:
+            return False
+        self.execute(job)
+        return True
+
+    def housekeeping(self):
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            reaped = db.execute(REAP_QUERY, {'now': now}).rowcount
+            purged = db.execute(PURGE_QUERY, {'before': now - timedelta(days=self.retention_days)}).rowcount
+            db.commit()
+        if reaped:
+            print(f"⚠️ Requeued {reaped} background job(s) with an expired lease")
+        if purged:
+            print(f"🧹 Purged {purged} finished background job(s)")
+
+    def claim(self):
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            row = db.execute(CLAIM_QUERY, {
+                'worker_id': self.worker_id,
+                'locked_until': now + timedelta(seconds=self.lease_seconds),
+                'lease_token': uuid.uuid4(),
+                'now': now,
+                'kinds': list(self.registry.handlers),
+            }).mappings().first()
+            db.commit()
+        if row is None:
+            return None
+        JOB_DELAY_SECONDS.observe(max(0.0, (now - row['run_at']).total_seconds()), row['kind'])
+        return dict(row)
+
+    def execute(self, job: dict):
+        kind = job['kind']
+        with self._running_lock:
+            self._running += 1
+        started = time.perf_counter()
+        try:
+            self.registry.handlers[kind](job['payload'])
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if isinstance(e, PermanentJobError) or job['attempts'] >= job['max_attempts']:
+                if self._update(FAIL_QUERY, job, error=error):
+                    JOBS_FINISHED.inc(1, kind, 'failed')
+                    print(f"❌ Job {kind} {job['id']} failed after {job['attempts']} attempt(s): {error}")
+            else:
+                delay = backoff_seconds(job['attempts'], self.backoff_base_seconds, self.backoff_max_seconds)
+                if self._update(RETRY_QUERY, job, error=error, run_at=datetime.utcnow() + timedelta(seconds=delay)):
+                    JOBS_FINISHED.inc(1, kind, 'retried')
+                    print(f"🔁 Job {kind} {job['id']} attempt {job['attempts']} failed, retrying in {delay:.0f}s: {error}")
+        else:
+            if self._update(SUCCEED_QUERY, job):
+                JOBS_FINISHED.inc(1, kind, 'succeeded')
+        finally:
+            JOB_SECONDS.observe(time.perf_counter() - started, kind)
+            with self._running_lock:
+                self._running -= 1
+
+    def _update(self, query, job: dict, **params) -> bool:
+        """Record the attempt's outcome, False when the lease expired and the job was reaped meanwhile"""
+        with self.session_factory() as db:
+            updated = db.execute(query, {'id': job['id'], 'lease_token': job['lease_token'], 'now': datetime.utcnow(),
+                                         **params}).rowcount
+            db.commit()
+        if not updated:
+            JOBS_FINISHED.inc(1, job['kind'], 'lease_expired')
+            print(f"⚠️ Job {job['kind']} {job['id']} outlived its lease, its outcome was discarded")
+        return bool(updated)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                # Database unavailable, keep polling
+                print(f"⚠️ Job worker error: {e}")
+            self._stop.wait(self.poll_interval)
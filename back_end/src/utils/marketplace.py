@@ -0,0 +1,118 @@
+from sqlalchemy import text
+
+from .pagination import decode_cursor, encode_cursor
+
+MAX_PAGE_SIZE = 100
+UUID_PATTERN = '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+
+# Rebuilds producer_rating_summary from the ratings table, used after bulk loads
+REBUILD_RATING_SUMMARY_QUERY = """
+    WITH totals AS (
+        SELECT producer_id, count(*) AS rating_count, sum(rating) AS rating_sum
+        FROM ratings GROUP BY producer_id
+    ), removed AS (
+        DELETE FROM producer_rating_summary s
+        WHERE NOT EXISTS (SELECT 1 FROM totals t WHERE t.producer_id = s.producer_id)
+    )
+    INSERT INTO producer_rating_summary (producer_id, rating_count, rating_sum)
+    SELECT producer_id, rating_count, rating_sum FROM totals
+    ON CONFLICT (producer_id) DO UPDATE
+    SET rating_count = EXCLUDED.rating_count, rating_sum = EXCLUDED.rating_sum
+"""
+
+RECORD_RATING_QUERY = text("""
+    INSERT INTO producer_rating_summary (producer_id, rating_count, rating_sum)
+    VALUES (:producer_id, 1, :rating)
+    ON CONFLICT (producer_id) DO UPDATE
+    SET rating_count = producer_rating_summary.rating_count + 1,
+        rating_sum = producer_rating_summary.rating_sum + EXCLUDED.rating_sum
+""")
+
+# Great-circle distance in km from (:lat, :lng) to the producer's "lat,lng" location
+DISTANCE_KM = """6371 * 2 * asin(sqrt(
+    power(sin(radians(loc.lat - :lat) / 2), 2) +
+    cos(radians(:lat)) * cos(radians(loc.lat)) * power(sin(radians(loc.lng - :lng) / 2), 2)))"""
+
+# Sort name -> (direction, key expressions). All keys of a sort share the
+# direction so the keyset condition is a single row comparison; product_id is
+# unique and makes every order total.
+SORTS = {
+    'rating': ('ASC', ['-coalesce(s.average_rating, 0)', 'p.product_name', 'p.product_id']),
+    'price': ('ASC', ["coalesce(p.cost::float8, 'Infinity')", 'p.product_id']),
+    'distance': ('ASC', [f"coalesce({DISTANCE_KM}, 'Infinity')", 'p.product_id']),
+    'recency': ('DESC', ['p.created_at', 'p.product_id']),
+}
+# Type of each sort key, checked when a cursor is decoded
+SORT_KEY_TYPES = {
+    'rating': ('number', 'text', 'text'),
+    'price': ('number', 'text'),
+    'distance': ('number', 'text'),
+    'recency': ('timestamp', 'text'),
+}
+
+LISTING_QUERY = """
+    SELECT p.id, p.product_id, p.product_name, p.description, p.image_url, p.user_id, p.cost, p.unit, p.created_at,
+           u.username AS producer_name,
+           coalesce(s.average_rating, 0) AS producer_rating,
+           coalesce(s.rating_count, 0) AS total_reviews,
+           {distance} AS distance_km,
+           {keys}
+    FROM products p
+    LEFT JOIN users u ON u.id = p.user_id
+    LEFT JOIN producer_rating_summary s ON s.producer_id = p.user_id::text
+    LEFT JOIN LATERAL (
+        SELECT split_part(u.location, ',', 1)::float8 AS lat, split_part(u.location, ',', 2)::float8 AS lng
+        WHERE u.location ~ '^\\s*-?[0-9]+(\\.[0-9]+)?\\s*,\\s*-?[0-9]+(\\.[0-9]+)?\\s*$'
+    ) loc ON true
+    WHERE {conditions}
+    ORDER BY {order}
+    LIMIT :limit
+"""
+
+
+def record_rating(db, producer_id: str, rating: int):
+    """Add a new rating to the producer's running totals (in the caller's transaction)"""
+    db.execute(RECORD_RATING_QUERY, {'producer_id': producer_id, 'rating': rating})
+
+
+def list_products(db, sort: str = 'rating', limit: int = 24, cursor: str | None = None, event_id: str | None = None,
+                  lat: float | None = None, lng: float | None = None) -> dict:
+    """
+    One page of the marketplace product listing with producer names and
+    rating aggregates, ordered by `sort` and paginated with a keyset cursor.
+    Raises ValueError for invalid arguments.
+    """
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+    if (lat is None) != (lng is None) or (sort == 'distance' and lat is None):
+        raise ValueError("lat and lng are required together, and for sort=distance")
+
+    direction, keys = SORTS[sort]
+    params = {'limit': limit + 1, 'lat': lat, 'lng': lng}
+    conditions = ['true']
+    if event_id:
+        # producer_id is a string column, matching on the uuid lets the lookup use products' user_id index
+        conditions.append("p.user_id IN (SELECT producer_id::uuid FROM event_vendor "
+                          "WHERE event_id = :event_id AND producer_id ~* :uuid_pattern)")
+        params.update(event_id=event_id, uuid_pattern=UUID_PATTERN)
+    if cursor:
+        after = decode_cursor(sort, cursor, SORT_KEY_TYPES[sort])
+        comparison = '>' if direction == 'ASC' else '<'
+        conditions.append(f"({', '.join(keys)}) {comparison} ({', '.join(f':after_{i}' for i in range(len(keys)))})")
+        params.update({f'after_{i}': value for i, value in enumerate(after)})
+
+    query = LISTING_QUERY.format(
+        distance=DISTANCE_KM if lat is not None else 'NULL::float8',
+        keys=', '.join(f"{key} AS sort_key_{i}" for i, key in enumerate(keys)),
+        conditions=' AND '.join(conditions),
+        order=', '.join(f"{key} {direction}" for key in keys),
+    )
+    rows = [dict(row) for row in db.execute(text(query), params).mappings().all()]
+
+    page = rows[:limit]
+    sort_keys = [[row.pop(f'sort_key_{i}') for i in range(len(keys))] for row in rows]
+    return {
+        'sort': sort,
+        'products': page,
+        'next_cursor': encode_cursor(sort, sort_keys[limit - 1]) if len(rows) > limit else None,
+    }
@@ -0,0 +1,213 @@
+import math
+import threading
+from bisect import bisect_left
+from collections import deque
+
+# Default latency buckets in seconds, sub-millisecond bounds keep fast routes apart
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with one series per label value tuple. With
+    sample_size each series also keeps its last sample_size observations,
+    so quantiles are read from real values instead of bucket bounds.
+    """
+
+    def __init__(self, name: str, description: str, buckets=DEFAULT_BUCKETS, labelnames=(), sample_size: int = 0):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self.sample_size = sample_size
+        self._series = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        """Record one observation for the given label values"""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Bucket counts (last slot is +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            if self.sample_size:
+                samples = self._samples.get(labels)
+                if samples is None:
+                    samples = self._samples[labels] = deque(maxlen=self.sample_size)
+                samples.append(value)
+
+    def snapshot(self) -> dict:
+        """Return {labels: {'buckets': [...], 'sum': float, 'count': int}} with cumulative bucket counts"""
+        with self._lock:
+            items = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        result = {}
+        for labels, counts, total, count in items:
+            cumulative, running = [], 0
+            for bucket_count in counts:
+                running += bucket_count
+                cumulative.append(running)
+            result[labels] = {'buckets': cumulative, 'sum': total, 'count': count}
+        return result
+
+    def sample(self, *labels) -> list:
+        """The kept recent observations of a series, sorted (empty without sample_size)"""
+        with self._lock:
+            return sorted(self._samples.get(labels, ()))
+
+    def quantile(self, q: float, *labels):
+        """
+        Nearest-rank quantile of the recent sample when the histogram keeps
+        one, otherwise estimated by linear interpolation inside the matching
+        bucket (only as precise as the bucket bounds)
+        """
+        sample = self.sample(*labels)
+        if sample:
+            return sample[min(len(sample) - 1, max(0, math.ceil(q * len(sample)) - 1))]
+        series = self.snapshot().get(labels)
+        if not series or not series['count']:
+            return None
+        target = q * series['count']
+        previous_bound, previous_count = 0.0, 0
+        for bound, cumulative in zip(self.buckets, series['buckets']):
+            if cumulative >= target:
+                in_bucket = cumulative - previous_count
+                fraction = (target - previous_count) / in_bucket if in_bucket else 1.0
+                return previous_bound + (bound - previous_bound) * fraction
+            previous_bound, previous_count = bound, cumulative
+        # Falls in the +Inf bucket, the largest finite bound is the best estimate
+        return self.buckets[-1]
+
+
+class Counter:
+    """Monotonic counter with one value per label value tuple"""
+
+    def __init__(self, name: str, description: str, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge:
+    """
+    Point-in-time value per label value tuple. Either set/inc/dec directly or
+    pass a callback returning {labels: value} that is read at collection time,
+    which keeps the hot path free of any bookkeeping.
+    """
+
+    def __init__(self, name: str, description: str, labelnames=(), callback=None):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, amount: float = 1.0, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, *labels):
+        self.inc(-amount, *labels)
+
+    def snapshot(self) -> dict:
+        if self.callback is not None:
+            return dict(self.callback())
+        with self._lock:
+            return dict(self._values)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Process-wide collection of metrics, created on first use by name"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def histogram(self, name: str, description: str, buckets=DEFAULT_BUCKETS, labelnames=(), sample_size: int = 0) -> Histogram:
+        return self._get_or_create(Histogram, name, description, buckets=buckets, labelnames=labelnames,
+                                   sample_size=sample_size)
+
+    def counter(self, name: str, description: str, labelnames=()) -> Counter:
+        return self._get_or_create(Counter, name, description, labelnames=labelnames)
+
+    def gauge(self, name: str, description: str, labelnames=(), callback=None) -> Gauge:
+        gauge = self._get_or_create(Gauge, name, description, labelnames=labelnames)
+        if callback is not None:
+            gauge.callback = callback
+        return gauge
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics():
+            try:
+                series = metric.snapshot()
+            except Exception as e:
+                # A failing callback must not take the whole scrape down
+                print(f"⚠️ Could not collect metric {metric.name}: {e}")
+                continue
+            kind = {Histogram: 'histogram', Counter: 'counter', Gauge: 'gauge'}[type(metric)]
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {kind}")
+            for labels, value in sorted(series.items()):
+                if kind != 'histogram':
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}")
+                    continue
+                bounds = metric.buckets + (float('inf'),)
+                for bound, cumulative in zip(bounds, value['buckets']):
+                    le = f'le="{_format_value(float(bound))}"'
+                    lines.append(f"{metric.name}_bucket{_format_labels(metric.labelnames, labels, le)} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(metric.labelnames, labels)} {_format_value(value['sum'])}")
+                lines.append(f"{metric.name}_count{_format_labels(metric.labelnames, labels)} {value['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+# Shared registry used by the middleware and the admin endpoints
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,478 @@
+import os
+import smtplib
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+
+from sqlalchemy import text
+
+from .marketplace import UUID_PATTERN
+from .pagination import decode_cursor, encode_cursor
+
+MAX_PAGE_SIZE = 100
+# Products and events listed in one newsletter
+MAX_NEWSLETTER_ITEMS = 50
+# newsletter_jobs.subject is a VARCHAR(255)
+MAX_SUBJECT_LENGTH = 255
+# Serialises job claims across workers so the running job limit holds
+CLAIM_LOCK_KEY = 4_407_044
+# Returned by NewsletterWorker._deliver for messages skipped because the worker is stopping
+STOPPED = object()
+
+JOB_COLUMNS = """id, producer_id, subject, status, total_recipients, sent_count, failed_count,
+                 error, created_at, started_at, heartbeat_at, finished_at"""
+
+# Followers with a usable address, walked in consumer_id order so the last one
+# sent is a resume point; served by the (producer_id, consumer_id) unique index
+RECIPIENTS_QUERY = text("""
+    SELECT m.consumer_id, u.username, u.email
+    FROM producer_consumer_matches m
+    JOIN users u ON u.id = CASE WHEN m.consumer_id ~* :uuid_pattern THEN m.consumer_id::uuid END
+    WHERE m.producer_id = :producer_id AND m.consumer_id > :after
+      AND u.email IS NOT NULL AND u.email <> ''
+    ORDER BY m.consumer_id
+    LIMIT :limit
+""")
+
+RECIPIENT_COUNT_QUERY = text("""
+    SELECT count(*)
+    FROM producer_consumer_matches m
+    JOIN users u ON u.id = CASE WHEN m.consumer_id ~* :uuid_pattern THEN m.consumer_id::uuid END
+    WHERE m.producer_id = :producer_id AND u.email IS NOT NULL AND u.email <> ''
+""")
+
+SUBSCRIBERS_QUERY = text("""
+    SELECT m.consumer_id, u.username, u.email, m.created_at AS subscribed_at
+    FROM producer_consumer_matches m
+    LEFT JOIN users u ON u.id = CASE WHEN m.consumer_id ~* :uuid_pattern THEN m.consumer_id::uuid END
+    WHERE m.producer_id = :producer_id AND m.consumer_id > :after
+    ORDER BY m.consumer_id
+    LIMIT :limit
+""")
+
+SUBSCRIBER_COUNT_QUERY = text("SELECT count(*) FROM producer_consumer_matches WHERE producer_id = :producer_id")
+
+PRODUCER_QUERY = text("SELECT username FROM users WHERE id = :producer_id")
+
+PRODUCTS_QUERY = text("""
+    SELECT product_name, description, cost, unit
+    FROM products WHERE user_id = :producer_id
+    ORDER BY created_at DESC, product_id
+    LIMIT :limit
+""")
+
+EVENTS_QUERY = text("""
+    SELECT e.name, e.date, e.time, e.location
+    FROM event_vendor ev
+    JOIN events e ON e.event_id = ev.event_id
+    WHERE ev.producer_id = :producer_id
+    ORDER BY e.date, e.time, e.event_id
+    LIMIT :limit
+""")
+
+# The partial unique index allows one queued or running job per producer
+ENQUEUE_QUERY = text(f"""
+    INSERT INTO newsletter_jobs (id, producer_id, subject, body, status, sent_count, failed_count, created_at)
+    VALUES (:id, :producer_id, :subject, :body, 'queued', 0, 0, :now)
+    ON CONFLICT (producer_id) WHERE status IN ('queued', 'running') DO NOTHING
+    RETURNING {JOB_COLUMNS}
+""")
+
+# Oldest queued job, or a running one whose worker stopped sending heartbeats,
+# while fewer than :max_running jobs are being sent
+CLAIM_QUERY = text(f"""
+    UPDATE newsletter_jobs
+    SET status = 'running', worker_id = :worker_id, heartbeat_at = :now, started_at = coalesce(started_at, :now)
+    WHERE id = (
+        SELECT id FROM newsletter_jobs
+        WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < :stale_before)
+        ORDER BY created_at
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    )
+    AND (SELECT count(*) FROM newsletter_jobs
+         WHERE status = 'running' AND heartbeat_at >= :stale_before) < :max_running
+    RETURNING {JOB_COLUMNS}, body, last_consumer_id
+""")
+
+CHECKPOINT_QUERY = text("""
+    UPDATE newsletter_jobs
+    SET sent_count = sent_count + :sent, failed_count = failed_count + :failed,
+        last_consumer_id = :last_consumer_id, heartbeat_at = :now
+    WHERE id = :id AND worker_id = :worker_id
+    RETURNING status
+""")
+
+FINISH_QUERY = text("""
+    UPDATE newsletter_jobs
+    SET status = :status, error = :error, heartbeat_at = :now,
+        finished_at = CASE WHEN :status = 'queued' THEN NULL ELSE :now END,
+        worker_id = CASE WHEN :status = 'queued' THEN NULL ELSE worker_id END
+    WHERE id = :id AND worker_id = :worker_id AND status = 'running'
+""")
+
+
+def render_body(producer_name: str, message: str | None, products: list, events: list) -> str:
+    """Plain text newsletter body, everything after the per-recipient greeting"""
+    lines = []
+    if message:
+        lines += [message.strip(), '']
+    if products:
+        lines.append(f"Fresh from {producer_name}:")
+        for product in products:
+            price = f" - ${product['cost']:.2f}/{product['unit'] or 'each'}" if product['cost'] is not None else ''
+            description = f": {product['description']}" if product['description'] else ''
+            lines.append(f"  * {product['product_name']}{price}{description}")
+        lines.append('')
+    if events:
+        lines.append("Where to find us:")
+        for event in events:
+            lines.append(f"  * {event['name']} - {event['date']} {event['time']} at {event['location']}")
+        lines.append('')
+    lines.append(f"See you soon,\n{producer_name} on FarmZilla")
+    return '\n'.join(lines)
+
+
+def enqueue_newsletter(db, producer_id: str, subject: str | None = None, message: str | None = None):
+    """
+    Queue a newsletter with the producer's current products and events for
+    the newsletter worker. Returns the job, or None while another send for
+    the producer is unfinished. Raises ValueError for unknown producers and
+    subjects longer than MAX_SUBJECT_LENGTH.
+    """
+    subject = (subject or '').strip()
+    if len(subject) > MAX_SUBJECT_LENGTH:
+        raise ValueError(f"subject must be at most {MAX_SUBJECT_LENGTH} characters")
+    try:
+        producer_uuid = uuid.UUID(producer_id)
+    except ValueError:
+        raise ValueError("Invalid producer ID format")
+    producer_name = db.execute(PRODUCER_QUERY, {'producer_id': producer_uuid}).scalar()
+    if producer_name is None:
+        raise ValueError("Producer not found")
+
+    products = db.execute(PRODUCTS_QUERY, {'producer_id': producer_uuid, 'limit': MAX_NEWSLETTER_ITEMS}).mappings().all()
+    events = db.execute(EVENTS_QUERY, {'producer_id': producer_id, 'limit': MAX_NEWSLETTER_ITEMS}).mappings().all()
+    row = db.execute(ENQUEUE_QUERY, {
+        'id': uuid.uuid4(),
+        'producer_id': producer_id,
+        'subject': subject or f"News from {producer_name}"[:MAX_SUBJECT_LENGTH],
+        'body': render_body(producer_name, message, products, events),
+        'now': datetime.utcnow(),
+    }).mappings().first()
+    db.commit()
+    return dict(row) if row is not None else None
+
+
+def get_job(db, job_id):
+    row = db.execute(text(f"SELECT {JOB_COLUMNS} FROM newsletter_jobs WHERE id = :id"), {'id': job_id}).mappings().first()
+    return dict(row) if row is not None else None
+
+
+def list_jobs(db, producer_id: str, limit: int = 20) -> list:
+    rows = db.execute(text(f"""
+        SELECT {JOB_COLUMNS} FROM newsletter_jobs
+        WHERE producer_id = :producer_id
+        ORDER BY created_at DESC
+        LIMIT :limit
+    """), {'producer_id': producer_id, 'limit': limit}).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def cancel_job(db, job_id):
+    """Cancel a queued or running job, a running worker stops after its current batch. None if not cancellable"""
+    row = db.execute(text(f"""
+        UPDATE newsletter_jobs SET status = 'cancelled', finished_at = :now
+        WHERE id = :id AND status IN ('queued', 'running')
+        RETURNING {JOB_COLUMNS}
+    """), {'id': job_id, 'now': datetime.utcnow()}).mappings().first()
+    db.commit()
+    return dict(row) if row is not None else None
+
+
+def resume_job(db, job_id):
+    """
+    Queue a failed or cancelled job again, it continues after the last
+    recipient it reached. None if not resumable; raises IntegrityError when
+    the producer already has another unfinished send.
+    """
+    row = db.execute(text(f"""
+        UPDATE newsletter_jobs SET status = 'queued', error = NULL, finished_at = NULL, worker_id = NULL
+        WHERE id = :id AND status IN ('failed', 'cancelled')
+        RETURNING {JOB_COLUMNS}
+    """), {'id': job_id}).mappings().first()
+    db.commit()
+    return dict(row) if row is not None else None
+
+
+def list_subscribers(db, producer_id: str, limit: int = 50, cursor: str | None = None) -> dict:
+    """One page of a producer's followers in consumer_id order, the total only on the first page"""
+    after = decode_cursor('subscribers', cursor, ('text',))[0] if cursor else ''
+    rows = db.execute(SUBSCRIBERS_QUERY, {
+        'producer_id': producer_id, 'after': after, 'limit': limit + 1, 'uuid_pattern': UUID_PATTERN,
+    }).mappings().all()
+    page = [dict(row) for row in rows[:limit]]
+    return {
+        'producer_id': producer_id,
+        'total': None if cursor else db.execute(SUBSCRIBER_COUNT_QUERY, {'producer_id': producer_id}).scalar(),
+        'subscribers': page,
+        'next_cursor': encode_cursor('subscribers', [page[-1]['consumer_id']]) if len(rows) > limit else None,
+    }
+
+
+class SmtpTransport:
+    """Sends over one SMTP connection, opened on first use and reopened once if the server drops it"""
+
+    def __init__(self, host, port=25, username=None, password=None, starttls=False, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        return connection
+
+    def send(self, message: EmailMessage):
+        if self._connection is None:
+            self._connection = self._connect()
+        try:
+            self._connection.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self._connection = self._connect()
+            self._connection.send_message(message)
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._connection = None
+
+
+class FileTransport:
+    """Writes each message to <directory>/<job id>/ as an .eml file, the local stand-in for SMTP"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def send(self, message: EmailMessage):
+        directory = os.path.join(self.directory, message.get('X-Newsletter-Job', 'outbox'))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{uuid.uuid4().hex}.eml"), 'wb') as f:
+            f.write(message.as_bytes())
+
+    def close(self):
+        pass
+
+
+def transport_factory(settings):
+    """Callable returning a new transport for NEWSLETTER_TRANSPORT ('file' or 'smtp')"""
+    if settings.newsletter_transport == 'smtp':
+        return lambda: SmtpTransport(settings.smtp_host, settings.smtp_port, settings.smtp_username,
+                                     settings.smtp_password, settings.smtp_starttls)
+    if settings.newsletter_transport == 'file':
+        return lambda: FileTransport(settings.newsletter_outbox_dir)
+    raise ValueError(f"NEWSLETTER_TRANSPORT must be 'file' or 'smtp', got {settings.newsletter_transport!r}")
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, in bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            # Reserve the next token, later callers queue up behind it
+            wait = (1 - self._tokens) / self.rate
+            self._tokens = 0
+            self._updated = now + wait
+        time.sleep(wait)
+
+
+class NewsletterWorker:
+    """
+    Sends queued newsletter jobs outside the API. Recipients are read in
+    batches of `batch_size`, rendered and sent by `concurrency` threads (one
+    transport connection each) at no more than `rate_per_second`; after every
+    batch the progress is checkpointed, so a job that fails, is cancelled or
+    loses its worker resumes after the last recipient recorded. A crash can
+    repeat at most the batch in flight. At most `max_running_jobs` jobs are
+    sent at a time across all workers.
+    """
+
+    def __init__(self, session_factory, transport_factory, sender, batch_size=500, rate_per_second=20.0,
+                 concurrency=4, max_running_jobs=2, stale_seconds=300, worker_id=None):
+        self.session_factory = session_factory
+        self.transport_factory = transport_factory
+        self.sender = sender
+        self.batch_size = batch_size
+        self.rate_per_second = rate_per_second
+        self.concurrency = concurrency
+        self.max_running_jobs = max_running_jobs
+        self.stale_seconds = stale_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self._transports = []
+        self._transports_lock = threading.Lock()
+
+    def stop(self):
+        """Stop sending, checkpoint what was sent, put the job back in the queue and return from run()"""
+        self._stop.set()
+
+    def claim(self):
+        """The next job to send, marked as running by this worker, or None"""
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            # Transaction scoped, so safe behind a transaction-mode pooler
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': CLAIM_LOCK_KEY})
+            row = db.execute(CLAIM_QUERY, {
+                'worker_id': self.worker_id,
+                'now': now,
+                'stale_before': now - timedelta(seconds=self.stale_seconds),
+                'max_running': self.max_running_jobs,
+            }).mappings().first()
+            job = dict(row) if row is not None else None
+            if job is not None and job['total_recipients'] is None:
+                job['total_recipients'] = db.execute(RECIPIENT_COUNT_QUERY, {
+                    'producer_id': job['producer_id'], 'uuid_pattern': UUID_PATTERN}).scalar()
+                db.execute(text("UPDATE newsletter_jobs SET total_recipients = :total WHERE id = :id"),
+                           {'total': job['total_recipients'], 'id': job['id']})
+            db.commit()
+        return job
+
+    def run(self, poll_interval: float = 5.0, once: bool = False):
+        """Claim and send jobs until stopped; with once, return when the queue is empty"""
+        while not self._stop.is_set():
+            job = self.claim()
+            if job is None:
+                if once:
+                    return
+                self._stop.wait(poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job: dict) -> str:
+        """Send a claimed job from its checkpoint, returns the status it ended with"""
+        print(f"📨 Sending newsletter {job['id']} for producer {job['producer_id']}: "
+              f"{job['sent_count'] + job['failed_count']}/{job['total_recipients']} done")
+        bucket = TokenBucket(self.rate_per_second)
+        after = job['last_consumer_id'] or ''
+        try:
+            with ThreadPoolExecutor(self.concurrency, thread_name_prefix="newsletter") as pool:
+                while True:
+                    if self._stop.is_set():
+                        return self._finish(job, 'queued')
+                    with self.session_factory() as db:
+                        recipients = db.execute(RECIPIENTS_QUERY, {
+                            'producer_id': job['producer_id'], 'after': after,
+                            'limit': self.batch_size, 'uuid_pattern': UUID_PATTERN,
+                        }).mappings().all()
+                    if not recipients:
+                        return self._finish(job, 'completed')
+
+                    messages = [self.render(job, recipient) for recipient in recipients]
+                    errors = list(pool.map(lambda message: self._deliver(bucket, message), messages))
+                    if STOPPED in errors:
+                        # Checkpoint up to the first skipped message, the rest is sent on resume
+                        sent = errors.index(STOPPED)
+                        errors, recipients = errors[:sent], recipients[:sent]
+                        if recipients:
+                            failed = sum(error is not None for error in errors)
+                            self._checkpoint(job, len(errors) - failed, failed, recipients[-1]['consumer_id'])
+                        return self._finish(job, 'queued')
+                    failed = sum(error is not None for error in errors)
+                    if failed == len(errors):
+                        # Nothing got through, the transport is down; leave the batch for a resume
+                        return self._finish(job, 'failed', f"Every message in a batch failed: {errors[0]}")
+
+                    after = recipients[-1]['consumer_id']
+                    status = self._checkpoint(job, len(errors) - failed, failed, after)
+                    if status != 'running':
+                        print(f"⏹️ Newsletter {job['id']} stopped: {status or 'claimed by another worker'}")
+                        return status
+        except Exception as e:
+            print(f"❌ Newsletter {job['id']} failed: {e}")
+            return self._finish(job, 'failed', str(e))
+        finally:
+            self._close_transports()
+
+    def render(self, job: dict, recipient) -> EmailMessage:
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = recipient['email']
+        message['Subject'] = job['subject']
+        message['Message-ID'] = make_msgid(domain=self.sender.rpartition('@')[2] or None)
+        message['X-Newsletter-Job'] = str(job['id'])
+        message.set_content(f"Hi {recipient['username'] or 'there'},\n\n{job['body']}\n")
+        return message
+
+    def _deliver(self, bucket: TokenBucket, message: EmailMessage):
+        """Send one message on this thread's transport, the error text or None; STOPPED once stop() was called"""
+        if self._stop.is_set():
+            return STOPPED
+        bucket.acquire()
+        if self._stop.is_set():
+            return STOPPED
+        transport = getattr(self._local, 'transport', None)
+        if transport is None:
+            transport = self._local.transport = self.transport_factory()
+            with self._transports_lock:
+                self._transports.append(transport)
+        try:
+            transport.send(message)
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    def _close_transports(self):
+        with self._transports_lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+        # The pool's threads are gone, the next job's threads open new transports
+        self._local = threading.local()
+
+    def _checkpoint(self, job: dict, sent: int, failed: int, last_consumer_id: str):
+        with self.session_factory() as db:
+            status = db.execute(CHECKPOINT_QUERY, {
+                'id': job['id'], 'worker_id': self.worker_id, 'sent': sent, 'failed': failed,
+                'last_consumer_id': last_consumer_id, 'now': datetime.utcnow(),
+            }).scalar()
+            db.commit()
+        return status
+
+    def _finish(self, job: dict, status: str, error: str | None = None) -> str:
+        with self.session_factory() as db:
+            db.execute(FINISH_QUERY, {
+                'id': job['id'], 'worker_id': self.worker_id, 'status': status, 'error': error,
+                'now': datetime.utcnow(),
+            })
+            db.commit()
+        print(f"✅ Newsletter {job['id']} {status}" if status != 'failed' else f"❌ Newsletter {job['id']} failed: {error}")
+        return status
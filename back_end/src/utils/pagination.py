@@ -0,0 +1,55 @@
+import base64
+import json
+import re
+from datetime import datetime
+
+NUMBER = re.compile(r'^-?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?$')
+
+
+def _is_number(value) -> bool:
+    # Numeric columns are encoded as strings (Decimal goes through str), floats as JSON numbers
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, (int, float)) or (isinstance(value, str) and NUMBER.match(value) is not None)
+
+
+def _is_timestamp(value) -> bool:
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+# Key type name -> check applied to the decoded value
+KEY_TYPES = {
+    'number': _is_number,
+    'text': lambda value: isinstance(value, str),
+    'timestamp': _is_timestamp,
+}
+
+
+def encode_cursor(kind: str, values) -> str:
+    """Opaque keyset cursor holding the sort key values of the last row of a page"""
+    payload = json.dumps({'sort': kind, 'after': list(values)}, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(kind: str, cursor: str, key_types) -> list:
+    """
+    Sort key values from a cursor issued for the same kind of listing, each
+    checked against its key type ('number', 'text' or 'timestamp') so an
+    edited cursor fails here with ValueError instead of in the database.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values = payload['after']
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if payload.get('sort') != kind or not isinstance(values, list) or len(values) != len(key_types):
+        raise ValueError("Cursor belongs to a different sort order")
+    if not all(KEY_TYPES[key_type](value) for key_type, value in zip(key_types, values)):
+        raise ValueError("Invalid cursor")
+    return values
@@ -0,0 +1,89 @@
+import re
+
+from sqlalchemy import text
+
+from .pagination import decode_cursor, encode_cursor
+
+# Matches kept per strategy before ranking; bounds the rows ranked, joined and paged for
+# terms that match a large share of the catalogue. The candidates are the first
+# MAX_CANDIDATES matches by id, the same on every page, so pages never overlap or skip rows;
+# for such broad terms the remaining matches are not reachable
+MAX_CANDIDATES = 1000
+MAX_PAGE_SIZE = 100
+# Type of each sort key (-rank, product_name, id), checked when a cursor is decoded
+SEARCH_KEY_TYPES = ('number', 'text', 'text')
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+# Full-text matches (every term as a prefix) rank in [1, 2), typo-tolerant
+# trigram matches on the name in [0, 1], so exact word hits always come first.
+# Each branch takes its candidates from the GIN indexes in id order, and only
+# those are ranked. Ranks are float8 so the cursor compares them exactly.
+SEARCH_QUERY = """
+    WITH fulltext AS (
+        SELECT id, search_vector
+        FROM products
+        WHERE search_vector @@ to_tsquery('english', :tsquery)
+        ORDER BY id
+        LIMIT :candidates
+    ), similar AS (
+        SELECT id, product_name
+        FROM products
+        WHERE :q <% product_name
+        ORDER BY id
+        LIMIT :candidates
+    ), matches AS (
+        SELECT id, (1 + ts_rank_cd(search_vector, to_tsquery('english', :tsquery), 32))::float8 AS rank
+        FROM fulltext
+        UNION ALL
+        SELECT id, word_similarity(:q, product_name)::float8 AS rank
+        FROM similar
+    ), best AS (
+        SELECT id, max(rank) AS rank FROM matches GROUP BY id
+    )
+    SELECT p.id, p.product_id, p.product_name, p.description, p.image_url, p.user_id, p.cost, p.unit,
+           u.username AS producer_name,
+           coalesce(s.average_rating, 0) AS producer_rating,
+           coalesce(s.rating_count, 0) AS total_reviews,
+           b.rank
+    FROM best b
+    JOIN products p ON p.id = b.id
+    LEFT JOIN users u ON u.id = p.user_id
+    LEFT JOIN producer_rating_summary s ON s.producer_id = p.user_id::text
+    WHERE {after}
+    ORDER BY -b.rank, p.product_name, p.id
+    LIMIT :limit
+"""
+
+
+def prefix_tsquery(q: str) -> str | None:
+    """'grape tom' -> 'grape:* & tom:*', None when the query has no words"""
+    tokens = TOKEN.findall(q.lower())
+    if not tokens:
+        return None
+    return ' & '.join(f"{token}:*" for token in tokens)
+
+
+def search_products(db, q: str, limit: int = 20, cursor: str | None = None) -> dict:
+    """
+    One page of the ranked product search on name and description. Results
+    are product dicts with the producer's name, rating totals and a 'rank'
+    key; next_cursor continues after the page. Raises ValueError for an
+    invalid cursor.
+    """
+    tsquery = prefix_tsquery(q)
+    if tsquery is None:
+        return {'results': [], 'next_cursor': None}
+    params = {'tsquery': tsquery, 'q': q.strip(), 'candidates': MAX_CANDIDATES, 'limit': limit + 1}
+    after = 'true'
+    if cursor:
+        params['after_0'], params['after_1'], params['after_2'] = decode_cursor('search', cursor, SEARCH_KEY_TYPES)
+        after = '(-b.rank, p.product_name, p.id) > (:after_0, :after_1, CAST(:after_2 AS uuid))'
+    rows = [dict(row) for row in db.execute(text(SEARCH_QUERY.format(after=after)), params).mappings().all()]
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor('search', [-last['rank'], last['product_name'], str(last['id'])])
+    return {'results': page, 'next_cursor': next_cursor}
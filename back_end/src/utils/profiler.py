@@ -0,0 +1,186 @@
+import itertools
+import secrets
+import sys
+import threading
+import time
+from collections import Counter as StackCounter, deque
+from datetime import datetime
+
+from starlette.datastructures import MutableHeaders
+
+# Longest profile the admin endpoint will run, and how many finished profiles are kept
+MAX_PROFILE_SECONDS = 60
+DEFAULT_INTERVAL = 0.01
+RECENT_PROFILES = deque(maxlen=10)
+
+_profile_ids = itertools.count(1)
+# Only one profiler runs at a time so enabling it in production stays cheap
+_active = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the Python stacks of all threads (or only
+    thread_ids) every interval seconds from a background thread. Nothing is
+    hooked into the interpreter, so the profiled code runs at full speed and
+    the cost is one sys._current_frames() walk per sample.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.samples = StackCounter()
+        self.sample_count = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not _active.acquire(blocking=False):
+            raise ProfilerBusy("Another profile is already running")
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        _active.release()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_ids and thread_id not in self.thread_ids):
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[tuple(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format, one 'root;...;leaf count' line per stack"""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common())
+
+    def speedscope(self, name: str = 'FarmZilla profile') -> dict:
+        """A sampled profile in the speedscope file format (https://www.speedscope.app)"""
+        frames, frame_index = [], {}
+        samples, weights = [], []
+        for stack, count in self.samples.items():
+            indexes = []
+            for entry in stack:
+                if entry not in frame_index:
+                    frame_index[entry] = len(frames)
+                    function, _, location = entry.partition(' (')
+                    file, _, line = location.rstrip(')').rpartition(':')
+                    frame = {'name': function}
+                    if file:
+                        frame.update(file=file, line=int(line))
+                    frames.append(frame)
+                indexes.append(frame_index[entry])
+            samples.append(indexes)
+            weights.append(count * self.interval)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'farmzilla-sampling-profiler',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
+
+
+def next_profile_id() -> int:
+    return next(_profile_ids)
+
+
+def store_profile(profiler: SamplingProfiler, kind: str, target: str, profile_id: int | None = None) -> dict:
+    """Keep a finished profile in the ring buffer of recent profiles and return its entry"""
+    entry = {
+        'id': profile_id or next_profile_id(),
+        'kind': kind,
+        'target': target,
+        'started_at': profiler.started_at.isoformat(),
+        'duration_s': round(profiler.duration, 3),
+        'interval_ms': profiler.interval * 1000,
+        'samples': profiler.sample_count,
+        'profiler': profiler,
+    }
+    RECENT_PROFILES.append(entry)
+    return entry
+
+
+def find_profile(profile_id: int):
+    return next((entry for entry in RECENT_PROFILES if entry['id'] == profile_id), None)
+
+
+def list_profiles() -> list:
+    return [{k: v for k, v in entry.items() if k != 'profiler'} for entry in RECENT_PROFILES]
+
+
+class RequestProfilerMiddleware:
+    """
+    ASGI middleware profiling a single request when it carries the
+    X-Profile-Request header set to the admin token; the profile id comes
+    back in X-Profile-Id. Only the event loop thread is sampled, for the
+    duration of the request. That thread also runs every other request in
+    flight, so their stacks are mixed in under load. The request's own work
+    on the thread pool or an executor (sync dependencies such as get_db,
+    bcrypt) is not in the profile, use a timed profile for that.
+    """
+
+    def __init__(self, app, token: str | None = None, interval: float = 0.001):
+        self.app = app
+        self.token = token.encode() if token else None
+        self.interval = interval
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self.token:
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope['headers']).get(b'x-profile-request')
+        if header is None or not secrets.compare_digest(header, self.token):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profiler = SamplingProfiler(self.interval, thread_ids=[threading.get_ident()]).start()
+        except ProfilerBusy:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = next_profile_id()
+
+        async def send_with_profile_id(message):
+            if message['type'] == 'http.response.start':
+                MutableHeaders(scope=message).append('X-Profile-Id', str(profile_id))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            store_profile(profiler, 'request', f"{scope.get('method')} {scope.get('path')}", profile_id)
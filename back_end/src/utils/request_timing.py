@@ -0,0 +1,158 @@
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+from .metrics import REGISTRY
+
+# Buckets for per-request query counts and response sizes
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+RESPONSE_BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+# Recent requests per route kept for the admin endpoint's latency percentiles
+DURATION_SAMPLE_SIZE = 1000
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Wall time per request', labelnames=('route',),
+    sample_size=DURATION_SAMPLE_SIZE)
+REQUEST_DB_TIME = REGISTRY.histogram(
+    'http_request_db_seconds', 'Time spent executing SQL per request', labelnames=('route',))
+REQUEST_QUERIES = REGISTRY.histogram(
+    'http_request_queries', 'SQL statements executed per request', buckets=QUERY_COUNT_BUCKETS, labelnames=('route',))
+REQUEST_ROWS = REGISTRY.histogram(
+    'http_request_rows', 'Rows returned by SQL per request', buckets=QUERY_COUNT_BUCKETS, labelnames=('route',))
+RESPONSE_BYTES = REGISTRY.histogram(
+    'http_response_bytes', 'Response body size per request', buckets=RESPONSE_BYTES_BUCKETS, labelnames=('route',))
+QUERY_THRESHOLD_EXCEEDED = REGISTRY.counter(
+    'http_requests_query_threshold_exceeded_total', 'Requests that ran more SQL statements than the threshold',
+    labelnames=('route',))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge('http_requests_in_flight', 'Requests currently being handled')
+
+
+class RequestTiming:
+    """Per-request accumulator for SQL statements issued while handling it"""
+
+    __slots__ = ('query_count', 'db_time', 'rows', 'scope')
+
+    def __init__(self, scope=None):
+        self.scope = scope
+        self.query_count = 0
+        self.db_time = 0.0
+        self.rows = 0
+
+
+# The timing of the request currently being handled (None outside requests)
+current_request_timing: ContextVar = ContextVar('current_request_timing', default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+    timing = current_request_timing.get()
+    if timing is None:
+        return
+    timing.query_count += 1
+    timing.db_time += elapsed
+    # rowcount is the number of rows fetched for statements that return rows
+    if cursor.description is not None and cursor.rowcount > 0:
+        timing.rows += cursor.rowcount
+
+
+def install_query_listeners(engine):
+    """Attach the SQL timing listeners to an engine"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def route_template(scope) -> str:
+    """'GET /api/v1/products/user/{user_id}' for the matched route, or 'GET unmatched'"""
+    route = scope.get('route')
+    path = getattr(route, 'path', None) or 'unmatched'
+    return f"{scope.get('method', 'GET')} {path}"
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware recording wall time, SQL statement count, DB time, rows
+    returned and response bytes per route template. The numbers are sent back
+    in a Server-Timing header and aggregated into histograms; requests running
+    more than query_threshold statements are flagged as likely N+1 patterns.
+    """
+
+    def __init__(self, app, query_threshold: int = 20):
+        self.app = app
+        self.query_threshold = query_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        REQUESTS_IN_FLIGHT.inc()
+        timing = RequestTiming(scope)
+        token = current_request_timing.set(timing)
+        started = time.perf_counter()
+        response_bytes = 0
+
+        async def send_with_timing(message):
+            nonlocal response_bytes
+            if message['type'] == 'http.response.start':
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append('Server-Timing', (
+                    f'total;dur={elapsed_ms:.2f}, '
+                    f'db;dur={timing.db_time * 1000:.2f};desc="{timing.query_count} queries", '
+                    f'rows;desc="{timing.rows}"'
+                ))
+            elif message['type'] == 'http.response.body':
+                response_bytes += len(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            current_request_timing.reset(token)
+            route = route_template(scope)
+            REQUEST_DURATION.observe(time.perf_counter() - started, route)
+            REQUEST_DB_TIME.observe(timing.db_time, route)
+            REQUEST_QUERIES.observe(timing.query_count, route)
+            REQUEST_ROWS.observe(timing.rows, route)
+            RESPONSE_BYTES.observe(response_bytes, route)
+            if timing.query_count > self.query_threshold:
+                QUERY_THRESHOLD_EXCEEDED.inc(1, route)
+                print(f"⚠️ {route} ran {timing.query_count} SQL statements "
+                      f"({timing.db_time * 1000:.1f} ms in DB), likely an N+1 query pattern")
+
+
+def timing_summary() -> dict:
+    """Aggregated per-route view of the timing histograms for the admin endpoint"""
+    durations = REQUEST_DURATION.snapshot()
+    db_times = REQUEST_DB_TIME.snapshot()
+    queries = REQUEST_QUERIES.snapshot()
+    rows = REQUEST_ROWS.snapshot()
+    sizes = RESPONSE_BYTES.snapshot()
+    flagged = QUERY_THRESHOLD_EXCEEDED.snapshot()
+
+    empty = {'sum': 0.0}
+    summary = {}
+    for labels, series in sorted(durations.items()):
+        count = series['count']
+        summary[labels[0]] = {
+            'count': count,
+            'mean_ms': round(series['sum'] / count * 1000, 2),
+            'p50_ms': round(REQUEST_DURATION.quantile(0.50, *labels) * 1000, 2),
+            'p95_ms': round(REQUEST_DURATION.quantile(0.95, *labels) * 1000, 2),
+            'p99_ms': round(REQUEST_DURATION.quantile(0.99, *labels) * 1000, 2),
+            # The percentiles cover only the route's most recent requests
+            'percentile_sample': min(count, DURATION_SAMPLE_SIZE),
+            'mean_db_ms': round(db_times.get(labels, empty)['sum'] / count * 1000, 2),
+            'mean_queries': round(queries.get(labels, empty)['sum'] / count, 2),
+            'mean_rows': round(rows.get(labels, empty)['sum'] / count, 2),
+            'mean_response_bytes': round(sizes.get(labels, empty)['sum'] / count),
+            'query_threshold_exceeded': int(flagged.get(labels, 0)),
+        }
+    return summary
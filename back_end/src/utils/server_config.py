@@ -0,0 +1,98 @@
+import math
+import os
+
+# Fargate expresses task CPU in units, 1024 units = 1 vCPU
+CPU_UNITS_PER_VCPU = 1024
+
+
+def _env_int(name: str, default=None):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def worker_count() -> int:
+    """
+    Number of uvicorn worker processes for this task. WEB_CONCURRENCY wins when
+    set; otherwise WORKERS_PER_VCPU (default 2, handlers block on sync DB
+    calls) per vCPU of the Fargate CPU allocation, falling back to the cores
+    visible to the container when CPU is not set.
+    """
+    explicit = _env_int('WEB_CONCURRENCY')
+    if explicit:
+        return max(1, explicit)
+    cpu_units = _env_int('CPU')
+    vcpus = cpu_units / CPU_UNITS_PER_VCPU if cpu_units else (os.cpu_count() or 1)
+    return max(1, math.floor(vcpus * _env_int('WORKERS_PER_VCPU', 2)))
+
+
+def pool_settings(workers: int | None = None) -> dict:
+    """
+    Per-worker SQLAlchemy pool_size/max_overflow keeping every connection the
+    service can open under the RDS limit:
+
+        tasks = DESIRED_COUNT * DEPLOY_MAXIMUM_PERCENT / 100   (old + new tasks during a rolling deploy)
+        per worker = (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) / (tasks * workers)
+
+    Two thirds of the share are kept open as pool_size, the rest is overflow.
+    DB_POOL_SIZE / DB_MAX_OVERFLOW override the computed values.
+    """
+    workers = workers or worker_count()
+    max_connections = _env_int('DB_MAX_CONNECTIONS', 100)
+    reserved = _env_int('DB_RESERVED_CONNECTIONS', 10)
+    tasks = math.ceil(_env_int('DESIRED_COUNT', 1) * _env_int('DEPLOY_MAXIMUM_PERCENT', 200) / 100)
+
+    per_worker = max(1, (max_connections - reserved) // (tasks * workers))
+    pool_size = max(1, per_worker * 2 // 3)
+    max_overflow = max(0, per_worker - pool_size)
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', min(pool_size, 10)),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', min(max_overflow, 20)),
+    }
+
+
+def pool_mode() -> str:
+    """'direct' (default) when connecting to RDS, 'transaction' behind a transaction-mode PgBouncer"""
+    mode = os.environ.get('DB_POOL_MODE', 'direct').lower()
+    if mode not in ('direct', 'transaction'):
+        raise ValueError(f"DB_POOL_MODE must be 'direct' or 'transaction', got {mode!r}")
+    return mode
+
+
+def engine_options(url: str) -> dict:
+    """
+    create_engine keyword arguments for the configured DB_POOL_MODE.
+
+    In transaction mode the pooler owns the server connections: each worker
+    keeps no pool (NullPool) or a small one when DB_POOL_SIZE is set, and
+    nothing may rely on session state, so the `options` startup parameter
+    (which PgBouncer rejects) is dropped and psycopg 3's server-side prepared
+    statements are disabled. psycopg2 never prepares statements.
+    """
+    from sqlalchemy.pool import NullPool
+    from .instrumentation import InstrumentedQueuePool
+
+    connect_args = {"connect_timeout": 10}
+    if pool_mode() == 'direct':
+        connect_args["options"] = "-c timezone=utc"
+        return {
+            'poolclass': InstrumentedQueuePool,  # records checkout wait time for /metrics
+            **pool_settings(),
+            'pool_timeout': 30,
+            'pool_recycle': 3600,  # Recycle connections after 1 hour
+            'pool_pre_ping': True,  # Validate connections before use
+            'connect_args': connect_args,
+        }
+
+    if url.startswith('postgresql+psycopg:'):
+        connect_args["prepare_threshold"] = None
+    pool_size = _env_int('DB_POOL_SIZE', 0)
+    if not pool_size:
+        return {'poolclass': NullPool, 'connect_args': connect_args}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 0),
+        'pool_timeout': 30,
+        'pool_recycle': 3600,
+        'connect_args': connect_args,
+    }
@@ -0,0 +1,58 @@
+import os
+import re
+
+from sqlalchemy import event
+
+from .metrics import REGISTRY
+
+SESSION_STATE_STATEMENTS = REGISTRY.counter(
+    'db_session_state_statements_total',
+    'Statements that leave session state behind, unsafe behind a transaction-mode pooler', labelnames=('kind',))
+
+# Statements whose effect outlives the transaction; behind a transaction-mode
+# pooler the next transaction on that server connection may belong to another client
+SESSION_STATE_PATTERNS = [
+    ('set', re.compile(r'^\s*SET\s+(?!LOCAL\b|TRANSACTION\b|CONSTRAINTS\b)', re.IGNORECASE)),
+    ('listen', re.compile(r'^\s*(UN)?LISTEN\b', re.IGNORECASE)),
+    ('prepare', re.compile(r'^\s*PREPARE\b', re.IGNORECASE)),
+    ('cursor_with_hold', re.compile(r'^\s*DECLARE\b.*\bWITH\s+HOLD\b', re.IGNORECASE | re.DOTALL)),
+    ('advisory_lock', re.compile(r'\bpg_(try_)?advisory_lock(_shared)?\s*\(', re.IGNORECASE)),
+    ('temp_table', re.compile(r'^\s*CREATE\s+TEMP(ORARY)?\s+TABLE\b(?!.*\bON\s+COMMIT\s+DROP\b)',
+                              re.IGNORECASE | re.DOTALL)),
+]
+
+
+class SessionStateError(RuntimeError):
+    """Raised in strict mode for statements that would leak state across pooled transactions"""
+
+
+def session_state_kind(statement: str):
+    """The kind of session state a statement creates, or None"""
+    for kind, pattern in SESSION_STATE_PATTERNS:
+        if pattern.search(statement):
+            return kind
+    return None
+
+
+def install_session_state_guard(engine, strict: bool | None = None):
+    """
+    Flag statements that rely on session state while running behind a
+    transaction-mode pooler. They are counted and logged once each, or
+    rejected when strict (DB_SESSION_STATE_GUARD=strict).
+    """
+    if strict is None:
+        strict = os.environ.get('DB_SESSION_STATE_GUARD', 'warn').lower() == 'strict'
+    reported = set()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def check_statement(conn, cursor, statement, parameters, context, executemany):
+        kind = session_state_kind(statement)
+        if kind is None:
+            return
+        SESSION_STATE_STATEMENTS.inc(1, kind)
+        if strict:
+            raise SessionStateError(f"{kind} statement is not allowed behind a transaction pooler: {statement[:200]}")
+        if statement not in reported:
+            reported.add(statement)
+            print(f"⚠️ Session-level {kind} statement behind a transaction pooler, "
+                  f"its state may leak to other clients: {' '.join(statement.split())[:200]}")
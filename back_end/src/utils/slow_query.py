@@ -0,0 +1,119 @@
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from .metrics import REGISTRY
+from .request_timing import current_request_timing, route_template
+
+SLOW_QUERIES_TOTAL = REGISTRY.counter(
+    'db_slow_queries_total', 'Statements slower than the slow query threshold', labelnames=('route',))
+EXPLAINS_TOTAL = REGISTRY.counter(
+    'db_slow_query_explains_total', 'EXPLAIN ANALYZE plans captured for slow statements', labelnames=('outcome',))
+
+# Values of these types are not sensitive and make the plan reproducible
+_SAFE_TYPES = (bool, int, float, Decimal, uuid.UUID, date, datetime, type(None))
+_SEQ_SCAN = re.compile(r'Seq Scan on (\S+)')
+
+
+def redact(value):
+    """Keep ids, numbers and dates, replace strings and anything else by a type/length marker"""
+    if isinstance(value, _SAFE_TYPES):
+        return value if not isinstance(value, (uuid.UUID, date, Decimal)) else str(value)
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return f"<{type(value).__name__}>"
+
+
+def redact_parameters(parameters, executemany: bool):
+    if executemany:
+        return f"<{len(parameters)} parameter sets>"
+    if isinstance(parameters, dict):
+        return {key: redact(value) for key, value in parameters.items()}
+    return redact(list(parameters or ()))
+
+
+class SlowQueryLog:
+    """
+    Records statements slower than threshold_ms into a ring buffer together
+    with redacted parameters and the route that issued them. A sample of slow
+    SELECTs is re-run under EXPLAIN (ANALYZE, BUFFERS) on a background thread
+    inside a rolled back transaction, and the plan is attached to the entry.
+    One log can be installed on several engines (primary and replicas).
+    """
+
+    def __init__(self, threshold_ms: float = 200, explain_sample_rate: float = 0.1,
+                 max_entries: int = 200, explain_timeout_ms: int = 10000):
+        self.threshold = threshold_ms / 1000
+        self.explain_sample_rate = explain_sample_rate
+        self.explain_timeout_ms = explain_timeout_ms
+        self.entries = deque(maxlen=max_entries)
+        self._explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+        # At most two plans are queued or running at once
+        self._explain_slots = threading.BoundedSemaphore(2)
+
+    def install(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        return self
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('slow_query_start_time', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['slow_query_start_time'].pop()
+        if elapsed < self.threshold or conn.get_execution_options().get('skip_slow_query_log'):
+            return
+
+        timing = current_request_timing.get()
+        route = route_template(timing.scope) if timing is not None and timing.scope else 'background'
+        entry = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed * 1000, 2),
+            'route': route,
+            'engine': getattr(conn.engine.pool, 'metrics_name', None),
+            'statement': statement,
+            'parameters': redact_parameters(parameters, executemany),
+            'rowcount': cursor.rowcount,
+            'plan': None,
+            'seq_scans': None,
+        }
+        self.entries.append(entry)
+        SLOW_QUERIES_TOTAL.inc(1, route)
+        print(f"⚠️ Slow query ({entry['duration_ms']} ms) from {route}: {' '.join(statement.split())[:200]}")
+
+        # Only plain SELECTs are re-run
+        if (not executemany and statement.lstrip()[:6].upper() == 'SELECT'
+                and random.random() < self.explain_sample_rate and self._explain_slots.acquire(blocking=False)):
+            self._explain_executor.submit(self._explain, conn.engine, entry, statement, parameters)
+
+    def _explain(self, engine, entry, statement, parameters):
+        try:
+            with engine.connect().execution_options(skip_slow_query_log=True) as conn:
+                with conn.begin() as transaction:
+                    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.explain_timeout_ms)}")
+                    rows = conn.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters).fetchall()
+                    transaction.rollback()
+            plan = '\n'.join(row[0] for row in rows)
+            entry['plan'] = plan
+            entry['seq_scans'] = sorted(set(_SEQ_SCAN.findall(plan)))
+            EXPLAINS_TOTAL.inc(1, 'ok')
+        except Exception as e:
+            entry['plan'] = f"EXPLAIN failed: {e}"
+            EXPLAINS_TOTAL.inc(1, 'error')
+        finally:
+            self._explain_slots.release()
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0) -> list:
+        """Most recent slow statements first"""
+        entries = [entry for entry in reversed(self.entries) if entry['duration_ms'] >= min_duration_ms]
+        return entries[:limit]
@@ -0,0 +1,70 @@
+import threading
+import time
+from datetime import datetime
+
+
+class Warmup:
+    """
+    Runs named warm-up steps once after startup and tracks readiness. The
+    worker reports ready only when every step succeeded; failed runs are
+    retried with backoff so a task that started while RDS was unreachable
+    becomes ready on its own once the database is back.
+    """
+
+    def __init__(self, steps, max_backoff: float = 30.0):
+        self.steps = list(steps)
+        self.max_backoff = max_backoff
+        self.ready = False
+        self.attempts = 0
+        self.started_at = None
+        self.finished_at = None
+        self.results = {}
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Run the warm-up on a daemon thread so startup and /healthz are not delayed"""
+        threading.Thread(target=self.run, name='warmup', daemon=True).start()
+
+    def stop(self):
+        """Report not ready from now on, e.g. while the worker drains on shutdown"""
+        self._stopped.set()
+
+    def run_once(self) -> bool:
+        self.attempts += 1
+        ok = True
+        for name, step in self.steps:
+            started = time.perf_counter()
+            try:
+                step()
+                self.results[name] = {'ok': True, 'ms': round((time.perf_counter() - started) * 1000, 1)}
+            except Exception as e:
+                self.results[name] = {'ok': False, 'ms': round((time.perf_counter() - started) * 1000, 1),
+                                      'error': str(e).splitlines()[0] if str(e) else type(e).__name__}
+                ok = False
+        return ok
+
+    def run(self):
+        """Blocking: repeat the steps until they all pass (or shutdown starts)"""
+        self.started_at = datetime.utcnow()
+        backoff = 1.0
+        while not self._stopped.is_set():
+            if self.run_once():
+                self.ready = True
+                self.finished_at = datetime.utcnow()
+                total = sum(result['ms'] for result in self.results.values())
+                print(f"✅ Warm-up finished in {total:.0f} ms after {self.attempts} attempt(s)")
+                return
+            failed = [f"{name}: {result['error']}" for name, result in self.results.items() if not result['ok']]
+            print(f"⚠️ Warm-up failed ({'; '.join(failed)}), retrying in {backoff:.0f}s")
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def status(self) -> dict:
+        return {
+            'status': 'stopping' if self._stopped.is_set() else 'ready' if self.ready else 'starting',
+            'attempts': self.attempts,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            # Errors only go to the logs, this endpoint is public
+            'steps': {name: {'ok': result['ok'], 'ms': result['ms']} for name, result in self.results.items()},
+        }
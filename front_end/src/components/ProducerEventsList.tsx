@@ -54,26 +54,10 @@ const ProducerEventsList: React.FC<ProducerEventsListProps> = ({
         setLoading(true);
         setError("");
 
-        // Fetch all events
-        const allEvents = await eventService.getAllEvents();
+        // Events the producer is signed up for, sorted by date and limited on the server
+        const producerEvents = await eventService.getEventsByProducerId(producerId, maxEvents);
         
-        // Fetch producer's event vendor relationships
-        const userEventVendors = await eventService.getEventVendorsByProducerId(producerId);
-
-        // Filter events that the producer is signed up for
-        const producerEvents = allEvents.filter(event => 
-          userEventVendors.some(vendor => vendor.event_id === event.event_id)
-        );
-
-        // Sort events by date (assuming date format is sortable)
-        const sortedEvents = producerEvents.sort((a, b) => 
-          new Date(a.date).getTime() - new Date(b.date).getTime()
-        );
-
-        // Limit events if maxEvents is specified
-        const eventsToShow = maxEvents ? sortedEvents.slice(0, maxEvents) : sortedEvents;
-        
-        setUserEvents(eventsToShow);
+        setUserEvents(producerEvents);
       } catch (err: any) {
         console.error('Error fetching producer events:', err);
         setError(err.message || "Failed to fetch events");
@@ -19,9 +19,11 @@ import {
   Badge,
   Heading,
   Flex,
+  VStack,
+  HStack,
 } from "@chakra-ui/react";
-import { matchService, type ProducerConsumerMatch } from "../../../services/matchService";
-import apiClient from "../../../services/apli-client";
+import { matchService } from "../../../services/matchService";
+import { feedService, type FeedItem } from "../../../services/feedService";
 import { useUser } from "../../../context/UserContex";
 
 interface Producer {
@@ -42,35 +44,13 @@ const ConsumerFavoritesPage: React.FC<ConsumerFavoritesPageProps> = ({ onViewPro
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string>("");
   const [unfollowingInProgress, setUnfollowingInProgress] = useState<Set<string>>(new Set());
+  const [feedItems, setFeedItems] = useState<FeedItem[]>([]);
+  const [feedCursor, setFeedCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const toast = useToast();
   const { user } = useUser();
 
-  // Function to fetch producer details by ID
-  const fetchProducerDetails = async (producerId: string): Promise<Producer | null> => {
-    try {
-      const response = await apiClient.get(`/v1/user/?user_id=${producerId}`);
-      if (response.data && response.data.length > 0) {
-        return response.data[0];
-      }
-      return null;
-    } catch (error) {
-      console.error(`Failed to fetch producer details for ${producerId}:`, error);
-      return null;
-    }
-  };
-
-  // Function to fetch product count for a specific producer
-  const fetchProductCount = async (userId: string): Promise<number> => {
-    try {
-      const response = await apiClient.get(`/v1/products/user/${userId}`);
-      return response.data.length;
-    } catch (error) {
-      console.error(`Failed to fetch product count for user ${userId}:`, error);
-      return 0;
-    }
-  };
-
-  // Function to fetch followed producers
+  // Function to fetch followed producers and the first feed page in one request
   const fetchFollowedProducers = async () => {
     const currentUserId = user?.id || localStorage.getItem("userId");
     
@@ -83,42 +63,22 @@ const ConsumerFavoritesPage: React.FC<ConsumerFavoritesPageProps> = ({ onViewPro
     setError("");
 
     try {
-      // Get all matches for the current consumer
-      const matches = await matchService.getMatchesForConsumer(currentUserId);
-      
-      if (matches.length === 0) {
-        setFollowedProducers([]);
-        return;
-      }
-
-      // Fetch detailed producer information for each match
-      const producerDetailsPromises = matches.map(async (match: ProducerConsumerMatch) => {
-        const producerDetails = await fetchProducerDetails(match.producer_id);
-        if (producerDetails) {
-          const productCount = await fetchProductCount(match.producer_id);
-          return {
-            ...producerDetails,
-            productCount,
-            followedDate: match.created_at
-          };
-        }
-        return null;
-      });
+      // Producers come with their product counts, most recently followed first
+      const page = await feedService.getConsumerFeed(currentUserId);
+      const producers: Producer[] = (page.producers || [])
+        .filter(producer => producer.username)
+        .map(producer => ({
+          id: producer.producer_id,
+          username: producer.username || "",
+          email: producer.email || "",
+          role: "producer",
+          productCount: producer.product_count,
+          followedDate: producer.followed_at
+        }));
 
-      const producerDetails = await Promise.all(producerDetailsPromises);
-      const validProducers: Producer[] = producerDetails
-        .filter((producer): producer is NonNullable<typeof producer> => producer !== null)
-        .map(producer => ({ ...producer, productCount: producer.productCount }));
-      
-      // Sort by followed date (most recent first)
-      validProducers.sort((a, b) => {
-        if (a.followedDate && b.followedDate) {
-          return new Date(b.followedDate).getTime() - new Date(a.followedDate).getTime();
-        }
-        return 0;
-      });
-
-      setFollowedProducers(validProducers);
+      setFollowedProducers(producers);
+      setFeedItems(page.items);
+      setFeedCursor(page.next_cursor);
     } catch (err: any) {
       const errorMessage = err.response?.data?.detail || err.message || "Failed to fetch followed producers";
       setError(errorMessage);
@@ -134,6 +94,29 @@ const ConsumerFavoritesPage: React.FC<ConsumerFavoritesPageProps> = ({ onViewPro
     }
   };
 
+  // Function to append the next feed page
+  const loadMoreFeed = async () => {
+    const currentUserId = user?.id || localStorage.getItem("userId");
+    if (!currentUserId || !feedCursor) return;
+
+    setIsLoadingMore(true);
+    try {
+      const page = await feedService.getConsumerFeed(currentUserId, feedCursor);
+      setFeedItems(prev => [...prev, ...page.items]);
+      setFeedCursor(page.next_cursor);
+    } catch (err: any) {
+      toast({
+        title: "Error",
+        description: err.response?.data?.detail || err.message || "Failed to load more updates",
+        status: "error",
+        duration: 5000,
+        isClosable: true,
+      });
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   // Function to handle unfollowing a producer
   const handleUnfollowProducer = async (producer: Producer) => {
     const currentUserId = user?.id || localStorage.getItem("userId");
@@ -155,8 +138,9 @@ const ConsumerFavoritesPage: React.FC<ConsumerFavoritesPageProps> = ({ onViewPro
     try {
       await matchService.deleteMatch(producer.id, currentUserId);
       
-      // Remove from followed producers list
+      // Remove from followed producers list and their updates from the feed
       setFollowedProducers(prev => prev.filter(p => p.id !== producer.id));
+      setFeedItems(prev => prev.filter(item => item.producer_id !== producer.id));
       
       toast({
         title: "Successfully Unfollowed!",
@@ -333,6 +317,43 @@ const ConsumerFavoritesPage: React.FC<ConsumerFavoritesPageProps> = ({ onViewPro
           </Tbody>
         </Table>
       </TableContainer>
+
+      <Heading size="md" mt={10} mb={4} color="teal.600">Latest From Your Producers</Heading>
+      {feedItems.length === 0 ? (
+        <Text color="gray.500">No new products or events from the producers you follow yet.</Text>
+      ) : (
+        <VStack align="stretch" spacing={3}>
+          {feedItems.map((item) => (
+            <Box
+              key={`${item.kind}-${item.item_id}-${item.producer_id}`}
+              p={3}
+              borderWidth="1px"
+              borderRadius="md"
+            >
+              <HStack justify="space-between" mb={1}>
+                <HStack spacing={2}>
+                  <Badge colorScheme={item.kind === "product" ? "green" : "purple"}>
+                    {item.kind === "product" ? "New Product" : "Event"}
+                  </Badge>
+                  <Text fontWeight="medium">{item.title}</Text>
+                </HStack>
+                <Text fontSize="sm" color="gray.500">{formatDate(item.occurred_at)}</Text>
+              </HStack>
+              <Text fontSize="sm" color="gray.600">
+                {item.producer_name || "A producer you follow"}
+                {item.kind === "product"
+                  ? item.cost != null && ` · $${item.cost}${item.unit ? `/${item.unit}` : ""}`
+                  : ` · ${item.event_date} ${item.event_time} at ${item.location}`}
+              </Text>
+            </Box>
+          ))}
+          {feedCursor && (
+            <Button size="sm" variant="ghost" colorScheme="teal" onClick={loadMoreFeed} isLoading={isLoadingMore}>
+              Load more
+            </Button>
+          )}
+        </VStack>
+      )}
     </Box>
   );
 };
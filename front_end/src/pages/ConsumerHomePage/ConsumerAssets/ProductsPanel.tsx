@@ -2,11 +2,10 @@ import React, { useState, useEffect } from 'react';
 import { 
   Box, VStack, Card, CardBody, Heading, Text, Button, 
   HStack, Badge, Spinner, Alert, AlertIcon, Image, 
-  Divider, IconButton, Collapse, useDisclosure
+  Divider, IconButton, Collapse, Select, useDisclosure
 } from '@chakra-ui/react';
 import { StarIcon, ChevronLeftIcon, ChevronRightIcon, CloseIcon } from '@chakra-ui/icons';
-import { productService, type Product } from '../../../services/productService';
-import { ratingService } from '../../../services/ratingService';
+import { productService, type Product, type MarketplaceSort } from '../../../services/productService';
 import { eventService } from '../../../services/eventService';
 
 interface ProductWithProducer extends Product {
@@ -15,6 +14,11 @@ interface ProductWithProducer extends Product {
   total_reviews?: number;
 }
 
+// Products requested per listing and search page, and the pause after typing before searching
+const LISTING_PAGE_SIZE = 24;
+const SEARCH_PAGE_SIZE = 20;
+const SEARCH_DEBOUNCE_MS = 300;
+
 interface ProductsPanelProps {
   searchQuery?: string;
   onProductSelect?: (product: ProductWithProducer) => void;
@@ -33,56 +37,71 @@ const ProductsPanel: React.FC<ProductsPanelProps> = ({
   const [products, setProducts] = useState<ProductWithProducer[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string>("");
-  const [eventProducers, setEventProducers] = useState<string[]>([]); // Producer IDs for selected event
+  const [sort, setSort] = useState<MarketplaceSort>('rating');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [eventProducers, setEventProducers] = useState<string[]>([]); // Producer IDs for selected event, used for search results
+  const [searchResults, setSearchResults] = useState<ProductWithProducer[] | null>(null); // null when not searching
+  const [searchCursor, setSearchCursor] = useState<string | null>(null);
+  const [searching, setSearching] = useState(false);
   const { isOpen: isExpanded, onToggle } = useDisclosure({ defaultIsOpen: true });
 
-
-  const fetchProductsAndRatings = async () => {
+  // Marketplace listing: ranked, filtered by event and joined with producer names and ratings on the server
+  const fetchListingPage = async (cursor: string | null) => {
     try {
-      setLoading(true);
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
       setError("");
 
-      // Fetch all products
-      const productsData = await productService.getAllProducts();
-      
-      // Get unique producer IDs
-      const producerIds = [...new Set(productsData.map((p: Product) => p.user_id).filter(Boolean) as string[])];
-      
-      // Fetch ratings for all producers
-      const ratingsMap = await ratingService.getProducersRatingSummary(producerIds);
-      
-      // Enhance products with producer information and ratings
-      const enhancedProducts: ProductWithProducer[] = productsData.map((product: Product) => {
-        const rating = ratingsMap.get(product.user_id || "");
-        return {
-          ...product,
-          producer_rating: rating?.average_rating || 0,
-          total_reviews: rating?.total_reviews || 0,
-          // We'll need to fetch producer names separately or join in the API
-          producer_name: `Producer ${product.user_id?.slice(-4) || 'Unknown'}`
-        };
-      });
-
-      // Sort by producer rating (highest first), then by product name
-      const sortedProducts = enhancedProducts.sort((a, b) => {
-        if (b.producer_rating !== a.producer_rating) {
-          return (b.producer_rating || 0) - (a.producer_rating || 0);
-        }
-        return (a.product_name || "").localeCompare(b.product_name || "");
+      const page = await productService.getMarketplaceProducts({
+        sort,
+        limit: LISTING_PAGE_SIZE,
+        cursor,
+        event_id: selectedEventId
       });
-
-      setProducts(sortedProducts);
+      setProducts(previous => cursor ? [...previous, ...page.products] : page.products);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       console.error('Error fetching products:', err);
       setError('Failed to load products. Please try again later.');
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
   useEffect(() => {
-    fetchProductsAndRatings();
-  }, []);
+    fetchListingPage(null);
+  }, [sort, selectedEventId]);
+
+  // Search on the server, results arrive ranked so they are not re-sorted here
+  const fetchSearchPage = async (query: string, cursor: string | null) => {
+    try {
+      setSearching(true);
+      const page = await productService.searchProducts(query, SEARCH_PAGE_SIZE, cursor);
+      setSearchResults(previous => cursor ? [...(previous || []), ...page.results] : page.results);
+      setSearchCursor(page.next_cursor);
+    } catch (err: any) {
+      console.error('Error searching products:', err);
+      setError('Failed to search products. Please try again later.');
+    } finally {
+      setSearching(false);
+    }
+  };
+
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      setSearchCursor(null);
+      return;
+    }
+    const timer = setTimeout(() => fetchSearchPage(query, null), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
 
   // Fetch event vendors when selected event changes
   useEffect(() => {
@@ -103,19 +122,11 @@ const ProductsPanel: React.FC<ProductsPanelProps> = ({
     fetchEventProducers();
   }, [selectedEventId]);
 
-  // Filter products based on search query and selected event
-  const filteredProducts = products.filter(product => {
-    // First filter by search query
-    const matchesSearch = 
-      product.product_name?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      product.description?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      product.producer_name?.toLowerCase().includes(searchQuery.toLowerCase());
-    
-    // Then filter by selected event (if any)
-    const matchesEvent = !selectedEventId || eventProducers.includes(product.user_id || "");
-    
-    return matchesSearch && matchesEvent;
-  });
+  // Search results replace the listing while a query is entered; the listing is already filtered by event
+  const filteredProducts = searchResults
+    ? searchResults.filter(product => !selectedEventId || eventProducers.includes(product.user_id || ""))
+    : products;
+  const hasMore = searchResults ? searchCursor !== null : nextCursor !== null;
 
   const renderRatingStars = (rating: number, totalReviews: number) => {
     const stars = [];
@@ -216,10 +227,24 @@ const ProductsPanel: React.FC<ProductsPanelProps> = ({
           <VStack spacing={4} align="stretch">
             <Box>
               <Text fontSize="sm" color="gray.600">
-                {filteredProducts.length} product{filteredProducts.length !== 1 ? 's' : ''} found
+                {filteredProducts.length}{hasMore && '+'} product{filteredProducts.length !== 1 ? 's' : ''} found
                 {searchQuery && ` for "${searchQuery}"`}
                 {selectedEventId && ` at selected event`}
               </Text>
+
+              {/* Listing order, search results keep their relevance order */}
+              {!searchResults && (
+                <Select
+                  mt={2}
+                  size="sm"
+                  value={sort}
+                  onChange={(e) => setSort(e.target.value as MarketplaceSort)}
+                >
+                  <option value="rating">Top rated producers</option>
+                  <option value="price">Lowest price</option>
+                  <option value="recency">Newest</option>
+                </Select>
+              )}
               
               {/* Event filter status */}
               {selectedEventId && (
@@ -332,6 +357,19 @@ const ProductsPanel: React.FC<ProductsPanelProps> = ({
                 </CardBody>
               </Card>
                 ))}
+                {hasMore && (
+                  <Button
+                    size="sm"
+                    variant="ghost"
+                    colorScheme="teal"
+                    isLoading={searchResults ? searching : loadingMore}
+                    onClick={() => searchResults
+                      ? fetchSearchPage(searchQuery.trim(), searchCursor)
+                      : fetchListingPage(nextCursor)}
+                  >
+                    Load more
+                  </Button>
+                )}
               </VStack>
             )}
           </VStack>
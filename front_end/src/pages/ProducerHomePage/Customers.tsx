@@ -13,12 +13,15 @@ import {
   AlertIcon,
   AlertTitle,
   AlertDescription,
-  Skeleton
+  Skeleton,
+  Badge,
+  HStack,
+  Tooltip
 } from "@chakra-ui/react";
 import ProducerSupplyBar from "./HomePageAssets/ProducerSupplyBar";
 import { useNavigate } from "react-router-dom";
 import { useUser } from "../../context/UserContex";
-import { matchService, type ProducerConsumerMatch } from "../../services/matchService";
+import { customerService, type Customer, type CustomerGrowth } from "../../services/customerService";
 
 const Customers: React.FC = () => {
   const navigate = useNavigate();
@@ -26,22 +29,33 @@ const Customers: React.FC = () => {
   const toast = useToast();
   const username = localStorage.getItem("username") || "User";
   
-  const [matches, setMatches] = useState<ProducerConsumerMatch[]>([]);
+  const [customers, setCustomers] = useState<Customer[]>([]);
+  const [total, setTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [growth, setGrowth] = useState<CustomerGrowth | null>(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState<string>("");
 
-  const fetchCustomers = async () => {
+  const fetchCustomers = async (cursor: string | null = null) => {
     if (!user?.id) {
       setError("User ID not available. Please log in again.");
       return;
     }
 
-    setLoading(true);
+    if (cursor) {
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
+    }
     setError("");
     
     try {
-      const customerMatches = await matchService.getMatchesForProducer(user.id);
-      setMatches(customerMatches);
+      // Profiles come joined from the server, no per-customer lookups
+      const page = await customerService.getCustomers(user.id, cursor);
+      setCustomers(prev => cursor ? [...prev, ...page.customers] : page.customers);
+      if (page.total !== null) setTotal(page.total);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       const errorMessage = err.response?.data?.detail || err.message || "Failed to fetch customers";
       setError(errorMessage);
@@ -54,6 +68,16 @@ const Customers: React.FC = () => {
       });
     } finally {
       setLoading(false);
+      setLoadingMore(false);
+    }
+  };
+
+  const fetchGrowth = async () => {
+    if (!user?.id) return;
+    try {
+      setGrowth(await customerService.getCustomerGrowth(user.id, "week", 12));
+    } catch (err: any) {
+      console.error("Error fetching customer growth:", err);
     }
   };
 
@@ -61,6 +85,7 @@ const Customers: React.FC = () => {
     // Fetch customers when component mounts or user changes
     if (user?.id) {
       fetchCustomers();
+      fetchGrowth();
     }
   }, [user?.id]);
 
@@ -74,6 +99,30 @@ const Customers: React.FC = () => {
     navigate("/");
   };
 
+  const renderGrowth = () => {
+    if (!growth || growth.periods.length === 0) return null;
+    const maxNew = Math.max(1, ...growth.periods.map(p => p.new_followers));
+
+    return (
+      <Card variant="outline" mb={6}>
+        <CardBody>
+          <Flex justify="space-between" align="center" mb={4}>
+            <Heading size="md" color="teal.600">New Followers per Week</Heading>
+            <Badge colorScheme="teal">{growth.total_followers} total</Badge>
+          </Flex>
+          <HStack align="end" spacing={2} height="100px">
+            {growth.periods.map((p) => (
+              <Tooltip key={p.period_start} label={`Week of ${p.period_start.slice(0, 10)}: ${p.new_followers} new`}>
+                <Box flex="1" bg="teal.400" borderRadius="sm" minHeight="2px"
+                  height={`${(p.new_followers / maxNew) * 100}%`} />
+              </Tooltip>
+            ))}
+          </HStack>
+        </CardBody>
+      </Card>
+    );
+  };
+
   const renderCustomersList = () => {
     if (loading) {
       return (
@@ -97,7 +146,7 @@ const Customers: React.FC = () => {
       );
     }
 
-    if (matches.length === 0) {
+    if (customers.length === 0) {
       return (
         <Alert status="info" borderRadius="md">
           <AlertIcon />
@@ -113,20 +162,29 @@ const Customers: React.FC = () => {
 
     return (
       <VStack spacing={4} align="stretch">
-        {matches.map((match) => (
-          <Card key={match.id} variant="outline">
+        <Text color="gray.600">{total} customers</Text>
+        {customers.map((customer) => (
+          <Card key={customer.consumer_id} variant="outline">
             <CardBody>
-              <VStack align="start" spacing={2}>
-                <Text fontWeight="bold" fontSize="lg" color="teal.600">
-                  Customer ID: {match.consumer_id}
-                </Text>
-                <Text fontSize="sm" color="gray.600">
-                  Match ID: {match.id}
-                </Text>
-              </VStack>
+              <Flex justify="space-between" align="center">
+                <VStack align="start" spacing={1}>
+                  <Text fontWeight="bold" fontSize="lg" color="teal.600">
+                    {customer.username || customer.consumer_id}
+                  </Text>
+                  <Text fontSize="sm" color="gray.600">
+                    {customer.email || "No email address"}
+                  </Text>
+                </VStack>
+                <Badge colorScheme="green">Since {customer.created_at.slice(0, 10)}</Badge>
+              </Flex>
             </CardBody>
           </Card>
         ))}
+        {nextCursor && (
+          <Button variant="outline" colorScheme="teal" onClick={() => fetchCustomers(nextCursor)} isLoading={loadingMore}>
+            Load more
+          </Button>
+        )}
       </VStack>
     );
   };
@@ -172,6 +230,7 @@ const Customers: React.FC = () => {
           
           {/* Customers List */}
           <Box flex="1" overflowY="auto">
+            {renderGrowth()}
             {renderCustomersList()}
           </Box>
         </Flex>
@@ -2,20 +2,19 @@ import React, { useState, useEffect } from "react";
 import { 
   Heading, Button, Flex, Text, Box, useToast, useDisclosure, VStack, 
   Card, CardBody, CardHeader, Badge, AlertDialog, AlertDialogOverlay,
-  AlertDialogContent, AlertDialogHeader, AlertDialogBody, AlertDialogFooter
+  AlertDialogContent, AlertDialogHeader, AlertDialogBody, AlertDialogFooter, Progress
 } from "@chakra-ui/react";
 import ProducerSupplyBar from "./HomePageAssets/ProducerSupplyBar";
 import { useNavigate } from "react-router-dom";
 import { useUser } from "../../context/UserContex";
 import { productService, type Product } from "../../services/productService";
 import { eventService, type Event } from "../../services/eventService";
+import { newsletterService, type Subscriber, type NewsletterJob } from "../../services/newsletterService";
 
-interface Subscriber {
-  id: string;
-  email: string;
-  name: string;
-  subscribed_date: string;
-}
+const ACTIVE_STATUSES = ["queued", "running"];
+const STATUS_COLORS: Record<string, string> = {
+  queued: "gray", running: "blue", completed: "green", failed: "red", cancelled: "orange"
+};
 
 const Newsletter: React.FC = () => {
   const navigate = useNavigate();
@@ -27,19 +26,62 @@ const Newsletter: React.FC = () => {
   const [products, setProducts] = useState<Product[]>([]);
   const [events, setEvents] = useState<Event[]>([]);
   const [subscribers, setSubscribers] = useState<Subscriber[]>([]);
+  const [subscriberTotal, setSubscriberTotal] = useState(0);
+  const [subscriberCursor, setSubscriberCursor] = useState<string | null>(null);
+  const [loadingSubscribers, setLoadingSubscribers] = useState(false);
+  const [job, setJob] = useState<NewsletterJob | null>(null);
   const [loading, setLoading] = useState(false);
   const [sendingEmail, setSendingEmail] = useState(false);
   const cancelRef = React.useRef<HTMLButtonElement>(null);
 
-  // Mock subscribers data - in a real app, this would come from an API
+  const jobActive = job !== null && ACTIVE_STATUSES.includes(job.status);
+
+  const fetchSubscribers = async (cursor: string | null = null) => {
+    if (!user?.id) return;
+
+    setLoadingSubscribers(true);
+    try {
+      const page = await newsletterService.getSubscribers(user.id, cursor);
+      setSubscribers(prev => cursor ? [...prev, ...page.subscribers] : page.subscribers);
+      if (page.total !== null) setSubscriberTotal(page.total);
+      setSubscriberCursor(page.next_cursor);
+    } catch (err: any) {
+      console.error("Error fetching subscribers:", err);
+      toast({
+        title: "Error",
+        description: "Failed to fetch subscribers",
+        status: "error",
+        duration: 3000,
+        isClosable: true,
+      });
+    } finally {
+      setLoadingSubscribers(false);
+    }
+  };
+
+  const fetchLatestNewsletter = async () => {
+    if (!user?.id) return;
+
+    try {
+      const jobs = await newsletterService.getNewsletters(user.id, 1);
+      setJob(jobs[0] || null);
+    } catch (err: any) {
+      console.error("Error fetching newsletters:", err);
+    }
+  };
+
+  // The worker sends in the background, poll the job while it is queued or running
   useEffect(() => {
-    const mockSubscribers: Subscriber[] = [
-      { id: "1", email: "john.doe@example.com", name: "John Doe", subscribed_date: "2025-01-15" },
-      { id: "2", email: "jane.smith@example.com", name: "Jane Smith", subscribed_date: "2025-02-10" },
-      { id: "3", email: "farmer.bob@example.com", name: "Bob Wilson", subscribed_date: "2025-03-05" },
-    ];
-    setSubscribers(mockSubscribers);
-  }, []);
+    if (!job || !jobActive) return;
+    const timer = setTimeout(async () => {
+      try {
+        setJob(await newsletterService.getNewsletter(job.id));
+      } catch (err: any) {
+        console.error("Error fetching newsletter progress:", err);
+      }
+    }, 3000);
+    return () => clearTimeout(timer);
+  }, [job, jobActive]);
 
   const fetchUserProducts = async () => {
     if (!user?.id) return;
@@ -66,14 +108,8 @@ const Newsletter: React.FC = () => {
     if (!user?.id) return;
 
     try {
-      // Get user's event vendor relationships
-      const userEventVendors = await eventService.getEventVendorsByProducerId(user.id);
-      
-      // Fetch all events and filter for user's events
-      const allEvents = await eventService.getAllEvents();
-      const userEvents = allEvents.filter(event => 
-        userEventVendors.some(vendor => vendor.event_id === event.event_id)
-      );
+      // Only the user's events, filtered on the server
+      const userEvents = await eventService.getEventsByProducerId(user.id);
       
       setEvents(userEvents);
     } catch (err: any) {
@@ -92,6 +128,8 @@ const Newsletter: React.FC = () => {
     if (user?.id) {
       fetchUserProducts();
       fetchUserEvents();
+      fetchSubscribers();
+      fetchLatestNewsletter();
     }
   }, [user?.id]);
 
@@ -102,27 +140,25 @@ const Newsletter: React.FC = () => {
   };
 
   const handleSendNewsletter = async () => {
+    if (!user?.id) return;
     setSendingEmail(true);
     
     try {
-      // Simulate email sending - in a real app, this would call an API
-      await new Promise(resolve => setTimeout(resolve, 2000));
+      // Queued on the server, the newsletter worker sends it and the progress card below follows it
+      setJob(await newsletterService.sendNewsletter(user.id));
       
       toast({
-        title: "Newsletter Sent!",
-        description: `Newsletter sent to ${subscribers.length} subscribers`,
+        title: "Newsletter Queued!",
+        description: `Sending to ${subscriberTotal} subscribers in the background`,
         status: "success",
         duration: 5000,
         isClosable: true,
       });
-      
-      // Navigate back to home page
-      navigate("/");
     } catch (err: any) {
       console.error("Error sending newsletter:", err);
       toast({
         title: "Send Failed",
-        description: "Failed to send newsletter. Please try again.",
+        description: err.response?.data?.detail || "Failed to send newsletter. Please try again.",
         status: "error",
         duration: 5000,
         isClosable: true,
@@ -133,6 +169,32 @@ const Newsletter: React.FC = () => {
     }
   };
 
+  const handleCancelNewsletter = async () => {
+    if (!job) return;
+    try {
+      setJob(await newsletterService.cancelNewsletter(job.id));
+    } catch (err: any) {
+      console.error("Error cancelling newsletter:", err);
+      fetchLatestNewsletter();
+    }
+  };
+
+  const handleResumeNewsletter = async () => {
+    if (!job) return;
+    try {
+      setJob(await newsletterService.resumeNewsletter(job.id));
+    } catch (err: any) {
+      console.error("Error resuming newsletter:", err);
+      toast({
+        title: "Resume Failed",
+        description: err.response?.data?.detail || "Failed to resume newsletter.",
+        status: "error",
+        duration: 5000,
+        isClosable: true,
+      });
+    }
+  };
+
   return (
     <>
       <Flex height="100vh" direction="column">
@@ -167,24 +229,64 @@ const Newsletter: React.FC = () => {
             <Heading color="teal.600" size="lg" mb={6}>Send Newsletter</Heading>
             
             <VStack spacing={6} align="stretch">
+              {/* Latest Send Section */}
+              {job && (
+                <Card>
+                  <CardHeader>
+                    <Flex justify="space-between" align="center">
+                      <Heading size="md" color="teal.600">{job.subject}</Heading>
+                      <Badge colorScheme={STATUS_COLORS[job.status]}>{job.status}</Badge>
+                    </Flex>
+                  </CardHeader>
+                  <CardBody>
+                    <Progress
+                      value={job.total_recipients ? (job.sent_count + job.failed_count) / job.total_recipients * 100 : 0}
+                      isIndeterminate={job.status === "queued"}
+                      colorScheme="green"
+                      borderRadius="md"
+                      mb={3}
+                    />
+                    <Text fontSize="sm" color="gray.600">
+                      {job.sent_count} sent, {job.failed_count} failed
+                      {job.total_recipients !== null && ` of ${job.total_recipients}`}
+                    </Text>
+                    {job.error && <Text fontSize="sm" color="red.500">{job.error}</Text>}
+                    <Flex gap={3} mt={3}>
+                      {jobActive && <Button size="sm" onClick={handleCancelNewsletter}>Cancel</Button>}
+                      {(job.status === "failed" || job.status === "cancelled") && (
+                        <Button size="sm" colorScheme="teal" onClick={handleResumeNewsletter}>Resume</Button>
+                      )}
+                    </Flex>
+                  </CardBody>
+                </Card>
+              )}
+
               {/* Subscribers Section */}
               <Card>
                 <CardHeader>
                   <Heading size="md" color="teal.600">
-                    Your Subscribers ({subscribers.length})
+                    Your Subscribers ({subscriberTotal})
                   </Heading>
                 </CardHeader>
                 <CardBody>
                   <VStack align="stretch" spacing={3}>
                     {subscribers.map((subscriber) => (
-                      <Flex key={subscriber.id} justify="space-between" align="center" p={3} bg="gray.50" borderRadius="md">
+                      <Flex key={subscriber.consumer_id} justify="space-between" align="center" p={3} bg="gray.50" borderRadius="md">
                         <Box>
-                          <Text fontWeight="bold">{subscriber.name}</Text>
-                          <Text fontSize="sm" color="gray.600">{subscriber.email}</Text>
+                          <Text fontWeight="bold">{subscriber.username || subscriber.consumer_id}</Text>
+                          <Text fontSize="sm" color="gray.600">{subscriber.email || "No email address"}</Text>
                         </Box>
-                        <Badge colorScheme="green">Subscribed {subscriber.subscribed_date}</Badge>
+                        {subscriber.subscribed_at && (
+                          <Badge colorScheme="green">Subscribed {subscriber.subscribed_at.slice(0, 10)}</Badge>
+                        )}
                       </Flex>
                     ))}
+                    {subscriberCursor && (
+                      <Button variant="outline" colorScheme="teal" onClick={() => fetchSubscribers(subscriberCursor)}
+                        isLoading={loadingSubscribers}>
+                        Load more
+                      </Button>
+                    )}
                   </VStack>
                 </CardBody>
               </Card>
@@ -251,7 +353,7 @@ const Newsletter: React.FC = () => {
                   colorScheme="green" 
                   size="lg" 
                   onClick={onOpen}
-                  isDisabled={subscribers.length === 0}
+                  isDisabled={subscriberTotal === 0 || jobActive}
                 >
                   Send Newsletter
                 </Button>
@@ -270,7 +372,7 @@ const Newsletter: React.FC = () => {
             </AlertDialogHeader>
 
             <AlertDialogBody>
-              Are you sure you want to send this newsletter to {subscribers.length} subscribers?
+              Are you sure you want to send this newsletter to {subscriberTotal} subscribers?
               This will include your current products and events.
             </AlertDialogBody>
 
@@ -283,7 +385,7 @@ const Newsletter: React.FC = () => {
                 onClick={handleSendNewsletter} 
                 ml={3}
                 isLoading={sendingEmail}
-                loadingText="Sending..."
+                loadingText="Queueing..."
               >
                 Yes, Send Newsletter
               </Button>
@@ -1,4 +1,4 @@
-import axios from 'axios';
+import axios, { type AxiosInstance } from 'axios';
 
 // Determine the API base URL based on environment
 const getApiBaseUrl = () => {
@@ -30,6 +30,39 @@ console.log('🔧 API Configuration:', {
   finalApiUrl: getApiBaseUrl()
 });
 
-export default axios.create({
+// Read-your-writes: the API stamps successful writes with X-Last-Write. Sending the stamp
+// back on the following requests routes them to the primary instead of a lagging replica.
+const LAST_WRITE_HEADER = 'X-Last-Write';
+const LAST_WRITE_KEY = 'fz_last_write';
+// The server only honours recent stamps, stop sending them (and paying the CORS preflight) after this
+const LAST_WRITE_MAX_AGE_MS = 60_000;
+
+export const trackLastWrite = (instance: AxiosInstance) => {
+  instance.interceptors.request.use((config) => {
+    const stored = sessionStorage.getItem(LAST_WRITE_KEY);
+    if (stored) {
+      const { stamp, receivedAt } = JSON.parse(stored);
+      if (Date.now() - receivedAt < LAST_WRITE_MAX_AGE_MS) {
+        config.headers.set(LAST_WRITE_HEADER, stamp);
+      } else {
+        sessionStorage.removeItem(LAST_WRITE_KEY);
+      }
+    }
+    return config;
+  });
+  instance.interceptors.response.use((response) => {
+    const stamp = response.headers[LAST_WRITE_HEADER.toLowerCase()];
+    if (stamp) {
+      sessionStorage.setItem(LAST_WRITE_KEY, JSON.stringify({ stamp, receivedAt: Date.now() }));
+    }
+    return response;
+  });
+  return instance;
+};
+
+// eventService calls the global axios instance
+trackLastWrite(axios);
+
+export default trackLastWrite(axios.create({
     baseURL: getApiBaseUrl()
-});
\ No newline at end of file
+}));
\ No newline at end of file
@@ -0,0 +1,54 @@
+import api from './apli-client';
+
+export interface Customer {
+  consumer_id: string;
+  username?: string;
+  email?: string;
+  created_at: string; // when the customer started following
+}
+
+export interface CustomerPage {
+  producer_id: string;
+  total: number | null; // only on the first page
+  customers: Customer[];
+  next_cursor: string | null;
+}
+
+export type GrowthPeriod = 'day' | 'week';
+
+export interface CustomerGrowth {
+  producer_id: string;
+  period: GrowthPeriod;
+  total_followers: number;
+  periods: { period_start: string; new_followers: number; total_followers: number }[];
+}
+
+export const customerService = {
+  // One page of the producer's customers with their profiles, newest first
+  getCustomers: async (producerId: string, cursor?: string | null, limit = 50): Promise<CustomerPage> => {
+    try {
+      const response = await api.get(`/v1/producers/${producerId}/customers`, {
+        params: { limit, cursor: cursor || undefined }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching customers:', error);
+      throw error;
+    }
+  },
+
+  // New followers per day or week over the last `periods` periods
+  getCustomerGrowth: async (producerId: string, period: GrowthPeriod = 'week', periods = 12): Promise<CustomerGrowth> => {
+    try {
+      const response = await api.get(`/v1/producers/${producerId}/customers/growth`, {
+        params: { period, periods }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching customer growth:', error);
+      throw error;
+    }
+  }
+};
+
+export default customerService;
@@ -1,4 +1,6 @@
 import axios from 'axios';
+// Registers the read-your-writes interceptors on the global axios instance
+import './apli-client';
 
 const API_BASE_URL = 'http://localhost:8000/api/v1';
 
@@ -43,6 +45,19 @@ class EventService {
     }
   }
 
+  // Events the producer sells at, ordered by date, filtered and paged on the server
+  async getEventsByProducerId(producerId: string, limit?: number, offset = 0): Promise<Event[]> {
+    try {
+      const response = await axios.get(`${API_BASE_URL}/events/`, {
+        params: { producer_id: producerId, limit, offset: offset || undefined }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching events by producer ID:', error);
+      throw error;
+    }
+  }
+
   async createEvent(event: Event): Promise<Event> {
     try {
       const response = await axios.post(`${API_BASE_URL}/events/`, event);
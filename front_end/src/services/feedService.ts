@@ -0,0 +1,49 @@
+import api from './apli-client';
+
+export interface FollowedProducer {
+  producer_id: string;
+  followed_at?: string;
+  username?: string;
+  email?: string;
+  product_count: number;
+}
+
+export interface FeedItem {
+  occurred_at: string;
+  kind: 'product' | 'event';
+  item_id: string;
+  producer_id: string;
+  producer_name?: string;
+  title: string;
+  description?: string;
+  image_url?: string;
+  cost?: number;
+  unit?: string;
+  event_date?: string;
+  event_time?: string;
+  location?: string;
+}
+
+export interface ConsumerFeedPage {
+  consumer_id: string;
+  producers: FollowedProducer[] | null; // only on the first page
+  items: FeedItem[];
+  next_cursor: string | null;
+}
+
+export const feedService = {
+  // One page of the consumer's feed: followed producers' new products and events, newest first
+  getConsumerFeed: async (consumerId: string, cursor?: string | null, limit = 20): Promise<ConsumerFeedPage> => {
+    try {
+      const response = await api.get(`/v1/consumers/${consumerId}/feed`, {
+        params: { limit, cursor: cursor || undefined }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching consumer feed:', error);
+      throw error;
+    }
+  }
+};
+
+export default feedService;
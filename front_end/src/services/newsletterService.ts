@@ -0,0 +1,104 @@
+import api from './apli-client';
+
+export interface Subscriber {
+  consumer_id: string;
+  username?: string;
+  email?: string;
+  subscribed_at?: string;
+}
+
+export interface SubscriberPage {
+  producer_id: string;
+  total: number | null; // only on the first page
+  subscribers: Subscriber[];
+  next_cursor: string | null;
+}
+
+export type NewsletterStatus = 'queued' | 'running' | 'completed' | 'failed' | 'cancelled';
+
+export interface NewsletterJob {
+  id: string;
+  producer_id: string;
+  subject: string;
+  status: NewsletterStatus;
+  total_recipients: number | null;
+  sent_count: number;
+  failed_count: number;
+  error?: string | null;
+  created_at: string;
+  started_at?: string | null;
+  heartbeat_at?: string | null;
+  finished_at?: string | null;
+}
+
+export const newsletterService = {
+  // One page of the producer's followers
+  getSubscribers: async (producerId: string, cursor?: string | null, limit = 50): Promise<SubscriberPage> => {
+    try {
+      const response = await api.get(`/v1/producers/${producerId}/subscribers`, {
+        params: { limit, cursor: cursor || undefined }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching subscribers:', error);
+      throw error;
+    }
+  },
+
+  // Queue a newsletter with the producer's current products and events, sent in the background.
+  // Sends the signed-in producer's token, the API only queues newsletters for its owner
+  sendNewsletter: async (producerId: string, subject?: string, message?: string): Promise<NewsletterJob> => {
+    try {
+      const response = await api.post(`/v1/producers/${producerId}/newsletters`, { subject, message }, {
+        headers: { Authorization: `Bearer ${localStorage.getItem('token')}` }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error queueing newsletter:', error);
+      throw error;
+    }
+  },
+
+  // The producer's newsletter sends, newest first
+  getNewsletters: async (producerId: string, limit = 20): Promise<NewsletterJob[]> => {
+    try {
+      const response = await api.get(`/v1/producers/${producerId}/newsletters`, { params: { limit } });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching newsletters:', error);
+      throw error;
+    }
+  },
+
+  getNewsletter: async (jobId: string): Promise<NewsletterJob> => {
+    try {
+      const response = await api.get(`/v1/newsletters/${jobId}`);
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching newsletter:', error);
+      throw error;
+    }
+  },
+
+  cancelNewsletter: async (jobId: string): Promise<NewsletterJob> => {
+    try {
+      const response = await api.post(`/v1/newsletters/${jobId}/cancel`);
+      return response.data;
+    } catch (error) {
+      console.error('Error cancelling newsletter:', error);
+      throw error;
+    }
+  },
+
+  resumeNewsletter: async (jobId: string): Promise<NewsletterJob> => {
+    try {
+      const response = await api.post(`/v1/newsletters/${jobId}/resume`);
+      return response.data;
+    } catch (error) {
+      console.error('Error resuming newsletter:', error);
+      throw error;
+    }
+  }
+};
+
+export default newsletterService;
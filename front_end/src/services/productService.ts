@@ -11,6 +11,36 @@ export interface Product {
   unit?: string;
 }
 
+export interface ProductSearchResult extends Product {
+  producer_name?: string;
+  producer_rating: number;
+  total_reviews: number;
+  rank: number;
+}
+
+export interface ProductSearchPage {
+  query: string;
+  results: ProductSearchResult[];
+  limit: number;
+  next_cursor: string | null;
+}
+
+export type MarketplaceSort = 'rating' | 'price' | 'distance' | 'recency';
+
+export interface MarketplaceProduct extends Product {
+  created_at?: string;
+  producer_name?: string;
+  producer_rating: number;
+  total_reviews: number;
+  distance_km?: number | null;
+}
+
+export interface MarketplacePage {
+  sort: MarketplaceSort;
+  products: MarketplaceProduct[];
+  next_cursor: string | null;
+}
+
 export const productService = {
   // Get all products for a specific user
   getUserProducts: async (userId: string): Promise<Product[]> => {
@@ -34,6 +64,39 @@ export const productService = {
     }
   },
 
+  // One page of the marketplace listing, ranked and joined with producer names and ratings on the server
+  getMarketplaceProducts: async (params: {
+    sort?: MarketplaceSort;
+    limit?: number;
+    cursor?: string | null;
+    event_id?: string | null;
+    lat?: number;
+    lng?: number;
+  } = {}): Promise<MarketplacePage> => {
+    try {
+      const response = await api.get('/v1/marketplace/products', {
+        params: { ...params, cursor: params.cursor || undefined, event_id: params.event_id || undefined }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error fetching marketplace products:', error);
+      throw error;
+    }
+  },
+
+  // Ranked server-side search over product names and descriptions
+  searchProducts: async (query: string, limit = 20, cursor?: string | null): Promise<ProductSearchPage> => {
+    try {
+      const response = await api.get('/v1/products/search', {
+        params: { q: query, limit, cursor: cursor || undefined }
+      });
+      return response.data;
+    } catch (error) {
+      console.error('Error searching products:', error);
+      throw error;
+    }
+  },
+
   // Create a new product
   createProduct: async (productData: {
     product_id: string;